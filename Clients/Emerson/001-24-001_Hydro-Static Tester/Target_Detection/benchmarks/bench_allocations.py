@@ -0,0 +1,120 @@
+"""Check that buffer-pool mode allocates no full-frame arrays in steady state.
+
+Usage: python benchmarks/bench_allocations.py [--frames 30] [--json out.json]
+
+Runs mask + detection over pre-rendered synthetic frames with and without
+a BufferPool, for both mask engines and both detection regions, and
+measures with tracemalloc (NumPy and OpenCV output arrays are traced) how
+far memory rises above the steady-state baseline while those frames run.
+Without the pool that peak is several full frames; with it, it must stay
+below --max-fraction of one single-channel mask, and the pool must not
+reallocate. A resolution change in the middle checks that the pool is
+rebuilt once for the new size and then stays flat again.
+Exit code 1 if any pooled run fails.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+import main  # noqa: E402
+from utils.buffers import BufferPool  # noqa: E402
+from utils.circles import UpsampleScheduler  # noqa: E402
+from utils.synthetic import make_frame, random_discs  # noqa: E402
+
+SIZES = [(640, 480), (1280, 720)]
+
+
+def render_frames(w, h, count, seed):
+    rng = np.random.default_rng(seed)
+    discs = random_discs(w, h, 2, rng)
+    return [make_frame(w, h, discs, clutter=10, seed=seed + i) for i in range(count)]
+
+
+def one_frame(frame, pool):
+    h, w = frame.shape[:2]
+    if pool is not None:
+        pool.resize(w, h)
+    regions = main.detection_regions(w, h)
+    region_masks = main.create_region_masks(frame, regions, pool)
+    return main.detect_circles(frame, region_masks, pool=pool)
+
+
+def peak_growth(frames, pool, warmup=3):
+    """(peak bytes above the steady-state baseline, pool reallocations) over `frames`."""
+    # Warm-up starts with an empty frame and a fresh fallback scheduler, so
+    # the 2x pass runs and its buffers exist before measuring
+    main._UPSAMPLE = UpsampleScheduler(main.UPSAMPLE_IDLE_FRAMES, main.UPSAMPLE_PROBE_FRAMES)
+    for frame in [np.zeros_like(frames[0])] + frames[:warmup]:
+        one_frame(frame, pool)
+    allocations = pool.allocations if pool is not None else 0
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    for frame in frames[warmup:]:
+        one_frame(frame, pool)
+    peak = tracemalloc.get_traced_memory()[1]
+    grown = (pool.allocations - allocations) if pool is not None else 0
+    return peak - base, grown
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-fraction", type=float, default=0.5,
+                        help="allowed peak growth with the pool, as a fraction of one mask")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    frames = {size: render_frames(*size, args.frames, args.seed) for size in SIZES}
+    results = []
+    failed = False
+    tracemalloc.start()
+    print(f"{'engine':>6} {'region':>6} {'size':>10} {'no pool KB':>11} {'pool KB':>9} "
+          f"{'mask KB':>8} {'reallocs':>8}")
+    for engine in main.MASK_ENGINES:
+        main.MASK_ENGINE = engine
+        for region in main.DETECTION_REGIONS:
+            main.DETECTION_REGION = region
+            pool = BufferPool()
+            for (w, h) in SIZES:
+                # Same pool across sizes: the first frames at a new size
+                # (warm-up) rebuild it, the measured ones must not
+                main.CURRENT_FRAME_WIDTH, main.CURRENT_FRAME_HEIGHT = w, h
+                plain, _ = peak_growth(frames[(w, h)], None)
+                pooled, grown = peak_growth(frames[(w, h)], pool)
+                mask_bytes = w * h
+                ok = pooled < args.max_fraction * mask_bytes and grown == 0
+                failed = failed or not ok
+                results.append({
+                    "engine": engine, "region": region, "width": w, "height": h,
+                    "peak_growth_bytes": plain, "pooled_peak_growth_bytes": pooled,
+                    "pool_reallocations": grown, "pool_bytes": pool.nbytes, "ok": ok,
+                })
+                print(f"{engine:>6} {region:>6} {f'{w}x{h}':>10} {plain / 1024:>11.0f} "
+                      f"{pooled / 1024:>9.1f} {mask_bytes / 1024:>8.0f} {grown:>8}"
+                      f"{'' if ok else '  FAIL'}")
+    tracemalloc.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "allocations",
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "frames": args.frames,
+                "results": results,
+            }, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
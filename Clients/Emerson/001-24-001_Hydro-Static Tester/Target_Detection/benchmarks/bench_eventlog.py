@@ -0,0 +1,107 @@
+"""Measure the frame event log: append cost in the detection loop, writer
+throughput, and how long a reader takes to load a whole shift.
+
+Usage: python benchmarks/bench_eventlog.py [--records 1728000] [--dir DIR] [--json out.json]
+
+The default record count is one 8-hour shift at 60 fps. Records go to a
+temporary directory unless --dir is given (it is not cleaned up then).
+Exit code 1 if records are lost or read back wrong.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+from utils.eventlog import EVENT_DTYPE, EventLog, hit_transitions, log_files, read_events  # noqa: E402
+
+
+def write_shift(directory, records, per_file, batch):
+    """Append `records` frames in bursts of `batch`; returns (append us p50, p99, total s)."""
+    log = EventLog(directory, per_file, max_pending=max(100000, 4 * batch))
+    log.start()
+    samples = []
+    hits = (False, False)
+    t_start = time.perf_counter()
+    ts = time.monotonic()
+    for i in range(records):
+        if i % 90 == 0:
+            hits = (not hits[0], hits[1] if i % 180 else not hits[1])
+        circles = [(100 + i % 400, 240, 15), (420, 240, 14)]
+        t0 = time.perf_counter()
+        log.append(ts + i / 60.0, circles, hits, hits, 4.2, 3.1, 0.2, 9.8)
+        samples.append(time.perf_counter() - t0)
+        if i % batch == batch - 1:
+            # Let the writer thread run, like the gaps between camera frames
+            time.sleep(0.001)
+    log.stop(join_timeout=30.0)
+    total = time.perf_counter() - t_start
+    us = np.asarray(samples) * 1e6
+    return log, float(np.percentile(us, 50)), float(np.percentile(us, 99)), total
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1728000)
+    parser.add_argument("--per-file", type=int, default=216000, help="records per log file")
+    parser.add_argument("--batch", type=int, default=1000, help="appends between writer yields")
+    parser.add_argument("--dir", help="keep the log files here")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="eventlog-")
+    try:
+        log, p50, p99, total = write_shift(directory, args.records, args.per_file, args.batch)
+        files = log_files(directory)
+        size = sum(os.path.getsize(p) for p in files)
+        t0 = time.perf_counter()
+        records = read_events(directory)
+        read_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        changes = hit_transitions(records)
+        transitions_ms = (time.perf_counter() - t0) * 1000.0
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    ok = (len(records) == args.records and log.dropped == 0
+          and np.array_equal(records["frame"], np.arange(1, args.records + 1)))
+    print(f"append: p50 {p50:.2f} us, p99 {p99:.2f} us per record "
+          f"({EVENT_DTYPE.itemsize} B each); {args.records} records in {total:.1f} s, "
+          f"{log.dropped} dropped")
+    print(f"files: {len(files)} x {args.per_file} records, {size / 1e6:.1f} MB")
+    print(f"read: {len(records)} records in {read_s * 1000:.0f} ms "
+          f"({len(records) / max(read_s, 1e-9) / 1e6:.1f} M records/s); "
+          f"{len(changes)} hit transitions found in {transitions_ms:.1f} ms; ok {ok}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "eventlog",
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "records": args.records,
+                "record_bytes": EVENT_DTYPE.itemsize,
+                "append_us_p50": p50,
+                "append_us_p99": p99,
+                "write_s": total,
+                "dropped": log.dropped,
+                "files": len(files),
+                "bytes": size,
+                "read_ms": read_s * 1000.0,
+                "transitions": len(changes),
+                "ok": ok,
+            }, f, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,225 @@
+"""Drive the PLC writer against the local PLC simulator and measure the write path.
+
+Usage: python benchmarks/bench_plc.py [--latency-ms 2] [--seconds 3] [--json out.json]
+                                      [--max-p99-ms 20]
+
+Three phases, all through utils.pylogix.update_default:
+- steady: hit states toggled at a frame rate; enqueue-to-commit latency of
+  every change (update_default call to the simulator applying the value)
+- burst: updates far faster than one write round trip; how many requests
+  they coalesce into and whether the final state arrives
+- outage: the link drops for a while during toggling; time from the link
+  coming back to the PLC holding the current state again
+Exit code 1 if the PLC ends in the wrong state, the outage shows no recovery
+point, or --max-p99-ms is exceeded.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+from utils import pylogix  # noqa: E402
+from utils.metrics import MetricsRegistry  # noqa: E402
+from utils.plcsim import PLCSimulator  # noqa: E402
+
+TAGS = ("Target1_Hit", "Target2_Hit")
+
+
+def commit_latencies(sim, changes):
+    """ms from each (time, tag, value) change to the first matching applied write."""
+    out = []
+    log = list(sim.log)
+    for t_enq, tag, value in changes:
+        for t_apply, t, v in log:
+            if t_apply >= t_enq and t == tag and v == value:
+                out.append((t_apply - t_enq) * 1000.0)
+                break
+    return out
+
+
+def state_matches(sim, state):
+    return all(sim.tags.get(tag) == value for tag, value in zip(TAGS, state))
+
+
+def wait_for_state(sim, state, timeout_s):
+    t_end = time.monotonic() + timeout_s
+    while time.monotonic() < t_end:
+        if state_matches(sim, state):
+            return True
+        time.sleep(0.0005)
+    return state_matches(sim, state)
+
+
+def toggles(seconds, rate, toggle_every, on_frame=None):
+    """update_default at `rate` Hz, flipping target 1 every `toggle_every`
+    frames and target 2 at half that; returns (changes, final state)."""
+    changes = []
+    state = (False, False)
+    period = 1.0 / rate
+    t_next = time.monotonic()
+    frames = int(seconds * rate)
+    for i in range(frames):
+        k = i // toggle_every
+        new = (k % 2 == 1, k // 2 % 2 == 1)
+        now = time.monotonic()
+        for tag, old, value in zip(TAGS, state, new):
+            if old != value:
+                changes.append((now, tag, value))
+        state = new
+        pylogix.update_default(*state)
+        if on_frame is not None:
+            on_frame(i)
+        t_next += period
+        time.sleep(max(0.0, t_next - time.monotonic()))
+    return changes, state
+
+
+def latency_row(samples):
+    if not samples:
+        return {"count": 0}
+    arr = np.asarray(samples)
+    return {"count": len(samples), "p50_ms": float(np.percentile(arr, 50)),
+            "p95_ms": float(np.percentile(arr, 95)), "p99_ms": float(np.percentile(arr, 99)),
+            "max_ms": float(arr.max())}
+
+
+def start_writer(sim, metrics):
+    pylogix.shutdown_default()
+    pylogix.init_default(pylogix.PLCConfig(), metrics=metrics, comm_factory=sim.connection)
+    # Initial state, so later changes are measured against a known PLC value
+    pylogix.update_default(False, False)
+    wait_for_state(sim, (False, False), 2.0)
+
+
+def run_steady(args):
+    sim = PLCSimulator(latency_s=args.latency_ms / 1000.0, jitter_s=args.jitter_ms / 1000.0)
+    metrics = MetricsRegistry()
+    start_writer(sim, metrics)
+    changes, state = toggles(args.seconds, args.rate, args.toggle_every)
+    ok = wait_for_state(sim, state, 2.0)
+    pylogix.shutdown_default()
+    row = latency_row(commit_latencies(sim, changes))
+    row.update(changes=len(changes), requests=sim.requests, final_state_ok=ok,
+               writer_change=dict(zip(("p50_ms", "p99_ms"),
+                                      metrics.summary(["plc_change"]).get("plc_change", ()))))
+    return row
+
+
+def run_burst(args):
+    sim = PLCSimulator(latency_s=max(args.latency_ms, 5.0) / 1000.0)
+    start_writer(sim, None)
+    requests_before = sim.requests
+    state = (False, False)
+    t0 = time.perf_counter()
+    for i in range(args.burst):
+        state = (i % 2 == 1, i % 3 == 1)
+        pylogix.update_default(*state)
+    enqueue_us = (time.perf_counter() - t0) * 1e6 / args.burst
+    ok = wait_for_state(sim, state, 2.0)
+    time.sleep(0.05)
+    pylogix.shutdown_default()
+    requests = sim.requests - requests_before
+    return {"updates": args.burst, "requests": requests,
+            "coalescing": args.burst / requests if requests else 0.0,
+            "update_us": enqueue_us, "final_state_ok": ok}
+
+
+def run_outage(args):
+    sim = PLCSimulator(latency_s=args.latency_ms / 1000.0)
+    start_writer(sim, None)
+    drop_at = int(args.seconds * args.rate / 3)
+    marks = {}
+
+    def on_frame(i):
+        if i == drop_at:
+            sim.outage(args.outage)
+            marks["restore"] = time.monotonic() + args.outage
+
+    changes, state = toggles(args.seconds, args.rate, args.toggle_every, on_frame)
+    restore = marks.get("restore", 0.0)
+    # Let the writer settle before reading the log, or the last writes
+    # that complete the recovery are not in it yet
+    ok = wait_for_state(sim, state, 3.0)
+    # First moment after the link returned at which the PLC held the
+    # state the app had published at that moment
+    recovered = None
+    applied = {}
+    pending = [(t, tag, v) for t, tag, v in changes]
+    for t_apply, tag, value in sorted(sim.log):
+        applied[tag] = value
+        if t_apply < restore or recovered is not None:
+            continue
+        wanted = {}
+        for t, ctag, cv in pending:
+            if t <= t_apply:
+                wanted[ctag] = cv
+        if all(applied.get(k) == v for k, v in wanted.items()):
+            recovered = (t_apply - restore) * 1000.0
+    writer = pylogix.default_writer()
+    reconnects = writer.reconnects if writer is not None else 0
+    pylogix.shutdown_default()
+    return {"outage_s": args.outage, "recovery_ms": recovered, "reconnects": reconnects,
+            "connections": sim.connections, "final_state_ok": ok}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated round trip")
+    parser.add_argument("--jitter-ms", type=float, default=0.5)
+    parser.add_argument("--seconds", type=float, default=3.0, help="length of the toggle phases")
+    parser.add_argument("--rate", type=float, default=60.0, help="update_default calls per second")
+    parser.add_argument("--toggle-every", type=int, default=6, help="frames between hit changes")
+    parser.add_argument("--burst", type=int, default=5000, help="updates in the burst phase")
+    parser.add_argument("--outage", type=float, default=1.0, help="simulated link outage (s)")
+    parser.add_argument("--max-p99-ms", type=float, help="fail if steady p99 exceeds this")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    steady = run_steady(args)
+    print(f"steady: {steady['changes']} changes in {steady['requests']} requests, "
+          f"enqueue->commit p50 {steady.get('p50_ms', 0):.2f} p95 {steady.get('p95_ms', 0):.2f} "
+          f"p99 {steady.get('p99_ms', 0):.2f} max {steady.get('max_ms', 0):.2f} ms "
+          f"(round trip {args.latency_ms:g} ms), final ok {steady['final_state_ok']}")
+    burst = run_burst(args)
+    print(f"burst: {burst['updates']} updates -> {burst['requests']} requests "
+          f"({burst['coalescing']:.0f}x coalesced, {burst['update_us']:.1f} us per update), "
+          f"final ok {burst['final_state_ok']}")
+    outage = run_outage(args)
+    rec = outage["recovery_ms"]
+    print(f"outage: {args.outage:g} s drop, recovered "
+          f"{'never' if rec is None else f'{rec:.0f} ms'} after the link returned, "
+          f"{outage['reconnects']} reconnects, final ok {outage['final_state_ok']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "plc",
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "rate": args.rate,
+                "steady": steady,
+                "burst": burst,
+                "outage": outage,
+            }, f, indent=2)
+
+    failed = not (steady["final_state_ok"] and burst["final_state_ok"] and outage["final_state_ok"])
+    if args.max_p99_ms is not None and steady.get("p99_ms", 0.0) > args.max_p99_ms:
+        print(f"FAIL steady p99 {steady['p99_ms']:.2f} ms > {args.max_p99_ms:g} ms")
+        failed = True
+    if outage["recovery_ms"] is None and outage["final_state_ok"]:
+        print("FAIL outage: final state ok but no recovery point found in the PLC log")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,89 @@
+"""Compare the lookup-table and redness mask engines with the HSV engine on synthetic frames.
+
+Usage: python benchmarks/bench_red_mask.py [--repeat 50] [--min-iou 0.9] [--json out.json]
+
+Each engine is timed against create_red_mask and its mask compared with
+the HSV mask (pixel agreement and IoU of red pixels). Exit code 1 if an
+engine's IoU falls below --min-iou.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+import main  # noqa: E402
+from utils.synthetic import make_frame, random_discs  # noqa: E402
+
+SIZES = [(640, 480), (1280, 720), (1920, 1080)]
+ENGINES = {"lut": main.create_red_mask_lut, "redness": main.create_red_mask_redness}
+
+
+def time_ms(fn, frame, repeat):
+    fn(frame)  # warm-up (also builds the LUT)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(frame)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def agreement(a, b):
+    same = float(np.count_nonzero(a == b)) / a.size
+    inter = np.count_nonzero((a > 0) & (b > 0))
+    union = np.count_nonzero((a > 0) | (b > 0))
+    iou = inter / union if union else 1.0
+    return same, iou
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--clutter", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-iou", type=float, default=0.9,
+                        help="lowest acceptable red-pixel IoU against the HSV mask")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    failed = False
+    print(f"{'engine':>8} {'size':>10} {'hsv ms':>8} {'ms':>8} {'speedup':>8} "
+          f"{'agree':>8} {'iou':>7}")
+    for (w, h) in SIZES:
+        discs = random_discs(w, h, 4, rng)
+        frame = make_frame(w, h, discs, clutter=args.clutter, seed=args.seed)
+        hsv = time_ms(main.create_red_mask, frame, args.repeat)
+        reference = main.create_red_mask(frame)
+        for engine, fn in ENGINES.items():
+            samples = time_ms(fn, frame, args.repeat)
+            same, iou = agreement(reference, fn(frame))
+            row = {
+                "engine": engine, "width": w, "height": h,
+                "hsv_ms_p50": float(np.percentile(hsv, 50)),
+                "ms_p50": float(np.percentile(samples, 50)),
+                "pixel_agreement": same,
+                "red_iou": iou,
+            }
+            row["speedup"] = row["hsv_ms_p50"] / max(1e-9, row["ms_p50"])
+            ok = iou >= args.min_iou
+            failed = failed or not ok
+            results.append(row)
+            print(f"{engine:>8} {f'{w}x{h}':>10} {row['hsv_ms_p50']:8.2f} {row['ms_p50']:8.2f} "
+                  f"{row['speedup']:7.2f}x {same:8.5f} {iou:7.4f}{'' if ok else '  FAIL'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "red_mask", "results": results}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,263 @@
+"""Time the mask engines, both detectors and the tracking/hit logic on synthetic frames.
+
+Usage: python benchmarks/bench_suite.py [--repeat 20] [--json out.json]
+                                        [--compare baseline.json --tolerance 0.25]
+
+Every stage is timed on its own at 640x480, 1280x720 and 1920x1080 for
+three scenes (clean, noisy, cluttered) with red discs at known positions.
+Reports p50/p95/p99 latency, frames per second and accuracy against the
+ground truth; the redness mask engine is also scored by its IoU with the
+HSV mask and by Hough accuracy on its masks, and Hough also runs
+downscaled 2x and 4x (hough/2, hough/4) with native refinement; the
+accuracy column adds the mean centre error of matched detections in
+native pixels. With --compare, p50 latencies are checked against an earlier
+JSON result and the exit code is 1 if any grew by more than the tolerance.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+import main  # noqa: E402
+from utils.synthetic import make_frame, random_discs  # noqa: E402
+
+SIZES = [(640, 480), (1280, 720), (1920, 1080)]
+# name: (noise std, clutter objects)
+SCENES = {
+    "clean": (3.0, 0),
+    "noisy": (12.0, 10),
+    "cluttered": (6.0, 60),
+}
+
+
+def latency_stats(samples):
+    arr = np.asarray(samples, dtype=np.float64)
+    mean = float(arr.mean())
+    return {
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "mean_ms": mean,
+        "fps": 1000.0 / mean if mean > 0 else 0.0,
+    }
+
+
+def time_calls(fn, inputs, repeat):
+    """Call fn on each input `repeat` times round-robin; per-call ms."""
+    fn(inputs[0])  # warm-up
+    samples = []
+    for _ in range(repeat):
+        for item in inputs:
+            t0 = time.perf_counter()
+            fn(item)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def match_score(truth, found):
+    """(true positives, false positives, misses, summed centre error) against true discs.
+
+    A detection matches a true disc when its centre lies within
+    max(3, r / 3) pixels; each disc matches at most one detection.
+    """
+    tp = 0
+    err = 0.0
+    used = set()
+    for (x, y, r) in truth:
+        tol = max(3.0, r / 3.0)
+        for j, (cx, cy, _cr) in enumerate(found):
+            d = math.hypot(cx - x, cy - y)
+            if j not in used and d <= tol:
+                used.add(j)
+                tp += 1
+                err += d
+                break
+    return tp, len(found) - tp, len(truth) - tp, err
+
+
+def mask_iou(masks, others):
+    """IoU of red pixels between two lists of masks, over all frames."""
+    inter = sum(int(np.count_nonzero((a > 0) & (b > 0))) for a, b in zip(masks, others))
+    union = sum(int(np.count_nonzero((a > 0) | (b > 0))) for a, b in zip(masks, others))
+    return inter / union if union else 1.0
+
+
+def build_scene(w, h, noise, clutter, count, seed):
+    """Frames with two discs each; every other frame puts one on a target."""
+    rng = np.random.default_rng(seed)
+    targets = main.target_geometry(w, h)
+    frames = []
+    for i in range(count):
+        discs = random_discs(w, h, 2, rng, radius_range=(6, 30))
+        if i % 2 == 0:
+            t_x, t_y, t_r = targets[i // 2 % 2]
+            discs[0] = (t_x, t_y, max(6, min(t_r, discs[0][2])))
+        frames.append((make_frame(w, h, discs, noise_std=noise, clutter=clutter,
+                                  seed=seed * 1000 + i), discs))
+    return frames
+
+
+def bench_detector(fn, frames, masks, repeat, **kwargs):
+    inputs = list(zip([f for f, _ in frames], masks))
+    samples = time_calls(lambda fm: fn(fm[0], max_count=2, mask=fm[1], **kwargs),
+                         inputs, repeat)
+    tp = fp = fn_ = 0
+    err = 0.0
+    for (frame, truth), mask in zip(frames, masks):
+        a, b, c, d = match_score(truth, fn(frame, max_count=2, mask=mask, **kwargs))
+        tp, fp, fn_, err = tp + a, fp + b, fn_ + c, err + d
+    row = latency_stats(samples)
+    row["precision"] = tp / (tp + fp) if tp + fp else 1.0
+    row["recall"] = tp / (tp + fn_) if tp + fn_ else 1.0
+    row["center_err_px"] = err / tp if tp else 0.0
+    return row
+
+
+def hit_sequence(w, h, steps):
+    """Two markers sweeping across the targets: (circles, true hits) per frame."""
+    targets = main.target_geometry(w, h)
+    seq = []
+    for k in range(steps):
+        circles = []
+        for i, (t_x, t_y, t_r) in enumerate(targets):
+            # Oscillate +-3 target radii around each target centre
+            phase = 2.0 * math.pi * k / 40.0 + i
+            circles.append((int(t_x + 3 * t_r * math.sin(phase)), t_y, 8))
+        hits = tuple(any(math.hypot(x - t_x, y - t_y) <= t_r for (x, y, _r) in circles)
+                     for (t_x, t_y, t_r) in targets)
+        seq.append((circles, hits))
+    return seq
+
+
+def bench_tracking(w, h, repeat):
+    seq = hit_sequence(w, h, 200)
+    samples = []
+    agree = 0
+    for rep in range(max(1, repeat // 10)):
+        state = main.TrackingState()
+        for circles, truth in seq:
+            t0 = time.perf_counter()
+            _disp, _targets, hits = main.update_tracking(state, circles, w, h)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+            if rep == 0:
+                agree += int(tuple(hits) == truth)
+    row = latency_stats(samples)
+    # Hysteresis and the OFF-frames filter lag the raw truth by design
+    row["hit_agreement"] = agree / len(seq)
+    return row
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base = {(r["stage"], r["scene"], r["width"], r["height"]): r
+            for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = base.get((r["stage"], r["scene"], r["width"], r["height"]))
+        if old and old["p50_ms"] > 0 and r["p50_ms"] > old["p50_ms"] * (1.0 + tolerance):
+            regressions.append((r, old))
+    for r, old in regressions:
+        print(f"REGRESSION {r['stage']} {r['scene']} {r['width']}x{r['height']}: "
+              f"p50 {old['p50_ms']:.2f} -> {r['p50_ms']:.2f} ms")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="passes over each scene's frames")
+    parser.add_argument("--frames", type=int, default=6, help="frames per scene")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sizes", help="comma list like 640x480,1280x720 (default: all three)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json result to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed p50 growth before a regression is reported")
+    args = parser.parse_args()
+
+    sizes = SIZES
+    if args.sizes:
+        sizes = [tuple(int(v) for v in s.lower().split("x")) for s in args.sizes.split(",")]
+
+    results = []
+    print(f"{'stage':>10} {'scene':>10} {'size':>10} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'fps':>8} {'accuracy':>24}")
+
+    def report(row):
+        results.append(row)
+        if "recall" in row:
+            acc = (f"P {row['precision']:.2f} R {row['recall']:.2f} "
+                   f"err {row['center_err_px']:.2f}")
+        elif "red_iou" in row:
+            acc = f"iou {row['red_iou']:.3f}"
+        elif "hit_agreement" in row:
+            acc = f"hits {row['hit_agreement']:.2f}"
+        else:
+            acc = ""
+        print(f"{row['stage']:>10} {row['scene']:>10} {row['width']:>5}x{row['height']:<4} "
+              f"{row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f} "
+              f"{row['fps']:8.1f} {acc:>24}")
+
+    for (w, h) in sizes:
+        for scene, (noise, clutter) in SCENES.items():
+            frames = build_scene(w, h, noise, clutter, args.frames, args.seed)
+            base = {"scene": scene, "width": w, "height": h,
+                    "noise_std": noise, "clutter": clutter}
+            report(dict(base, stage="mask",
+                        **latency_stats(time_calls(main.create_red_mask,
+                                                   [f for f, _ in frames], args.repeat))))
+            masks = [main.create_red_mask(f) for f, _ in frames]
+            red_masks = [main.create_red_mask_redness(f) for f, _ in frames]
+            report(dict(base, stage="mask_red", red_iou=mask_iou(masks, red_masks),
+                        **latency_stats(time_calls(main.create_red_mask_redness,
+                                                   [f for f, _ in frames], args.repeat))))
+            report(dict(base, stage="fast",
+                        **bench_detector(main.detect_red_circles, frames, masks, args.repeat)))
+            # Fresh fallback scheduler so earlier scenes do not leave it idle
+            main._UPSAMPLE.__init__(main.UPSAMPLE_IDLE_FRAMES, main.UPSAMPLE_PROBE_FRAMES)
+            report(dict(base, stage="hough",
+                        **bench_detector(main.detect_red_circles_houghes, frames, masks,
+                                         args.repeat, targets=main.target_geometry(w, h))))
+            for downscale in (2, 4):
+                main._UPSAMPLE.__init__(main.UPSAMPLE_IDLE_FRAMES, main.UPSAMPLE_PROBE_FRAMES)
+                report(dict(base, stage=f"hough/{downscale}", downscale=downscale,
+                            **bench_detector(main.detect_red_circles_houghes, frames, masks,
+                                             args.repeat, targets=main.target_geometry(w, h),
+                                             downscale=downscale)))
+            main._UPSAMPLE.__init__(main.UPSAMPLE_IDLE_FRAMES, main.UPSAMPLE_PROBE_FRAMES)
+            report(dict(base, stage="hough_red",
+                        **bench_detector(main.detect_red_circles_houghes, frames, red_masks,
+                                         args.repeat, targets=main.target_geometry(w, h))))
+        report(dict({"scene": "sweep", "width": w, "height": h}, stage="tracking",
+                    **bench_tracking(w, h, args.repeat)))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "suite",
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "opencv": cv2.__version__,
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "repeat": args.repeat,
+                "frames": args.frames,
+                "results": results,
+            }, f, indent=2)
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
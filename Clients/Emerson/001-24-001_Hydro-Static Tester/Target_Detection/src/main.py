@@ -1,18 +1,45 @@
 # REV 1.0 - Added faster contour mode and toggle from gui - 11/12/2025 - T. O'Nan
 
 import cv2
-import customtkinter as ctk
-import tkinter as tk
 import threading
 import json
 import os
 import math
 import time
-import platform
+import signal
+import argparse
+import queue
+
+import numpy as np
+
+from utils.buffers import BufferPool
+from utils.capture import LatestFrameBuffer, CaptureThread, POLICIES as CAPTURE_POLICIES
+from utils.circles import FallbackDecision, UpsampleScheduler, fallback_tiles, refine_circles, validate_candidates
+from utils.clips import ClipRecorder, clip_triggers
+from utils.eventlog import EventLog
+from utils.metrics import MetricsGroup, MetricsRegistry, MetricsServer
+from utils.pipeline import Pipeline, Stage
+from utils.predict import SearchWindows
+from utils.preview import PreviewRenderer
+from utils.procpool import ProcessWorkers, SharedFrameRing
+from utils.redmask import RedMaskLUT, RednessMask
+from utils.sources import CaptureFormat, describe_format, negotiate_format, open_camera, open_source
+from utils.tracking import Tracker
+
+try:
+    # GUI toolkit (not needed in headless mode)
+    import customtkinter as ctk
+    import tkinter as tk
+    _GUI_AVAILABLE = True
+    _GUI_IMPORT_ERROR = None
+except Exception as _e:
+    _GUI_AVAILABLE = False
+    _GUI_IMPORT_ERROR = _e
 
 try:
     # PLC helpers (optional). If pylogix is missing, we just skip PLC writes.
-    from utils.pylogix import init_default as plc_init_default, update_default as plc_update_default, shutdown_default as plc_shutdown_default
+    from utils.pylogix import init_default as plc_init_default, publish_default as plc_publish_default, shutdown_default as plc_shutdown_default
+    from utils.pylogix import PLCConfig, PLCTag, PLCWriter, default_writer as plc_default_writer
     _PLC_AVAILABLE = True
     _PLC_IMPORT_ERROR = None
 except Exception as _e:
@@ -26,6 +53,85 @@ CURRENT_FRAME_WIDTH = FRAME_WIDTH
 CURRENT_FRAME_HEIGHT = FRAME_HEIGHT
 CURRENT_FPS = 0.0
 
+# Capture ring buffer (capture thread -> detection loop)
+DEFAULT_CAPTURE_BUFFER_SLOTS = 3
+DEFAULT_CAPTURE_DROP_POLICY = "latest"  # "latest" = freshest frame, "fifo" = in order
+CAPTURE_BUFFER_SLOTS = DEFAULT_CAPTURE_BUFFER_SLOTS
+CAPTURE_DROP_POLICY = DEFAULT_CAPTURE_DROP_POLICY
+CURRENT_DROPPED_FRAMES = 0
+CURRENT_PROCESSED_FRAMES = 0
+
+# Camera format negotiation, re-run on every resolution change: pixel
+# format ("auto" tries MJPG, then YUYV), frame rate and driver buffer count
+# (0 = driver default), exposure / white balance ("auto" = untouched,
+# "lock" = freeze the value auto settled on, or a number)
+CAPTURE_FOURCCS = ("auto", "MJPG", "YUYV")
+CAPTURE_FOURCC = "auto"
+DEFAULT_CAPTURE_FPS = 30.0
+DEFAULT_CAPTURE_BUFFER_SIZE = 1
+CAPTURE_FPS = DEFAULT_CAPTURE_FPS
+CAPTURE_BUFFER_SIZE = DEFAULT_CAPTURE_BUFFER_SIZE
+CAPTURE_EXPOSURE = "auto"
+CAPTURE_WHITE_BALANCE = "auto"
+CURRENT_CAPTURE_FORMAT = ""  # granted pixel format and rate, for the status line
+
+# Buffer-pool mode: the red mask and its intermediates are written into
+# preallocated arrays (reallocated only when the frame size changes), so
+# the sequential loop and camera stations allocate no full-frame arrays
+BUFFER_POOL = False
+
+# Pipelined processing (capture -> mask -> detect -> track -> render threads)
+PIPELINE_MODE = False
+DEFAULT_PIPELINE_WORKERS = 2   # workers for the mask and detect stages
+DEFAULT_PIPELINE_QUEUE_SIZE = 2
+PIPELINE_WORKERS = DEFAULT_PIPELINE_WORKERS
+PIPELINE_QUEUE_SIZE = DEFAULT_PIPELINE_QUEUE_SIZE
+CURRENT_QUEUE_DEPTHS = {}
+
+# Process mode: mask and detection in PROCESS_WORKERS worker processes
+# (-1 = one per core, 0 = off); frames go through shared-memory slots and
+# results are applied in frame order. Takes precedence over PIPELINE_MODE.
+PROCESS_WORKERS = 0
+
+# Per-stage latency histograms (ms), shown in the GUI and served in
+# Prometheus text format at http://METRICS_HOST:METRICS_PORT/metrics
+# when METRICS_PORT is non-zero
+METRICS = MetricsRegistry()
+STATUS_STAGES = ("capture", "mask", "detect", "track", "hits", "plc",
+                 "plc_write", "plc_change", "plc_read", "camera_to_plc", "preview_copy", "render", "show")
+DEFAULT_METRICS_HOST = "127.0.0.1"
+DEFAULT_METRICS_PORT = 0
+METRICS_HOST = DEFAULT_METRICS_HOST
+METRICS_PORT = DEFAULT_METRICS_PORT
+
+# PLC outputs: output name -> controller tag. Only configured outputs are
+# written; changed values go out together in one multi-tag request.
+# Marker centres are camera pixels of the tracked markers (-1 when absent).
+PLC_OUTPUT_TYPES = {
+    "target1_hit": "BOOL",
+    "target2_hit": "BOOL",
+    "marker_count": "DINT",
+    "marker1_x": "DINT",
+    "marker1_y": "DINT",
+    "marker2_x": "DINT",
+    "marker2_y": "DINT",
+}
+DEFAULT_PLC_TAGS = {"target1_hit": "Target1_Hit", "target2_hit": "Target2_Hit"}
+PLC_TAGS = dict(DEFAULT_PLC_TAGS)
+DEFAULT_PLC_IP = "192.168.1.6"
+PLC_IP = DEFAULT_PLC_IP
+PLC_SLOT = 0
+
+# PLC watchdog channel: heartbeat counter (DINT) and processing frame rate
+# (REAL) written every PLC_HEARTBEAT_S when their tags are set; the hit tags
+# are read back every PLC_READBACK_S (0 = off) and rewritten if they differ
+PLC_HEARTBEAT_TAG = ""
+PLC_FRAME_RATE_TAG = ""
+DEFAULT_PLC_HEARTBEAT_S = 1.0
+DEFAULT_PLC_READBACK_S = 2.0
+PLC_HEARTBEAT_S = DEFAULT_PLC_HEARTBEAT_S
+PLC_READBACK_S = DEFAULT_PLC_READBACK_S
+
 # Rendering / smoothing
 DEFAULT_DEADBAND_PX = 1
 # Only update drawn center if movement exceeds this many pixels
@@ -47,6 +153,12 @@ OFF_FRAMES = DEFAULT_OFF_FRAMES
 APPEAR_FRAMES = DEFAULT_APPEAR_FRAMES
 HOLD_FRAMES = DEFAULT_HOLD_FRAMES
 
+# Tracker gate: a detection further than this from a track's predicted
+# position cannot continue that track (APPEAR_FRAMES confirms a new track,
+# HOLD_FRAMES is how long a lost track is still drawn)
+DEFAULT_TRACK_GATE_PX = 80
+TRACK_GATE_PX = DEFAULT_TRACK_GATE_PX
+
 # Unified stability control
 DEFAULT_STABILITY_FRAMES = 3
 STABILITY_FRAMES = DEFAULT_STABILITY_FRAMES
@@ -54,9 +166,106 @@ STABILITY_FRAMES = DEFAULT_STABILITY_FRAMES
 # Detection mode toggle (True = fast, False = Hughes)
 USE_FAST_DETECTION = False
 
+# Red thresholds in OpenCV HSV (H 0-180); red wraps around 0 so two ranges
+DEFAULT_RED_HSV_RANGES = [
+    ((0, 100, 80), (10, 255, 255)),
+    ((160, 100, 80), (180, 255, 255)),
+]
+RED_HSV_RANGES = list(DEFAULT_RED_HSV_RANGES)
+
+# Mask engine: "hsv" = blur + HSV + inRange (create_red_mask),
+# "lut" = precomputed BGR classification table, blur on the 1-channel mask,
+# "redness" = R - G / R - B tests on single-channel planes, blur on the mask
+MASK_ENGINES = ("hsv", "lut", "redness")
+DEFAULT_MASK_ENGINE = "hsv"
+MASK_ENGINE = DEFAULT_MASK_ENGINE
+_RED_LUT = RedMaskLUT()
+_REDNESS = RednessMask()
+
+# Detection region: "full" scans the whole frame, "roi" only the areas
+# around the two targets (target radius + ROI_MARGIN_PX on each side)
+DETECTION_REGIONS = ("full", "roi")
+DEFAULT_DETECTION_REGION = "full"
+DEFAULT_ROI_MARGIN_PX = 80
+DETECTION_REGION = DEFAULT_DETECTION_REGION
+ROI_MARGIN_PX = DEFAULT_ROI_MARGIN_PX
+
+# Fine (2x) Hough pass: runs only on tiles of half-size UPSAMPLE_TILE_PX
+# around weak first-pass responses and the targets, and is skipped after
+# UPSAMPLE_IDLE_FRAMES runs in a row found nothing new (one probe every
+# UPSAMPLE_PROBE_FRAMES frames while idle; 0 idle frames = never skip)
+DEFAULT_UPSAMPLE_TILE_PX = 48
+DEFAULT_UPSAMPLE_IDLE_FRAMES = 10
+DEFAULT_UPSAMPLE_PROBE_FRAMES = 15
+UPSAMPLE_TILE_PX = DEFAULT_UPSAMPLE_TILE_PX
+UPSAMPLE_IDLE_FRAMES = DEFAULT_UPSAMPLE_IDLE_FRAMES
+UPSAMPLE_PROBE_FRAMES = DEFAULT_UPSAMPLE_PROBE_FRAMES
+_UPSAMPLE = UpsampleScheduler(UPSAMPLE_IDLE_FRAMES, UPSAMPLE_PROBE_FRAMES)
+
+# Downscaled Hough: the first pass runs on the mask shrunk by this factor
+# (1 = native, 2 = half, 4 = quarter) and each circle is then refined on
+# the native mask, so hits and DEADBAND_PX stay in native pixels
+DETECT_DOWNSCALES = (1, 2, 4)
+DEFAULT_DETECT_DOWNSCALE = 1
+DETECT_DOWNSCALE = DEFAULT_DETECT_DOWNSCALE
+
+# Tracking mode: once both markers are tracked, search only windows of
+# marker radius + TRACK_WINDOW_PX around their predicted positions, with a
+# full detection every TRACK_FULL_EVERY frames or when a marker is lost
+TRACKING_MODE = False
+DEFAULT_TRACK_FULL_EVERY = 10
+DEFAULT_TRACK_WINDOW_PX = 48
+TRACK_FULL_EVERY = DEFAULT_TRACK_FULL_EVERY
+TRACK_WINDOW_PX = DEFAULT_TRACK_WINDOW_PX
+_SEARCH = SearchWindows(TRACK_FULL_EVERY, TRACK_WINDOW_PX)
+
 # Debug view
 SHOW_MASK = False
 
+# Multi-camera mode: one settings block per station in "cameras" (camera,
+# frame size, targets, PLC address and tags; anything missing falls back to
+# the top-level value). Stations share CAMERA_WORKERS processing threads
+# (0 = one per core, at most one per camera) and always run headless.
+CAMERAS = []
+CAMERA_WORKERS = 0
+
+# Headless mode: no control panel, no preview window, no overlay drawing;
+# detection, hit logic and PLC writes only (settings "headless" or --headless)
+HEADLESS = False
+
+# Preview runs on its own thread at up to PREVIEW_FPS, optionally shown at
+# PREVIEW_SCALE of the camera resolution; detection is not throttled
+DEFAULT_PREVIEW_FPS = 15
+DEFAULT_PREVIEW_SCALE = 1.0
+PREVIEW_FPS = DEFAULT_PREVIEW_FPS
+PREVIEW_SCALE = DEFAULT_PREVIEW_SCALE
+
+# Event log: one binary record per processed frame (detections, raw and
+# debounced hits, stage latencies) under EVENT_LOG_DIR ("" = off), rotated
+# every EVENT_LOG_RECORDS rows; EVENT_LOG_KEEP_FILES > 0 deletes older files
+EVENT_LOG_DIR = ""
+DEFAULT_EVENT_LOG_RECORDS = 216000  # one hour at 60 fps
+EVENT_LOG_RECORDS = DEFAULT_EVENT_LOG_RECORDS
+EVENT_LOG_KEEP_FILES = 0
+_EVENT_LOG = None
+
+# Clip capture: on a trigger ("hit" = a debounced hit changes, "dropout" =
+# a tracked marker is lost) the CLIP_PRE_S seconds before and CLIP_POST_S
+# after are saved under CLIP_DIR ("" = off). Frames held for clips are
+# capped at CLIP_BUDGET_MB; the detection loop never waits for the encoder.
+CLIP_DIR = ""
+CLIP_TRIGGER_KINDS = ("hit", "dropout")
+CLIP_TRIGGERS = list(CLIP_TRIGGER_KINDS)
+DEFAULT_CLIP_PRE_S = 3.0
+DEFAULT_CLIP_POST_S = 3.0
+DEFAULT_CLIP_BUDGET_MB = 256
+CLIP_PRE_S = DEFAULT_CLIP_PRE_S
+CLIP_POST_S = DEFAULT_CLIP_POST_S
+CLIP_BUDGET_MB = DEFAULT_CLIP_BUDGET_MB
+CLIP_FORMATS = ("avi", "mp4")
+CLIP_FORMAT = "avi"
+_CLIPS = None
+
 # Targets (relative to frame size)
 # Centers defined as fractions so they move with the frame
 TARGET1_REL_X = 0.33
@@ -78,7 +287,19 @@ def _settings_path():
     return os.path.join(base_dir, "settings.json")
 
 
-def load_settings():
+def _capture_control(value, current):
+    """"auto", "lock" or a number from settings; `current` when missing or invalid."""
+    if value is None:
+        return current
+    if str(value).lower() in ("auto", "lock"):
+        return str(value).lower()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return current
+
+
+def load_settings(path=None):
     global CAMERA_INDEX, FRAME_WIDTH, FRAME_HEIGHT
     global TARGET1_REL_X, TARGET1_REL_Y, TARGET1_DIAMETER
     global TARGET2_REL_X, TARGET2_REL_Y, TARGET2_DIAMETER
@@ -86,8 +307,20 @@ def load_settings():
     global ON_FRAMES, OFF_FRAMES, APPEAR_FRAMES, HOLD_FRAMES
     global STABILITY_FRAMES
     global USE_FAST_DETECTION
-
-    path = _settings_path()
+    global CAPTURE_BUFFER_SLOTS, CAPTURE_DROP_POLICY, BUFFER_POOL
+    global CAPTURE_FOURCC, CAPTURE_FPS, CAPTURE_BUFFER_SIZE, CAPTURE_EXPOSURE, CAPTURE_WHITE_BALANCE
+    global PIPELINE_MODE, PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE, PROCESS_WORKERS
+    global DETECTION_REGION, ROI_MARGIN_PX
+    global MASK_ENGINE, RED_HSV_RANGES
+    global UPSAMPLE_TILE_PX, UPSAMPLE_IDLE_FRAMES, UPSAMPLE_PROBE_FRAMES, DETECT_DOWNSCALE
+    global TRACKING_MODE, TRACK_FULL_EVERY, TRACK_WINDOW_PX, TRACK_GATE_PX
+    global METRICS_HOST, METRICS_PORT
+    global HEADLESS, PREVIEW_FPS, PREVIEW_SCALE
+    global EVENT_LOG_DIR, EVENT_LOG_RECORDS, EVENT_LOG_KEEP_FILES
+    global CLIP_DIR, CLIP_TRIGGERS, CLIP_PRE_S, CLIP_POST_S, CLIP_BUDGET_MB, CLIP_FORMAT
+    global PLC_TAGS, PLC_IP, PLC_SLOT, CAMERAS, CAMERA_WORKERS, PLC_HEARTBEAT_TAG, PLC_FRAME_RATE_TAG, PLC_HEARTBEAT_S, PLC_READBACK_S
+
+    path = path or _settings_path()
     if not os.path.exists(path):
         return
 
@@ -141,6 +374,89 @@ def load_settings():
             HOLD_FRAMES = max(1, STABILITY_FRAMES * 2)
         USE_FAST_DETECTION = bool(
             data.get("fast_detection_mode", USE_FAST_DETECTION))
+        CAPTURE_BUFFER_SLOTS = max(2, int(
+            data.get("capture_buffer_slots", CAPTURE_BUFFER_SLOTS)))
+        policy = str(data.get("capture_drop_policy", CAPTURE_DROP_POLICY))
+        if policy in CAPTURE_POLICIES:
+            CAPTURE_DROP_POLICY = policy
+        fourcc = str(data.get("capture_fourcc", CAPTURE_FOURCC))
+        fourcc = "auto" if fourcc.lower() == "auto" else fourcc.upper()
+        if fourcc in CAPTURE_FOURCCS:
+            CAPTURE_FOURCC = fourcc
+        CAPTURE_FPS = max(0.0, float(data.get("capture_fps", CAPTURE_FPS)))
+        CAPTURE_BUFFER_SIZE = max(0, int(data.get("capture_buffer_size", CAPTURE_BUFFER_SIZE)))
+        CAPTURE_EXPOSURE = _capture_control(data.get("capture_exposure"), CAPTURE_EXPOSURE)
+        CAPTURE_WHITE_BALANCE = _capture_control(
+            data.get("capture_white_balance"), CAPTURE_WHITE_BALANCE)
+        BUFFER_POOL = bool(data.get("buffer_pool", BUFFER_POOL))
+        PIPELINE_MODE = bool(data.get("pipeline_mode", PIPELINE_MODE))
+        PIPELINE_WORKERS = max(1, int(
+            data.get("pipeline_workers", PIPELINE_WORKERS)))
+        PIPELINE_QUEUE_SIZE = max(1, int(
+            data.get("pipeline_queue_size", PIPELINE_QUEUE_SIZE)))
+        PROCESS_WORKERS = max(-1, int(data.get("process_workers", PROCESS_WORKERS)))
+        region = str(data.get("detection_region", DETECTION_REGION))
+        if region in DETECTION_REGIONS:
+            DETECTION_REGION = region
+        ROI_MARGIN_PX = max(0, int(data.get("roi_margin_px", ROI_MARGIN_PX)))
+        engine = str(data.get("mask_engine", MASK_ENGINE))
+        if engine in MASK_ENGINES:
+            MASK_ENGINE = engine
+        ranges = data.get("red_hsv_ranges")
+        if ranges:
+            RED_HSV_RANGES = [(tuple(int(v) for v in lo), tuple(int(v) for v in hi))
+                              for lo, hi in ranges]
+        UPSAMPLE_TILE_PX = max(8, int(
+            data.get("upsample_tile_px", UPSAMPLE_TILE_PX)))
+        UPSAMPLE_IDLE_FRAMES = max(0, int(
+            data.get("upsample_idle_frames", UPSAMPLE_IDLE_FRAMES)))
+        UPSAMPLE_PROBE_FRAMES = max(1, int(
+            data.get("upsample_probe_frames", UPSAMPLE_PROBE_FRAMES)))
+        _UPSAMPLE.configure(UPSAMPLE_IDLE_FRAMES, UPSAMPLE_PROBE_FRAMES)
+        downscale = int(data.get("detect_downscale", DETECT_DOWNSCALE))
+        if downscale in DETECT_DOWNSCALES:
+            DETECT_DOWNSCALE = downscale
+        TRACKING_MODE = bool(data.get("tracking_mode", TRACKING_MODE))
+        TRACK_FULL_EVERY = max(1, int(
+            data.get("track_full_every", TRACK_FULL_EVERY)))
+        TRACK_WINDOW_PX = max(4, int(
+            data.get("track_window_px", TRACK_WINDOW_PX)))
+        _SEARCH.configure(TRACK_FULL_EVERY, TRACK_WINDOW_PX)
+        TRACK_GATE_PX = max(1, int(data.get("track_gate_px", TRACK_GATE_PX)))
+        METRICS_HOST = str(data.get("metrics_host", METRICS_HOST))
+        METRICS_PORT = max(0, int(data.get("metrics_port", METRICS_PORT)))
+        HEADLESS = bool(data.get("headless", HEADLESS))
+        PREVIEW_FPS = max(1.0, min(120.0, float(data.get("preview_fps", PREVIEW_FPS))))
+        PREVIEW_SCALE = max(0.1, min(1.0, float(data.get("preview_scale", PREVIEW_SCALE))))
+        EVENT_LOG_DIR = str(data.get("event_log_dir", EVENT_LOG_DIR) or "")
+        EVENT_LOG_RECORDS = max(1000, int(data.get("event_log_records", EVENT_LOG_RECORDS)))
+        EVENT_LOG_KEEP_FILES = max(0, int(data.get("event_log_keep_files", EVENT_LOG_KEEP_FILES)))
+        CLIP_DIR = str(data.get("clip_dir", CLIP_DIR) or "")
+        triggers = data.get("clip_triggers", CLIP_TRIGGERS)
+        if isinstance(triggers, list):
+            CLIP_TRIGGERS = [str(t) for t in triggers if str(t) in CLIP_TRIGGER_KINDS]
+        CLIP_PRE_S = max(0.0, float(data.get("clip_pre_s", CLIP_PRE_S)))
+        CLIP_POST_S = max(0.0, float(data.get("clip_post_s", CLIP_POST_S)))
+        CLIP_BUDGET_MB = max(16, int(data.get("clip_budget_mb", CLIP_BUDGET_MB)))
+        clip_format = str(data.get("clip_format", CLIP_FORMAT)).lower().lstrip(".")
+        if clip_format in CLIP_FORMATS:
+            CLIP_FORMAT = clip_format
+        tags = data.get("plc_tags")
+        if isinstance(tags, dict):
+            unknown = [k for k in tags if k not in PLC_OUTPUT_TYPES]
+            if unknown:
+                print(f"Warning: Ignoring unknown PLC outputs: {', '.join(unknown)}")
+            PLC_TAGS = {k: str(v) for k, v in tags.items() if k in PLC_OUTPUT_TYPES and v}
+        PLC_IP = str(data.get("plc_ip", PLC_IP))
+        PLC_SLOT = int(data.get("plc_slot", PLC_SLOT))
+        cameras = data.get("cameras")
+        if isinstance(cameras, list):
+            CAMERAS = [c for c in cameras if isinstance(c, dict)]
+        CAMERA_WORKERS = max(0, int(data.get("camera_workers", CAMERA_WORKERS)))
+        PLC_HEARTBEAT_TAG = str(data.get("plc_heartbeat_tag", PLC_HEARTBEAT_TAG) or "")
+        PLC_FRAME_RATE_TAG = str(data.get("plc_frame_rate_tag", PLC_FRAME_RATE_TAG) or "")
+        PLC_HEARTBEAT_S = max(0.1, float(data.get("plc_heartbeat_s", PLC_HEARTBEAT_S)))
+        PLC_READBACK_S = max(0.0, float(data.get("plc_readback_s", PLC_READBACK_S)))
     except Exception as e:
         print(f"Warning: Invalid settings content, using defaults: {e}")
 
@@ -168,7 +484,55 @@ def save_settings():
         "hold_frames": int(HOLD_FRAMES),
         "stability_frames": int(STABILITY_FRAMES),
         "fast_detection_mode": bool(USE_FAST_DETECTION),
+        "capture_buffer_slots": int(CAPTURE_BUFFER_SLOTS),
+        "capture_drop_policy": CAPTURE_DROP_POLICY,
+        "capture_fourcc": CAPTURE_FOURCC,
+        "capture_fps": float(CAPTURE_FPS),
+        "capture_buffer_size": int(CAPTURE_BUFFER_SIZE),
+        "capture_exposure": CAPTURE_EXPOSURE,
+        "capture_white_balance": CAPTURE_WHITE_BALANCE,
+        "buffer_pool": bool(BUFFER_POOL),
+        "pipeline_mode": bool(PIPELINE_MODE),
+        "pipeline_workers": int(PIPELINE_WORKERS),
+        "pipeline_queue_size": int(PIPELINE_QUEUE_SIZE),
+        "process_workers": int(PROCESS_WORKERS),
+        "detection_region": DETECTION_REGION,
+        "roi_margin_px": int(ROI_MARGIN_PX),
+        "mask_engine": MASK_ENGINE,
+        "red_hsv_ranges": [[list(lo), list(hi)] for lo, hi in RED_HSV_RANGES],
+        "upsample_tile_px": int(UPSAMPLE_TILE_PX),
+        "upsample_idle_frames": int(UPSAMPLE_IDLE_FRAMES),
+        "upsample_probe_frames": int(UPSAMPLE_PROBE_FRAMES),
+        "detect_downscale": int(DETECT_DOWNSCALE),
+        "tracking_mode": bool(TRACKING_MODE),
+        "track_full_every": int(TRACK_FULL_EVERY),
+        "track_window_px": int(TRACK_WINDOW_PX),
+        "track_gate_px": int(TRACK_GATE_PX),
+        "metrics_host": METRICS_HOST,
+        "metrics_port": int(METRICS_PORT),
+        "headless": bool(HEADLESS),
+        "preview_fps": PREVIEW_FPS,
+        "preview_scale": PREVIEW_SCALE,
+        "event_log_dir": EVENT_LOG_DIR,
+        "event_log_records": int(EVENT_LOG_RECORDS),
+        "event_log_keep_files": int(EVENT_LOG_KEEP_FILES),
+        "clip_dir": CLIP_DIR,
+        "clip_triggers": list(CLIP_TRIGGERS),
+        "clip_pre_s": float(CLIP_PRE_S),
+        "clip_post_s": float(CLIP_POST_S),
+        "clip_budget_mb": int(CLIP_BUDGET_MB),
+        "clip_format": CLIP_FORMAT,
+        "plc_ip": PLC_IP,
+        "plc_slot": int(PLC_SLOT),
+        "plc_tags": dict(PLC_TAGS),
+        "plc_heartbeat_tag": PLC_HEARTBEAT_TAG,
+        "plc_frame_rate_tag": PLC_FRAME_RATE_TAG,
+        "plc_heartbeat_s": PLC_HEARTBEAT_S,
+        "plc_readback_s": PLC_READBACK_S,
     }
+    if CAMERAS:
+        data["cameras"] = CAMERAS
+        data["camera_workers"] = int(CAMERA_WORKERS)
 
     path = _settings_path()
     try:
@@ -178,154 +542,197 @@ def save_settings():
         print(f"Warning: Failed to save settings: {e}")
 
 
-def create_red_mask(frame):
-    """Create a binary mask for red regions with blur + HSV threshold + morphology."""
-    blurred = cv2.GaussianBlur(frame, (9, 9), 2)
-    hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
-    lower_red1 = (0, 100, 80)
-    upper_red1 = (10, 255, 255)
-    lower_red2 = (160, 100, 80)
-    upper_red2 = (180, 255, 255)
-    mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-    mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-    mask = cv2.bitwise_or(mask1, mask2)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
-    mask = cv2.medianBlur(mask, 5)
-    return mask
+_OPEN_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+
+def _scratch(pool, name, shape):
+    """Pool buffer for an OpenCV dst argument (None = let OpenCV allocate)."""
+    return None if pool is None else pool.get(name, shape)
+
+
+def create_red_mask(frame, pool=None, name="mask"):
+    """Create a binary mask for red regions with blur + HSV threshold + morphology.
+
+    With a BufferPool every step writes into its buffers; the result is
+    the pool's `name` buffer.
+    """
+    h, w = frame.shape[:2]
+    blurred = cv2.GaussianBlur(frame, (9, 9), 2, dst=_scratch(pool, "blur", frame.shape))
+    hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV, dst=_scratch(pool, "hsv", frame.shape))
+    mask = None
+    for lower_red, upper_red in RED_HSV_RANGES:
+        if mask is None:
+            mask = cv2.inRange(hsv, lower_red, upper_red, dst=_scratch(pool, "red", (h, w)))
+        else:
+            part = cv2.inRange(hsv, lower_red, upper_red, dst=_scratch(pool, "red_part", (h, w)))
+            cv2.bitwise_or(mask, part, dst=mask)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, _OPEN_KERNEL, iterations=1,
+                            dst=_scratch(pool, "opened", (h, w)))
+    return cv2.medianBlur(mask, 5, dst=_scratch(pool, name, (h, w)))
+
+
+def _smooth_mask(mask, pool=None, name="mask"):
+    """Blur, re-threshold, open and median-filter a raw 1-channel red mask."""
+    h, w = mask.shape[:2]
+    # Blur the 1-channel mask instead of the 3-channel frame. Blurring before
+    # the HSV test lets red bleed outward at disc edges; a low re-threshold
+    # (48 of 255) reproduces that growth best on synthetic frames.
+    mask = cv2.GaussianBlur(mask, (9, 9), 2, dst=_scratch(pool, "blur", (h, w)))
+    cv2.threshold(mask, 48, 255, cv2.THRESH_BINARY, dst=mask)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, _OPEN_KERNEL, iterations=1,
+                            dst=_scratch(pool, "opened", (h, w)))
+    return cv2.medianBlur(mask, 5, dst=_scratch(pool, name, (h, w)))
+
+
+def create_red_mask_lut(frame, pool=None, name="mask"):
+    """Red mask via the BGR lookup table, blurred and re-thresholded as one channel."""
+    h, w = frame.shape[:2]
+    mask = _RED_LUT.classify(frame, RED_HSV_RANGES, dst=_scratch(pool, "red", (h, w)))
+    return _smooth_mask(mask, pool, name)
+
+
+def create_red_mask_redness(frame, pool=None, name="mask"):
+    """Red mask from single-channel redness tests, blurred and re-thresholded."""
+    h, w = frame.shape[:2]
+    mask = _REDNESS.classify(frame, RED_HSV_RANGES, dst=_scratch(pool, "red", (h, w)))
+    return _smooth_mask(mask, pool, name)
+
+
+def build_red_mask(frame, pool=None, name="mask"):
+    """Red mask from the engine selected by MASK_ENGINE."""
+    if MASK_ENGINE == "lut":
+        return create_red_mask_lut(frame, pool, name)
+    if MASK_ENGINE == "redness":
+        return create_red_mask_redness(frame, pool, name)
+    return create_red_mask(frame, pool, name)
 
 # = Hughes Circles =======================================================================
 
 
-def detect_red_circles_houghes(frame, max_count: int = 2, mask=None):
-    """Return up to `max_count` red circles as a list of (x, y, r)."""
+def detect_red_circles_houghes(frame, max_count: int = 2, mask=None, targets=(), upsample=None,
+                               pool=None, downscale=None):
+    """Return up to `max_count` red circles as a list of (x, y, r).
+
+    `targets` are (x, y, r) target positions in `mask` coordinates; the
+    fine 2x pass looks around them and around weak first-pass responses.
+    `upsample` is the fallback scheduler (default: the module's _UPSAMPLE),
+    which counts each call as one frame; detect_circles runs the passes
+    itself so a frame split into several regions still counts once.
+    `pool` is an optional BufferPool for the candidate validation scratch.
+    `downscale` (default DETECT_DOWNSCALE) > 1 runs the first pass on a
+    shrunk mask and refines its circles on `mask` before validation.
+    """
+    upsample = upsample or _UPSAMPLE
     if mask is None:
-        mask = create_red_mask(frame)
+        mask = build_red_mask(frame)
+    candidates, weak = _hough_first_pass(mask, pool, downscale)
+
+    # Still short: upsample small tiles around weak responses and targets
+    if upsample.should_run(len(candidates) < max_count):
+        upsample.record(*_fine_pass(mask, candidates, weak, targets, pool))
+
+    # Sort by radius and keep up to max_count
+    candidates.sort(key=lambda c: c[2], reverse=True)
+    return candidates[:max_count]
+
+
+def _min_dist():
+    return max(12, 6 * max(1, MIN_RADIUS))
 
-    min_dist = max(12, 6 * max(1, MIN_RADIUS))
+
+def _hough_first_pass(mask, pool=None, downscale=None):
+    """(validated circles, weak circles that failed validation) of the first Hough pass."""
+    scale = DETECT_DOWNSCALE if downscale is None else int(downscale)
+    small = mask
+    if scale > 1:
+        h, w = mask.shape[:2]
+        shape = (max(1, h // scale), max(1, w // scale))
+        small = cv2.resize(mask, shape[::-1], dst=_scratch(pool, "downscaled", shape),
+                           interpolation=cv2.INTER_AREA)
+    # Distances and radii shrink with the mask. The vote threshold does
+    # not: lowering it floods the refinement with hundreds of candidates.
     circles = cv2.HoughCircles(
-        mask,
+        small,
         cv2.HOUGH_GRADIENT,
         dp=1.2,
-        minDist=int(min_dist),
+        minDist=max(1, int(_min_dist() / scale)),
         param1=100,
         param2=int(HOUGH_PARAM2),
-        minRadius=int(MIN_RADIUS),
+        minRadius=int(MIN_RADIUS) if scale == 1 else max(1, int(MIN_RADIUS / scale)),
         maxRadius=0,
     )
 
     candidates = []
+    weak = []
     if circles is not None and len(circles) > 0:
-        h, w = mask.shape[:2]
-        for (x_f, y_f, r_f) in circles[0]:
-            x = int(x_f)
-            y = int(y_f)
-            r = int(r_f)
-            # Skip degenerate
-            if r <= 0:
-                continue
-
-            # ROI around the circle
-            x0 = max(0, x - r)
-            y0 = max(0, y - r)
-            x1 = min(w, x + r)
-            y1 = min(h, y + r)
-            if x1 <= x0 or y1 <= y0:
-                continue
-
-            sub = mask[y0:y1, x0:x1]
-
-            # Find the largest contour in this ROI
-            cnts, _ = cv2.findContours(
-                sub, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            if not cnts:
-                continue
-            cnt = max(cnts, key=cv2.contourArea)
-            area = float(cv2.contourArea(cnt))
-            perim = float(cv2.arcLength(cnt, True))
-            if perim <= 0.0 or area <= 0.0:
-                continue
-
-            circularity = 4.0 * math.pi * area / (perim * perim)
-
-            # Compute fill ratio: area of red within the ideal circle area
-            # Create a circular mask within ROI
-            circle_mask = sub.copy()
-            circle_mask[:] = 0
-            cv2.circle(circle_mask, (x - x0, y - y0),
-                       r, color=255, thickness=-1)
-            filled = cv2.bitwise_and(sub, circle_mask)
-            red_area_inside_circle = float(cv2.countNonZero(filled))
-            circle_area = math.pi * (r ** 2)
-            fill_ratio = red_area_inside_circle / circle_area if circle_area > 0 else 0.0
-
-            # Thresholds: tune if needed
-            if circularity >= 0.87 and 0.75 <= fill_ratio <= 1.25:
+        if scale > 1:
+            # A loose fill test on the small mask drops giant and empty
+            # circles before any native-resolution work
+            coarse = [(int(round(x_f)), int(round(y_f)), max(1, int(round(r_f))))
+                      for (x_f, y_f, r_f) in circles[0]]
+            keep = validate_candidates(small, coarse, min_circularity=0.0,
+                                       fill_range=(0.5, 2.0), pool=pool)
+            first = refine_circles(mask, [c for c, ok in zip(circles[0], keep) if ok], scale)
+        else:
+            first = [(int(x_f), int(y_f), int(r_f)) for (x_f, y_f, r_f) in circles[0]]
+        # Circularity + fill ratio for all candidates in one batched pass
+        passed = validate_candidates(mask, first, pool=pool)
+        candidates = [c for c, ok in zip(first, passed) if ok]
+        weak = [c for c, ok in zip(first, passed) if not ok]
+    return candidates, weak
+
+
+def _fine_pass(mask, candidates, weak, targets, pool=None):
+    """2x pass around `weak` circles and `targets`; new circles are appended to `candidates`.
+
+    Returns (tiles searched, whether anything new was found) for the scheduler.
+    """
+    tiles = fallback_tiles(mask.shape, weak, targets, UPSAMPLE_TILE_PX)
+    found_new = False
+    for (x0, y0, x1, y1) in tiles:
+        for (x, y, r) in _upsampled_pass(mask, (x0, y0, x1, y1), _min_dist(), pool):
+            # Deduplicate by center proximity (<=5 px)
+            dup = False
+            for (ex, ey, er) in candidates:
+                if (ex - x) * (ex - x) + (ey - y) * (ey - y) <= 25:
+                    dup = True
+                    break
+            if not dup:
                 candidates.append((x, y, r))
-
-    # If we still have fewer than desired circles, upsample mask and try again
-    if len(candidates) < max_count:
-        mask_up = cv2.resize(mask, None, fx=2.0, fy=2.0,
-                             interpolation=cv2.INTER_LINEAR)
-        circles2 = cv2.HoughCircles(
-            mask_up,
-            cv2.HOUGH_GRADIENT,
-            dp=1.2,
-            minDist=int(min_dist * 2),     # scaled with 2x
-            param1=100,
-            param2=int(HOUGH_PARAM2),
-            minRadius=int(max(2, MIN_RADIUS) * 2),    # scaled with 2x
-            maxRadius=0,
-        )
-        if circles2 is not None and len(circles2) > 0:
-            h, w = mask.shape[:2]
-            for (x2, y2, r2) in circles2[0]:
-                x = int(round(x2 / 2.0))
-                y = int(round(y2 / 2.0))
-                r = int(round(r2 / 2.0))
-                if r <= 0:
-                    continue
-                # Validate at original scale using the same criteria
-                x0 = max(0, x - r)
-                y0 = max(0, y - r)
-                x1 = min(w, x + r)
-                y1 = min(h, y + r)
-                if x1 <= x0 or y1 <= y0:
-                    continue
-                sub = mask[y0:y1, x0:x1]
-                cnts, _ = cv2.findContours(
-                    sub, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                if not cnts:
-                    continue
-                cnt = max(cnts, key=cv2.contourArea)
-                area = float(cv2.contourArea(cnt))
-                perim = float(cv2.arcLength(cnt, True))
-                if perim <= 0.0 or area <= 0.0:
-                    continue
-                circularity = 4.0 * math.pi * area / (perim * perim)
-                circle_mask = sub.copy()
-                circle_mask[:] = 0
-                cv2.circle(circle_mask, (x - x0, y - y0),
-                           r, color=255, thickness=-1)
-                filled = cv2.bitwise_and(sub, circle_mask)
-                red_area_inside_circle = float(cv2.countNonZero(filled))
-                circle_area = math.pi * (r ** 2)
-                fill_ratio = red_area_inside_circle / circle_area if circle_area > 0 else 0.0
-                if circularity >= 0.87 and 0.75 <= fill_ratio <= 1.25:
-                    # Deduplicate by center proximity (<=5 px)
-                    dup = False
-                    for (ex, ey, er) in candidates:
-                        if (ex - x) * (ex - x) + (ey - y) * (ey - y) <= 25:
-                            dup = True
-                            break
-                    if not dup:
-                        candidates.append((x, y, r))
-
-    # Sort by radius and keep up to max_count
-    candidates.sort(key=lambda c: c[2], reverse=True)
-    candidates = candidates[:max_count]
-
-    return candidates
+                found_new = True
+    return len(tiles), found_new
+
+
+def _upsampled_pass(mask, tile, min_dist, pool=None):
+    """Hough at 2x on one (x0, y0, x1, y1) tile of `mask`.
+
+    Returns the validated circles in `mask` coordinates.
+    """
+    x0, y0, x1, y1 = tile
+    up_shape = (2 * (y1 - y0), 2 * (x1 - x0))
+    dst = None
+    if pool is not None:
+        # Tiles vary in size; reserve room for the whole mask at 2x
+        dst = pool.get("upsampled", up_shape, capacity=(2 * mask.shape[0], 2 * mask.shape[1]))
+    mask_up = cv2.resize(mask[y0:y1, x0:x1], up_shape[::-1], dst=dst,
+                         interpolation=cv2.INTER_LINEAR)
+    circles2 = cv2.HoughCircles(
+        mask_up,
+        cv2.HOUGH_GRADIENT,
+        dp=1.2,
+        minDist=int(min_dist * 2),     # scaled with 2x
+        param1=100,
+        param2=int(HOUGH_PARAM2),
+        minRadius=int(max(2, MIN_RADIUS) * 2),    # scaled with 2x
+        maxRadius=0,
+    )
+    if circles2 is None or len(circles2) == 0:
+        return []
+    second = [(int(round(x2 / 2.0)) + x0, int(round(y2 / 2.0)) + y0, int(round(r2 / 2.0)))
+              for (x2, y2, r2) in circles2[0]]
+    # Validate at original scale using the same criteria
+    passed = validate_candidates(mask, second, pool=pool)
+    return [c for c, ok in zip(second, passed) if ok]
 
 # = FAST RED CIRCLES ==================================================================
 
@@ -333,7 +740,7 @@ def detect_red_circles_houghes(frame, max_count: int = 2, mask=None):
 def detect_red_circles(frame, max_count=2, mask=None):
     """Contour-based red detection (fast)."""
     if mask is None:
-        mask = create_red_mask(frame)
+        mask = build_red_mask(frame)
     contours, _ = cv2.findContours(
         mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     results = []
@@ -357,290 +764,1129 @@ def detect_red_circles(frame, max_count=2, mask=None):
 # ======================================================================================
 
 
-def run_camera(stop_event: threading.Event):
-    if platform.system() == "Windows":
-        cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
+class TrackingState:
+    """Tracking and hit-debounce state carried from one frame to the next."""
+
+    def __init__(self):
+        self.tracker = Tracker(TRACK_GATE_PX, APPEAR_FRAMES, HOLD_FRAMES, DEADBAND_PX)
+        self.last_hit = [False, False]  # hysteresis state
+        self.disp_hit = [False, False]  # displayed/PLC state after temporal filtering
+        self.off_count = [0, 0]
+        self.clip_hits = (False, False)  # hits and marker count at the last clip check
+        self.clip_markers = 0
+
+
+def target_geometry(w, h, station=None):
+    """Return ((x, y, r), (x, y, r)) for both targets in pixels of a w x h frame.
+
+    Uses the station's targets when given, else the global TARGET* settings.
+    """
+    if station is not None:
+        return tuple((int(rx * w), int(ry * h), int(d) // 2) for (rx, ry, d) in station.targets)
+    return (
+        (int(TARGET1_REL_X * w), int(TARGET1_REL_Y * h), TARGET1_DIAMETER // 2),
+        (int(TARGET2_REL_X * w), int(TARGET2_REL_Y * h), TARGET2_DIAMETER // 2),
+    )
+
+
+def detection_regions(w, h, station=None):
+    """Return the (x0, y0, x1, y1) regions of a w x h frame to scan.
+
+    Full-frame mode yields the whole frame. ROI mode yields one box per
+    target (radius + ROI_MARGIN_PX), merged into one when they overlap.
+    """
+    if DETECTION_REGION != "roi":
+        return [(0, 0, w, h)]
+    boxes = []
+    for (t_x, t_y, t_r) in target_geometry(w, h, station):
+        half = t_r + ROI_MARGIN_PX
+        x0, y0 = max(0, t_x - half), max(0, t_y - half)
+        x1, y1 = min(w, t_x + half), min(h, t_y + half)
+        if x1 > x0 and y1 > y0:
+            boxes.append((x0, y0, x1, y1))
+    if len(boxes) == 2:
+        (ax0, ay0, ax1, ay1), (bx0, by0, bx1, by1) = boxes
+        if ax0 < bx1 and bx0 < ax1 and ay0 < by1 and by0 < ay1:
+            boxes = [(min(ax0, bx0), min(ay0, by0), max(ax1, bx1), max(ay1, by1))]
+    return boxes
+
+
+def search_regions(w, h, station=None, seq=None):
+    """Regions to scan in this frame as (regions, windowed).
+
+    In tracking mode these are the predicted windows around both markers
+    when they are locked; otherwise the detection_regions. `seq` is the
+    frame's sequence number when it is planned ahead of tracking.
+    """
+    if TRACKING_MODE:
+        search = station.search if station is not None else _SEARCH
+        windows = search.plan(w, h, seq)
+        if windows is not None:
+            return windows, True
+    return detection_regions(w, h, station), False
+
+
+def create_region_masks(frame, regions=None, pool=None):
+    """Red masks for each detection region as [((x0, y0, x1, y1), mask), ...].
+
+    With a BufferPool the masks live in its buffers until the next call.
+    """
+    if regions is None:
+        h, w = frame.shape[:2]
+        regions = detection_regions(w, h)
+    return [((x0, y0, x1, y1), build_red_mask(frame[y0:y1, x0:x1], pool, f"mask{i}"))
+            for i, (x0, y0, x1, y1) in enumerate(regions)]
+
+
+def _preview_masks(region_masks, pool):
+    """Region masks safe to hand to the preview thread."""
+    if pool is None or not SHOW_MASK:
+        return region_masks
+    # Pool masks are overwritten by the next frame; the mask window gets copies
+    return [(roi, mask.copy()) for roi, mask in region_masks]
+
+
+def compose_region_masks(region_masks, shape):
+    """Paste region masks into a full-frame mask (debug view only)."""
+    if len(region_masks) == 1 and region_masks[0][1].shape[:2] == tuple(shape[:2]):
+        return region_masks[0][1]
+    full = np.zeros(shape[:2], dtype=np.uint8)
+    for (x0, y0, x1, y1), mask in region_masks:
+        full[y0:y1, x0:x1] = mask
+    return full
+
+
+def detect_circles(frame, region_masks, max_count=2, station=None, pool=None, upsample=None):
+    """Run the detector selected by USE_FAST_DETECTION over each region.
+
+    Circles are mapped back to frame coordinates and the largest
+    `max_count` across all regions are kept. With Hough, the 2x fallback
+    is decided once per frame from the first-pass circles of all regions,
+    so the scheduler's idle/probe counts and fire rate are per frame.
+    `upsample` overrides the scheduler (default: the station's or _UPSAMPLE).
+    """
+    circles = []
+    h, w = frame.shape[:2]
+    if USE_FAST_DETECTION:
+        for (x0, y0, x1, y1), mask in region_masks:
+            found = detect_red_circles(frame[y0:y1, x0:x1], max_count=max_count, mask=mask)
+            circles.extend((x + x0, y + y0, r) for (x, y, r) in found)
     else:
-        cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_V4L2)
+        targets = target_geometry(w, h, station)
+        if upsample is None:
+            upsample = station.upsample if station is not None else _UPSAMPLE
+        passes = [_hough_first_pass(mask, pool) for _, mask in region_masks]
+        if upsample.should_run(sum(len(found) for found, _ in passes) < max_count):
+            tiles = 0
+            found_new = False
+            for ((x0, y0, x1, y1), mask), (found, weak) in zip(region_masks, passes):
+                local = [(t_x - x0, t_y - y0, t_r) for (t_x, t_y, t_r) in targets
+                         if x0 <= t_x < x1 and y0 <= t_y < y1]
+                n, new = _fine_pass(mask, found, weak, local, pool)
+                tiles += n
+                found_new = found_new or new
+            upsample.record(tiles, found_new)
+        for ((x0, y0, x1, y1), _), (found, _) in zip(region_masks, passes):
+            circles.extend((x + x0, y + y0, r) for (x, y, r) in found)
+    circles.sort(key=lambda c: c[2], reverse=True)
+    return circles[:max_count]
+
+
+def update_tracking(state: TrackingState, circles, w, h, station=None):
+    """Match, smooth and debounce one frame of detections.
+
+    Returns (displayed circles, target geometry, (disp_hit1, disp_hit2)).
+    """
+    metrics = station.metrics if station is not None else METRICS
+    # Optimal assignment keeps IDs stable; tracks are held for HOLD_FRAMES
+    t0 = time.perf_counter()
+    tracker = state.tracker
+    tracker.configure(TRACK_GATE_PX, APPEAR_FRAMES, HOLD_FRAMES, DEADBAND_PX)
+    next_displayed = tracker.update(circles)
+    t1 = time.perf_counter()
+    metrics.observe("track", (t1 - t0) * 1000.0)
+
+    # Determine if the red circle center is inside each target
+    # Debounced hit logic using hysteresis based on DEADBAND_PX
+    targets = target_geometry(w, h, station)
+    for i, (t_x, t_y, t_r) in enumerate(targets):
+        # Best (max) inside margin across all real-time circle positions
+        # margin = target_radius - distance_to_center (positive -> inside)
+        best_margin = float('-inf')
+        for (x, y, _) in circles:
+            best_margin = max(best_margin, t_r - math.hypot(x - t_x, y - t_y))
+
+        # Apply hysteresis: turn ON only when clearly inside by deadband; OFF when clearly outside
+        hit_raw = state.last_hit[i]
+        if not hit_raw:
+            if best_margin >= DEADBAND_PX:
+                hit_raw = True
+        else:
+            if best_margin <= -DEADBAND_PX:
+                hit_raw = False
+        state.last_hit[i] = hit_raw
+
+        # Temporal filter: immediate ON; OFF only after OFF_FRAMES consecutive falses
+        if hit_raw:
+            state.disp_hit[i] = True
+            state.off_count[i] = 0
+        else:
+            state.off_count[i] += 1
+            if state.off_count[i] >= OFF_FRAMES:
+                state.disp_hit[i] = False
+                state.off_count[i] = 0
+
+    metrics.observe("hits", (time.perf_counter() - t1) * 1000.0)
+    return next_displayed, targets, (state.disp_hit[0], state.disp_hit[1])
+
+
+def plc_outputs(hits, displayed):
+    """Values for every PLC output (the writer sends only configured ones)."""
+    out = {"target1_hit": bool(hits[0]), "target2_hit": bool(hits[1]),
+           "marker_count": len(displayed)}
+    for i in range(2):
+        x, y = (displayed[i][0], displayed[i][1]) if i < len(displayed) else (-1, -1)
+        out[f"marker{i + 1}_x"] = int(x)
+        out[f"marker{i + 1}_y"] = int(y)
+    return out
+
+
+def publish_hits(hits, displayed=()):
+    """Send debounced states (and marker centres) to PLC (non-blocking writer thread)."""
+    if _PLC_AVAILABLE:
+        with METRICS.timer("plc"):
+            try:
+                plc_publish_default(plc_outputs(hits, displayed))
+            except Exception:
+                pass
+
+
+def open_event_log(name=None):
+    """Started EventLog under EVENT_LOG_DIR (sub-directory `name`), or None when off."""
+    if not EVENT_LOG_DIR:
+        return None
+    directory = os.path.join(EVENT_LOG_DIR, name) if name else EVENT_LOG_DIR
+    try:
+        log = EventLog(directory, EVENT_LOG_RECORDS, keep_files=EVENT_LOG_KEEP_FILES)
+        log.start()
+        return log
+    except Exception as e:
+        print(f"Warning: Event log disabled: {e}")
+        return None
+
+
+def log_frame(log, state: TrackingState, ts, circles, hits, metrics=None):
+    """Record one frame's detections, hit states and stage latencies in `log`."""
+    if log is None:
+        return
+    m = metrics if metrics is not None else METRICS
+    log.append(ts, circles, state.last_hit, hits, m.last("mask"), m.last("detect"),
+               m.last("track"), m.last("camera_to_plc"))
+
+
+def open_clip_recorder(name=None):
+    """Started ClipRecorder under CLIP_DIR (sub-directory `name`), or None when off."""
+    if not CLIP_DIR:
+        return None
+    directory = os.path.join(CLIP_DIR, name) if name else CLIP_DIR
+    try:
+        clips = ClipRecorder(directory, CLIP_PRE_S, CLIP_POST_S, CLIP_BUDGET_MB << 20,
+                             extension="." + CLIP_FORMAT)
+        clips.start()
+        return clips
+    except Exception as e:
+        print(f"Warning: Clip capture disabled: {e}")
+        return None
+
+
+def record_clip_frame(clips, frame_buffer, state: TrackingState, ts, hits, displayed):
+    """Fire clip triggers for this frame, then hand the leased frame to `clips`.
+
+    Call after everything else is done with the frame (the preview copies
+    it in submit); the capture ring gets one of the recorder's spare
+    buffers in its place.
+    """
+    if clips is None:
+        return
+    for reason in clip_triggers(state.clip_hits, hits, state.clip_markers, len(displayed),
+                                CLIP_TRIGGERS):
+        clips.trigger(reason, ts)
+    state.clip_hits = (hits[0], hits[1])
+    state.clip_markers = len(displayed)
+    clips.add(frame_buffer.exchange(clips.spare()), ts)
+
+
+def _plc_config(block=None):
+    """PLCConfig with one tag per configured output and the watchdog channel.
+
+    `block` is a station's settings block. Its plc_ip / plc_slot override
+    the top-level ones, but its tag names never fall back to the top-level
+    tags: every station names its own (see station_plc_conflicts).
+    """
+    if block is None:
+        block = {"plc_tags": PLC_TAGS, "plc_heartbeat_tag": PLC_HEARTBEAT_TAG,
+                 "plc_frame_rate_tag": PLC_FRAME_RATE_TAG}
+    tags = block.get("plc_tags") or {}
+    return PLCConfig(ip=str(block.get("plc_ip", PLC_IP)),
+                     slot=int(block.get("plc_slot", PLC_SLOT)),
+                     tags=[PLCTag(key, str(tag), PLC_OUTPUT_TYPES[key])
+                           for key, tag in tags.items() if key in PLC_OUTPUT_TYPES and tag],
+                     heartbeat_tag=str(block.get("plc_heartbeat_tag") or ""),
+                     frame_rate_tag=str(block.get("plc_frame_rate_tag") or ""),
+                     heartbeat_interval_s=PLC_HEARTBEAT_S,
+                     readback_interval_s=PLC_READBACK_S)
+
+
+def station_plc_conflicts(blocks):
+    """Reasons the stations' PLC outputs would cross-talk; empty if none.
+
+    Every station needs its own plc_tags (an empty tag list would make its
+    writer fall back to the default target tags), and no controller tag
+    may be written by two stations on the same PLC (ip, slot).
+    """
+    problems = []
+    owners = {}
+    for i, block in enumerate(blocks):
+        name = _station_name(block, i)
+        cfg = _plc_config(block)
+        own = block.get("plc_tags") or {}
+        if not any(key in PLC_OUTPUT_TYPES and tag for key, tag in own.items()):
+            problems.append(f"{name} has no plc_tags of its own")
+        for tag in [t.tag for t in cfg.tags] + [cfg.heartbeat_tag, cfg.frame_rate_tag]:
+            if not tag:
+                continue
+            # Logix tag names are case-insensitive
+            key = (cfg.ip, cfg.slot, tag.lower())
+            if key in owners and owners[key] != name:
+                problems.append(f"{name} and {owners[key]} both write {tag} "
+                                f"on {cfg.ip} slot {cfg.slot}")
+            owners.setdefault(key, name)
+    return problems
+
+
+def render_overlay(frame, displayed, targets, hits, regions=None, scale=1.0, in_place=False):
+    """Draw targets, tracked circles and HUD on `frame`.
+
+    Returns a copy unless `in_place`. Geometry is in camera pixels and is
+    multiplied by `scale` when `frame` is a downscaled preview; the labels
+    keep showing camera pixels.
+    """
+    display = frame if in_place else frame.copy()
+
+    def px(v):
+        return int(round(v * scale))
+
+    # Outline the scanned regions when detection is ROI-restricted
+    if DETECTION_REGION == "roi" and regions:
+        for (x0, y0, x1, y1) in regions:
+            cv2.rectangle(display, (px(x0), px(y0)), (px(x1) - 1, px(y1) - 1), (128, 128, 128), 1)
+
+    # Draw target circles (blue outline) with dynamic thickness
+    for (t_x, t_y, t_r) in targets:
+        t_th = max(1, int(px(t_r) // 12))
+        cv2.circle(display, (px(t_x), px(t_y)), px(t_r), (255, 0, 0), t_th)
+
+    # Draw smoothed circles (in green) and annotate centers with dynamic thickness
+    for idx, (dx_, dy_, r_) in enumerate(displayed):
+        c_th = max(1, int(px(r_) // 12))
+        cv2.circle(display, (px(dx_), px(dy_)), px(r_), (0, 255, 0), c_th)
+        cv2.circle(display, (px(dx_), px(dy_)), 3, (0, 255, 0), -1)
+        text = f"center {idx+1}: ({dx_}, {dy_})"
+        cv2.putText(
+            display,
+            text,
+            (px(dx_) + 10, max(20, px(dy_) - 10)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (0, 255, 0),
+            2,
+            cv2.LINE_AA,
+        )
+
+    # Draw target status texts in fixed HUD positions
+    for i, (t_x, t_y, _) in enumerate(targets):
+        hud_text = f"Target {i+1}( cx={t_x}, cy={t_y} )"
+        hud_color = (0, 200, 0) if hits[i] else (255, 255, 255)
+        cv2.putText(display, hud_text, (10, 30 + 30 * i),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, hud_color, 2, cv2.LINE_AA)
+
+    # Show which detection mode is active
+    mode_text = "Mode: FAST (Contours)" if USE_FAST_DETECTION else "Mode: HUGHES (Hough Circles)"
+    cv2.putText(display, mode_text, (10, 90),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 2, cv2.LINE_AA)
+    return display
+
+
+class PreviewWindow:
+    """HighGUI preview plus the optional mask window."""
+
+    def __init__(self, window_name="Target Detection"):
+        self.window_name = window_name
+        self.mask_window_open = False
+        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+
+    def show(self, display, region_masks, frame_shape=None):
+        """Show one frame and pump HighGUI events; returns True if 'q' was pressed.
+
+        `frame_shape` is the camera frame shape when `display` is downscaled.
+        """
+        cv2.imshow(self.window_name, display)
+        # Optional mask window
+        if SHOW_MASK:
+            cv2.imshow("Red Mask", compose_region_masks(
+                region_masks, frame_shape or display.shape))
+            self.mask_window_open = True
+        else:
+            if self.mask_window_open:
+                try:
+                    cv2.destroyWindow("Red Mask")
+                except Exception:
+                    pass
+                self.mask_window_open = False
 
+        key = cv2.waitKey(1) & 0xFF
+        return key == ord('q')
+
+
+def _make_preview(stop_event: threading.Event):
+    """Preview thread fed by submit(frame, (displayed, targets, hits, region_masks))."""
+    window = []
+
+    def render(display, payload, scale):
+        # HighGUI window lives on the preview thread
+        if not window:
+            window.append(PreviewWindow())
+        displayed, targets, hits, region_masks, frame_shape = payload
+        with METRICS.timer("render"):
+            render_overlay(display, displayed, targets, hits,
+                           [roi for roi, _ in region_masks], scale=scale, in_place=True)
+        with METRICS.timer("show"):
+            return window[0].show(display, region_masks, frame_shape)
+
+    def close():
+        if window:
+            cv2.destroyAllWindows()
+
+    return PreviewRenderer(render, PREVIEW_FPS, PREVIEW_SCALE, metrics=METRICS,
+                           on_quit=lambda: _quit_from_preview(stop_event), close=close)
+
+
+def _quit_from_preview(stop_event: threading.Event):
+    # Save once when quitting via keyboard
+    try:
+        save_settings()
+    except Exception:
+        pass
+    stop_event.set()
+
+
+def _update_fps(last_ts):
+    """Fold the time since `last_ts` into CURRENT_FPS; returns the new timestamp."""
+    global CURRENT_FPS
+    now = time.time()
+    try:
+        dt = now - last_ts
+        if dt > 0:
+            # Exponential moving average for stability
+            inst = 1.0 / dt
+            if CURRENT_FPS > 0:
+                CURRENT_FPS = 0.85 * CURRENT_FPS + 0.15 * inst
+            else:
+                CURRENT_FPS = inst
+    except Exception:
+        pass
+    return now
+
+
+def configure_camera(cap, width, height, name=None):
+    """Negotiate the capture format at width x height and log what was granted.
+
+    Returns the granted settings (see negotiate_format), or None if the
+    negotiation failed and only the frame size was set. Runs on whichever
+    thread owns `cap` (the capture thread for resolution changes).
+    """
+    global CURRENT_CAPTURE_FORMAT
+    fmt = CaptureFormat(int(width), int(height), CAPTURE_FOURCC, CAPTURE_FPS,
+                        CAPTURE_BUFFER_SIZE, CAPTURE_EXPOSURE, CAPTURE_WHITE_BALANCE)
+    prefix = f"{name}: " if name else ""
+    try:
+        granted = negotiate_format(cap, fmt)
+    except Exception as e:
+        print(f"Warning: {prefix}Camera format negotiation failed: {e}")
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        return None
+    print(prefix + describe_format(fmt, granted))
+    if (granted["width"], granted["height"]) != (fmt.width, fmt.height):
+        print(f"Warning: {prefix}Camera runs at {granted['width']}x{granted['height']}, "
+              f"not {fmt.width}x{fmt.height}")
+    if fmt.fps > 0 and 0 < granted["fps"] < 0.9 * fmt.fps:
+        print(f"Warning: {prefix}Camera granted {granted['fps']:g} fps of {fmt.fps:g} requested")
+    if name is None:
+        CURRENT_CAPTURE_FORMAT = f"{granted['fourcc']} {granted['fps']:g} fps"
+    return granted
+
+
+def _open_camera():
+    global CURRENT_FRAME_WIDTH, CURRENT_FRAME_HEIGHT
+
+    cap = open_camera(CAMERA_INDEX)
     if not cap.isOpened():
         print(f"Error: Cannot open camera index {CAMERA_INDEX}")
-        return
+        return None
 
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+    configure_camera(cap, FRAME_WIDTH, FRAME_HEIGHT)
     # Record actual frame size
     try:
         w_actual = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         h_actual = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         if w_actual > 0 and h_actual > 0:
-            global CURRENT_FRAME_WIDTH, CURRENT_FRAME_HEIGHT
             CURRENT_FRAME_WIDTH = w_actual
             CURRENT_FRAME_HEIGHT = h_actual
     except Exception:
         pass
+    return cap
 
-    window_name = "Target Detection"
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
 
-    try:
-        prev_displayed = []  # Previously drawn circle centers [(x,y,r), ...]
-        last_hit1 = False  # hysteresis state
-        last_hit2 = False
-        disp_hit1 = False  # displayed/PLC state after temporal filtering
-        disp_hit2 = False
-        off_count1 = 0
-        off_count2 = 0
-        hold_counts = [0, 0]
-        mask_window_open = False
-        # last applied size to the capture
-        last_w_applied = CURRENT_FRAME_WIDTH
-        last_h_applied = CURRENT_FRAME_HEIGHT
-        # fps tracking
-        last_ts = time.time()
-        while not stop_event.is_set():
-            # initialize per-loop states if missing
-            # Apply resolution change on-the-fly if desired differs from actual
-            try:
-                if FRAME_WIDTH != last_w_applied or FRAME_HEIGHT != last_h_applied:
-                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
-                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
-                    # Read back
-                    w_actual = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                    h_actual = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                    if w_actual > 0 and h_actual > 0:
-                        CURRENT_FRAME_WIDTH = w_actual
-                        CURRENT_FRAME_HEIGHT = h_actual
-                        last_w_applied = w_actual
-                        last_h_applied = h_actual
-            except Exception:
-                pass
-            ret, frame = cap.read()
-            if not ret:
-                print("Warning: Failed to read frame from camera")
-                break
+def _on_capture_resize(w_actual, h_actual):
+    global CURRENT_FRAME_WIDTH, CURRENT_FRAME_HEIGHT
+    CURRENT_FRAME_WIDTH = w_actual
+    CURRENT_FRAME_HEIGHT = h_actual
 
-            # FPS update (exponential moving average for stability)
+
+def run_camera(stop_event: threading.Event):
+    global _EVENT_LOG, _CLIPS
+    cap = _open_camera()
+    if cap is None:
+        return
+
+    if MASK_ENGINE == "lut":
+        # Build the classification table up front rather than on frame one
+        _RED_LUT.ensure(RED_HSV_RANGES)
+
+    # Capture runs on its own thread into a small ring; detection always
+    # takes the freshest frame so a slow frame never backs up the driver.
+    frame_buffer = LatestFrameBuffer(CAPTURE_BUFFER_SLOTS, CAPTURE_DROP_POLICY)
+    capture = CaptureThread(cap, frame_buffer, on_resize=_on_capture_resize,
+                            metrics=METRICS, configure=configure_camera)
+
+    _EVENT_LOG = open_event_log()
+    if CLIP_DIR and (PROCESS_WORKERS or PIPELINE_MODE):
+        print("Note: Clip capture runs in sequential mode and multi-camera mode only")
+    elif CLIP_DIR:
+        _CLIPS = open_clip_recorder()
+    try:
+        if PROCESS_WORKERS:
+            _run_processes(capture, stop_event)
+        elif PIPELINE_MODE:
+            _run_pipelined(capture, stop_event)
+        else:
+            _run_sequential(capture, stop_event)
+    finally:
+        capture.stop()
+        cap.release()
+        if _EVENT_LOG is not None:
+            _EVENT_LOG.stop()
+            _EVENT_LOG = None
+        if _CLIPS is not None:
+            _CLIPS.stop()
+            _CLIPS = None
+        if not HEADLESS:
             try:
-                now = time.time()
-                dt = now - last_ts
-                last_ts = now
-                if dt > 0:
-                    inst = 1.0 / dt
-                    global CURRENT_FPS
-                    if CURRENT_FPS > 0:
-                        CURRENT_FPS = 0.85 * CURRENT_FPS + 0.15 * inst
-                    else:
-                        CURRENT_FPS = inst
+                cv2.destroyAllWindows()
             except Exception:
                 pass
 
-            mask = create_red_mask(frame)
 
-            # Select detection mode based on USE_FAST_DETECTION flag
-            if USE_FAST_DETECTION:
-                circles = detect_red_circles(frame, max_count=2, mask=mask)
-            else:
-                circles = detect_red_circles_houghes(
-                    frame, max_count=2, mask=mask)
-
-            display = frame.copy()
-
-            # Compute targets' centers in pixels (relative to current frame size)
-            h, w = display.shape[:2]
-            t1_x = int(TARGET1_REL_X * w)
-            t1_y = int(TARGET1_REL_Y * h)
-            t1_r = TARGET1_DIAMETER // 2
-            t2_x = int(TARGET2_REL_X * w)
-            t2_y = int(TARGET2_REL_Y * h)
-            t2_r = TARGET2_DIAMETER // 2
-
-            # Draw target circles (blue outline) with dynamic thickness
-            t1_th = max(1, int(t1_r // 12))
-            t2_th = max(1, int(t2_r // 12))
-            cv2.circle(display, (t1_x, t1_y), t1_r, (255, 0, 0), t1_th)
-            cv2.circle(display, (t2_x, t2_y), t2_r, (255, 0, 0), t2_th)
-
-            # Nearest-neighbor matching to keep IDs stable across frames
-            # Order current circles to align with prev_displayed by proximity
-            ordered_current = []
-            remaining_curr = circles.copy()
-            used_idx = set()
-            if prev_displayed and remaining_curr:
-                # Build pairwise distances
-                pairs = []  # (dist2, prev_idx, curr_idx)
-                for pi, (px, py, pr) in enumerate(prev_displayed):
-                    for ci, (cx, cy, cr) in enumerate(remaining_curr):
-                        d2 = (cx - px) * (cx - px) + (cy - py) * (cy - py)
-                        pairs.append((d2, pi, ci))
-                pairs.sort(key=lambda t: t[0])
-                assigned_prev = set()
-                assigned_curr = set()
-                mapping = {}
-                for d2, pi, ci in pairs:
-                    if pi in assigned_prev or ci in assigned_curr:
-                        continue
-                    assigned_prev.add(pi)
-                    assigned_curr.add(ci)
-                    mapping[pi] = ci
-                # Build ordered list by prev indices
-                for pi in range(len(prev_displayed)):
-                    ci = mapping.get(pi)
-                    if ci is not None:
-                        ordered_current.append(remaining_curr[ci])
-                        used_idx.add(ci)
-                    else:
-                        ordered_current.append(None)
-                # Append any new unmatched detections at the end
-                for ci, c in enumerate(remaining_curr):
-                    if ci not in used_idx:
-                        ordered_current.append(c)
-            else:
-                ordered_current = remaining_curr
-
-            # Build smoothed/displayed circles with hold and deadband on center
-            next_displayed = []
-            for i in range(0, max(2, len(ordered_current))):
-                cur = ordered_current[i] if i < len(ordered_current) else None
-                prev = prev_displayed[i] if i < len(prev_displayed) else None
-
-                if cur is not None:
-                    x, y, r = cur
-                    if i < 2:
-                        # Reset hold counter on any positive presence; draw immediately
-                        hold_counts[i] = HOLD_FRAMES
-                    if prev is not None:
-                        px, py, pr = prev
-                        dx = x - px
-                        dy = y - py
-                        if (dx * dx + dy * dy) <= (DEADBAND_PX * DEADBAND_PX):
-                            next_displayed.append((px, py, r))
+def _run_sequential(capture: CaptureThread, stop_event: threading.Event):
+    """Detection, tracking and PLC output back to back on the freshest frame.
+
+    The preview is drawn on its own thread (see _make_preview).
+    """
+    global CURRENT_DROPPED_FRAMES, CURRENT_PROCESSED_FRAMES
+
+    frame_buffer = capture.buffer
+    capture.start()
+    preview = None if HEADLESS else _make_preview(stop_event)
+    if preview is not None:
+        preview.start()
+    state = TrackingState()
+    pool = BufferPool() if BUFFER_POOL else None
+    # last applied size to the capture
+    last_w_applied = CURRENT_FRAME_WIDTH
+    last_h_applied = CURRENT_FRAME_HEIGHT
+    # fps tracking
+    last_ts = time.time()
+    try:
+        while not stop_event.is_set():
+            # Apply resolution change on-the-fly if desired differs from actual
+            # (handed to the capture thread, which owns the device)
+            if FRAME_WIDTH != last_w_applied or FRAME_HEIGHT != last_h_applied:
+                capture.request_resolution(FRAME_WIDTH, FRAME_HEIGHT)
+                last_w_applied = FRAME_WIDTH
+                last_h_applied = FRAME_HEIGHT
+
+            item = frame_buffer.get(timeout=0.5)
+            if item is None:
+                if frame_buffer.closed:
+                    print("Warning: Failed to read frame from camera")
+                    break
+                continue
+            frame, _seq, ts = item
+            CURRENT_DROPPED_FRAMES = frame_buffer.dropped
+            CURRENT_PROCESSED_FRAMES = frame_buffer.processed
+            last_ts = _update_fps(last_ts)
+
+            h, w = frame.shape[:2]
+            if pool is not None:
+                pool.resize(CURRENT_FRAME_WIDTH, CURRENT_FRAME_HEIGHT)
+            with METRICS.timer("mask"):
+                regions, windowed = search_regions(w, h)
+                region_masks = create_region_masks(frame, regions, pool)
+            with METRICS.timer("detect"):
+                circles = detect_circles(frame, region_masks, pool=pool)
+            if TRACKING_MODE:
+                _SEARCH.update(circles, windowed)
+            displayed, targets, hits = update_tracking(state, circles, w, h)
+            publish_hits(hits, displayed)
+            METRICS.observe("camera_to_plc", (time.monotonic() - ts) * 1000.0)
+            log_frame(_EVENT_LOG, state, ts, circles, hits)
+            if preview is not None:
+                preview.submit(frame, (displayed, targets, hits,
+                                       _preview_masks(region_masks, pool), frame.shape))
+            record_clip_frame(_CLIPS, frame_buffer, state, ts, hits, displayed)
+    finally:
+        if preview is not None:
+            preview.stop()
+
+
+def _run_pipelined(capture: CaptureThread, stop_event: threading.Event):
+    """Capture, mask, detect and track on separate threads.
+
+    Mask and detection may use several workers (OpenCV releases the GIL);
+    tracking is ordered by frame sequence number and feeds the preview
+    thread.
+    """
+    global CURRENT_DROPPED_FRAMES, CURRENT_PROCESSED_FRAMES, CURRENT_QUEUE_DEPTHS
+
+    state = TrackingState()
+    preview = None if HEADLESS else _make_preview(stop_event)
+    last_ts = [time.time()]
+
+    def mask_stage(pkt):
+        h, w = pkt.frame.shape[:2]
+        # Workers take frames out of order and ahead of tracking: windows
+        # are predicted for this frame's seq, and the fallback decision
+        # travels with the packet until the track stage accounts it
+        pkt.fallback = FallbackDecision(_UPSAMPLE.allows())
+        with METRICS.timer("mask"):
+            regions, pkt.windowed = search_regions(w, h, seq=pkt.seq)
+            pkt.mask = create_region_masks(pkt.frame, regions)
+
+    def detect_stage(pkt):
+        with METRICS.timer("detect"):
+            pkt.circles = detect_circles(pkt.frame, pkt.mask, upsample=pkt.fallback)
+
+    def track_stage(pkt):
+        h, w = pkt.frame.shape[:2]
+        _UPSAMPLE.account(*pkt.fallback.outcome())
+        if TRACKING_MODE:
+            _SEARCH.update(pkt.circles, pkt.windowed, pkt.seq)
+        pkt.result = update_tracking(state, pkt.circles, w, h)
+        publish_hits(pkt.result[2], pkt.result[0])
+        METRICS.observe("camera_to_plc", (time.monotonic() - pkt.timestamp) * 1000.0)
+        log_frame(_EVENT_LOG, state, pkt.timestamp, pkt.circles, pkt.result[2])
+        last_ts[0] = _update_fps(last_ts[0])
+        if preview is not None:
+            displayed, targets, hits = pkt.result
+            preview.submit(pkt.frame, (displayed, targets, hits, pkt.mask, pkt.frame.shape))
+
+    stages = [
+        Stage("mask", mask_stage, workers=PIPELINE_WORKERS,
+              queue_size=PIPELINE_QUEUE_SIZE),
+        Stage("detect", detect_stage, workers=PIPELINE_WORKERS,
+              queue_size=PIPELINE_QUEUE_SIZE),
+        Stage("track", track_stage, queue_size=PIPELINE_QUEUE_SIZE, ordered=True),
+    ]
+    pipeline = Pipeline(capture.read, stages)
+    last_w_applied = CURRENT_FRAME_WIDTH
+    last_h_applied = CURRENT_FRAME_HEIGHT
+    if preview is not None:
+        preview.start()
+    pipeline.start()
+    try:
+        while not stop_event.is_set() and pipeline.running:
+            if FRAME_WIDTH != last_w_applied or FRAME_HEIGHT != last_h_applied:
+                capture.request_resolution(FRAME_WIDTH, FRAME_HEIGHT)
+                last_w_applied = FRAME_WIDTH
+                last_h_applied = FRAME_HEIGHT
+            CURRENT_DROPPED_FRAMES = pipeline.dropped
+            CURRENT_PROCESSED_FRAMES = pipeline.processed
+            CURRENT_QUEUE_DEPTHS = pipeline.queue_depths()
+            stop_event.wait(0.05)
+        if pipeline.failed:
+            print("Warning: Failed to read frame from camera")
+    finally:
+        pipeline.stop()
+        if preview is not None:
+            preview.stop()
+        CURRENT_QUEUE_DEPTHS = {}
+
+# Settings a detection worker process needs; sent with every task so GUI
+# changes reach the workers on the next frame
+_DETECT_PARAMS = (
+    "USE_FAST_DETECTION", "HOUGH_PARAM2", "MIN_RADIUS", "MASK_ENGINE", "RED_HSV_RANGES",
+    "TARGET1_REL_X", "TARGET1_REL_Y", "TARGET1_DIAMETER",
+    "TARGET2_REL_X", "TARGET2_REL_Y", "TARGET2_DIAMETER",
+    "UPSAMPLE_TILE_PX", "UPSAMPLE_IDLE_FRAMES", "UPSAMPLE_PROBE_FRAMES", "SHOW_MASK",
+    "DETECT_DOWNSCALE",
+)
+
+
+def _detect_params():
+    g = globals()
+    return {k: g[k] for k in _DETECT_PARAMS}
+
+
+def _process_detect(frame, payload):
+    """Worker-process side of process mode: red mask and detection for one frame.
+
+    Returns (circles, region masks, mask ms, detect ms, fallback outcome);
+    the masks are only sent back when the mask window is shown. Whether
+    the 2x fallback may run comes from the parent's scheduler, and the
+    outcome goes back to it, so one schedule covers all workers' frames.
+    """
+    regions, params, fallback_allowed = payload
+    globals().update(params)
+    decision = FallbackDecision(fallback_allowed)
+    t0 = time.perf_counter()
+    region_masks = create_region_masks(frame, regions)
+    t1 = time.perf_counter()
+    circles = detect_circles(frame, region_masks, upsample=decision)
+    t2 = time.perf_counter()
+    if not SHOW_MASK:
+        region_masks = [(roi, None) for roi, _ in region_masks]
+    return (circles, region_masks, (t1 - t0) * 1000.0, (t2 - t1) * 1000.0,
+            decision.outcome())
+
+
+def _run_processes(capture: CaptureThread, stop_event: threading.Event):
+    """Capture and output here; mask and detection in worker processes.
+
+    A capture thread reads each frame straight into a free shared-memory
+    slot and submits it; when every slot is busy the frame is read into a
+    scratch buffer and dropped, so the camera never backs up. This thread
+    applies results in frame order (tracking, hits, PLC, preview) and then
+    frees the slot.
+    """
+    global CURRENT_DROPPED_FRAMES, CURRENT_PROCESSED_FRAMES, CURRENT_QUEUE_DEPTHS
+
+    workers = PROCESS_WORKERS if PROCESS_WORKERS > 0 else (os.cpu_count() or 1)
+    ring = SharedFrameRing(workers + 2, FRAME_WIDTH * FRAME_HEIGHT * 3)
+    pool = ProcessWorkers(_process_detect, workers, ring)
+    counts = {"dropped": 0, "processed": 0}
+    halt = threading.Event()
+    capture_done = threading.Event()
+    state = TrackingState()
+    preview = None if HEADLESS else _make_preview(stop_event)
+    last_ts = time.time()
+
+    def capture_loop():
+        shape = None
+        scratch = None
+        submitted = 0
+        try:
+            while not stop_event.is_set() and not halt.is_set():
+                idx = ring.try_acquire()
+                if idx is None:
+                    # Every slot is being processed: keep the camera drained
+                    scratch = capture.read(scratch)
+                    if scratch is None:
+                        break
+                    counts["dropped"] += 1
+                    continue
+                dst = ring.view(idx, shape) if shape is not None else None
+                frame = capture.read(dst)
+                ts = time.monotonic()
+                if frame is None:
+                    ring.release(idx)
+                    break
+                if frame is not dst:
+                    # First frame or a new resolution
+                    if frame.nbytes > ring.slot_bytes:
+                        ring.release(idx)
+                        if not ring.grow(frame.nbytes, timeout=5.0):
+                            counts["dropped"] += 1
                             continue
-                    next_displayed.append((x, y, r))
+                        idx = ring.acquire()
+                    shape = frame.shape
+                    dst = ring.view(idx, shape)
+                    np.copyto(dst, frame)
+                h, w = shape[:2]
+                # Planned ahead of the result loop: windows are predicted
+                # for this frame's number, not the last tracked frame
+                submitted += 1
+                regions, windowed = search_regions(w, h, seq=submitted)
+                # Slot, shape, capture timestamp, windowed flag and frame
+                # number travel as the task's meta, stored before the task
+                # is queued
+                pool.submit(idx, shape, (regions, _detect_params(), _UPSAMPLE.allows()),
+                            meta=(idx, shape, ts, windowed, submitted))
+        finally:
+            capture_done.set()
+
+    pool.start()
+    if MASK_ENGINE == "lut":
+        print("Note: each detection process builds its own mask lookup table")
+    if preview is not None:
+        preview.start()
+    reader = threading.Thread(target=capture_loop, name="process-capture", daemon=True)
+    reader.start()
+    last_w_applied = CURRENT_FRAME_WIDTH
+    last_h_applied = CURRENT_FRAME_HEIGHT
+    warned = False
+    try:
+        while not stop_event.is_set():
+            if FRAME_WIDTH != last_w_applied or FRAME_HEIGHT != last_h_applied:
+                capture.request_resolution(FRAME_WIDTH, FRAME_HEIGHT)
+                last_w_applied = FRAME_WIDTH
+                last_h_applied = FRAME_HEIGHT
+            for seq, result, error, meta in pool.results(timeout=0.1):
+                idx, shape, ts, windowed, number = meta
+                frame = ring.view(idx, shape)
+                if error is not None:
+                    if not warned:
+                        print(f"Warning: Detection worker failed: {error}")
+                        warned = True
+                    circles, region_masks = [], []
                 else:
-                    if i < 2 and prev is not None and hold_counts[i] > 0:
-                        hold_counts[i] -= 1
-                        next_displayed.append(prev)
-                    else:
-                        # nothing to draw for this slot
-                        pass
-
-            # Draw smoothed circles (in green) and annotate centers with dynamic thickness
-            for idx, (dx_, dy_, r_) in enumerate(next_displayed):
-                c_th = max(1, int(r_ // 12))
-                cv2.circle(display, (dx_, dy_), r_, (0, 255, 0), c_th)
-                cv2.circle(display, (dx_, dy_), 3, (0, 255, 0), -1)
-                text = f"center {idx+1}: ({dx_}, {dy_})"
-                cv2.putText(
-                    display,
-                    text,
-                    (dx_ + 10, max(20, dy_ - 10)),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    (0, 255, 0),
-                    2,
-                    cv2.LINE_AA,
-                )
-            prev_displayed = next_displayed
-
-            # Determine if the red circle center is inside each target
-            # Debounced hit logic using hysteresis based on DEADBAND_PX
-            # Compute best (max) inside margin for each target across all circles
-            best_margin1 = float('-inf')
-            best_margin2 = float('-inf')
-            for (x, y, _) in circles:  # real-time positions
-                # margin = target_radius - distance_to_center (positive -> inside)
-                d1 = math.hypot(x - t1_x, y - t1_y)
-                d2 = math.hypot(x - t2_x, y - t2_y)
-                best_margin1 = max(best_margin1, t1_r - d1)
-                best_margin2 = max(best_margin2, t2_r - d2)
-
-            # Apply hysteresis: turn ON only when clearly inside by deadband; OFF when clearly outside
-            hit1_raw = last_hit1
-            if not last_hit1:
-                if best_margin1 >= DEADBAND_PX:
-                    hit1_raw = True
-            else:
-                if best_margin1 <= -DEADBAND_PX:
-                    hit1_raw = False
-
-            hit2_raw = last_hit2
-            if not last_hit2:
-                if best_margin2 >= DEADBAND_PX:
-                    hit2_raw = True
-            else:
-                if best_margin2 <= -DEADBAND_PX:
-                    hit2_raw = False
-
-            last_hit1, last_hit2 = hit1_raw, hit2_raw
-
-            # Temporal filter: immediate ON; OFF only after OFF_FRAMES consecutive falses
-            if hit1_raw:
-                disp_hit1 = True
-                off_count1 = 0
-            else:
-                off_count1 += 1
-                if off_count1 >= OFF_FRAMES:
-                    disp_hit1 = False
-                    off_count1 = 0
-
-            if hit2_raw:
-                disp_hit2 = True
-                off_count2 = 0
-            else:
-                off_count2 += 1
-                if off_count2 >= OFF_FRAMES:
-                    disp_hit2 = False
-                    off_count2 = 0
-
-            # Send debounced states to PLC (non-blocking writer thread)
-            if _PLC_AVAILABLE:
-                try:
-                    plc_update_default(disp_hit1, disp_hit2)
-                except Exception:
-                    pass
-
-            # Draw target status texts in fixed HUD positions
-            hud1_text = f"Target 1( cx={t1_x}, cy={t1_y} )"
-            hud2_text = f"Target 2( cx={t2_x}, cy={t2_y} )"
-            hud1_color = (0, 200, 0) if disp_hit1 else (255, 255, 255)
-            hud2_color = (0, 200, 0) if disp_hit2 else (255, 255, 255)
-            cv2.putText(display, hud1_text, (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, hud1_color, 2, cv2.LINE_AA)
-            cv2.putText(display, hud2_text, (10, 60),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, hud2_color, 2, cv2.LINE_AA)
-
-            # Show which detection mode is active
-            mode_text = "Mode: FAST (Contours)" if USE_FAST_DETECTION else "Mode: HUGHES (Hough Circles)"
-            cv2.putText(display, mode_text, (10, 90),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 2, cv2.LINE_AA)
-
-            cv2.imshow(window_name, display)
-            # Optional mask window
-            if SHOW_MASK:
-                cv2.imshow("Red Mask", mask)
-                mask_window_open = True
-            else:
-                if mask_window_open:
-                    try:
-                        cv2.destroyWindow("Red Mask")
-                    except Exception:
-                        pass
-                    mask_window_open = False
-
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                # Save once when quitting via keyboard
+                    circles, region_masks, mask_ms, detect_ms, fallback = result
+                    _UPSAMPLE.account(*fallback)
+                    METRICS.observe("mask", mask_ms)
+                    METRICS.observe("detect", detect_ms)
+                if TRACKING_MODE:
+                    _SEARCH.update(circles, windowed, number)
+                displayed, targets, hits = update_tracking(state, circles, shape[1], shape[0])
+                publish_hits(hits, displayed)
+                METRICS.observe("camera_to_plc", (time.monotonic() - ts) * 1000.0)
+                log_frame(_EVENT_LOG, state, ts, circles, hits)
+                last_ts = _update_fps(last_ts)
+                if preview is not None:
+                    preview.submit(frame, (displayed, targets, hits, region_masks, shape))
+                del frame
+                ring.release(idx)
+                counts["processed"] += 1
+            CURRENT_DROPPED_FRAMES = counts["dropped"]
+            CURRENT_PROCESSED_FRAMES = counts["processed"]
+            CURRENT_QUEUE_DEPTHS = {"workers": pool.pending}
+            if not pool.alive:
+                print("Warning: A detection worker process exited")
+                break
+            if capture_done.is_set() and not pool.pending:
+                if not stop_event.is_set():
+                    print("Warning: Failed to read frame from camera")
+                break
+    finally:
+        halt.set()
+        if preview is not None:
+            preview.stop()
+        pool.stop()
+        reader.join(timeout=2.0)
+        if not reader.is_alive():
+            # Workers and the reader are gone; nothing maps the slots any more
+            ring.close()
+        CURRENT_QUEUE_DEPTHS = {}
+
+
+def _station_name(block, index):
+    return str(block.get("name") or f"camera{index + 1}")
+
+
+def _upsample_gauges(metrics, scheduler):
+    """Register the 2x fallback scheduler's per-frame counts as gauges on `metrics`."""
+    metrics.gauge("upsample_fire_rate", lambda: scheduler.snapshot()["fire_rate"],
+                  "Fraction of frames on which the 2x fallback ran.")
+    metrics.gauge("upsample_fired", lambda: scheduler.snapshot()["fired"],
+                  "Frames on which the 2x fallback ran.")
+    metrics.gauge("upsample_skipped", lambda: scheduler.snapshot()["skipped"],
+                  "Frames that wanted the 2x fallback but were skipped while idle.")
+    metrics.gauge("upsample_tiles", lambda: scheduler.snapshot()["tiles"],
+                  "Tiles searched by the 2x fallback.")
+
+
+class Station:
+    """One camera of a multi-camera setup (a block of "cameras" in settings).
+
+    Holds everything that must not be shared between stations: targets,
+    tracking state, search windows, fallback scheduler, capture ring, PLC
+    writer, frame counters and a metrics registry labelled with its name.
+    """
+
+    def __init__(self, block, index):
+        self.block = block
+        self.name = _station_name(block, index)
+        self.source = block.get("source")  # optional open_source spec instead of a camera
+        self.camera_index = int(block.get("camera_index", CAMERA_INDEX))
+        self.frame_width = int(block.get("frame_width", FRAME_WIDTH)) or FRAME_WIDTH
+        self.frame_height = int(block.get("frame_height", FRAME_HEIGHT)) or FRAME_HEIGHT
+        self.targets = [
+            self._target(block.get("target1"), TARGET1_REL_X, TARGET1_REL_Y, TARGET1_DIAMETER),
+            self._target(block.get("target2"), TARGET2_REL_X, TARGET2_REL_Y, TARGET2_DIAMETER),
+        ]
+        self.metrics = MetricsRegistry(labels={"camera": self.name})
+        self.state = TrackingState()
+        self.search = SearchWindows(TRACK_FULL_EVERY, TRACK_WINDOW_PX)
+        self.upsample = UpsampleScheduler(UPSAMPLE_IDLE_FRAMES, UPSAMPLE_PROBE_FRAMES)
+        self.pool = BufferPool() if BUFFER_POOL else None  # one worker at a time per station
+        self.cap = None
+        self.buffer = None
+        self.capture = None
+        self.writer = None
+        self.events = None
+        self.clips = None
+        self.fps = 0.0
+        self.last_ts = 0.0
+        self.queued = False  # guarded by StationPool's lock
+        self.metrics.gauge("fps", lambda: self.fps, "Processed frames per second (EMA).")
+        self.metrics.gauge("frames_processed", lambda: self.buffer.processed if self.buffer else 0,
+                           "Frames handed to detection.")
+        self.metrics.gauge("frames_dropped", lambda: self.buffer.dropped if self.buffer else 0,
+                           "Captured frames never processed.")
+        _upsample_gauges(self.metrics, self.upsample)
+
+    def _target(self, t, rel_x, rel_y, diameter):
+        """(rel x, rel y, diameter) from a {x, y, diameter} block in station pixels."""
+        t = t or {}
+        fw, fh = self.frame_width, self.frame_height
+        x = int(t.get("x", int(rel_x * fw)))
+        y = int(t.get("y", int(rel_y * fh)))
+        return (max(0.0, min(1.0, x / fw)), max(0.0, min(1.0, y / fh)),
+                int(t.get("diameter", diameter)))
+
+    def open(self, notify):
+        """Open the camera, start capture and the PLC writer; False if the camera failed."""
+        if self.source:
+            cap = open_source(self.source, loop=True)
+        else:
+            cap = open_camera(self.camera_index)
+        if not cap.isOpened():
+            print(f"Error: Cannot open {self.source or f'camera index {self.camera_index}'} "
+                  f"for {self.name}")
+            return False
+        if self.source:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
+        else:
+            configure_camera(cap, self.frame_width, self.frame_height, self.name)
+        self.cap = cap
+        self.buffer = LatestFrameBuffer(CAPTURE_BUFFER_SLOTS, CAPTURE_DROP_POLICY,
+                                        on_commit=lambda: notify(self))
+        self.capture = CaptureThread(cap, self.buffer, metrics=self.metrics)
+        if _PLC_AVAILABLE:
+            try:
+                self.writer = PLCWriter(_plc_config(self.block), metrics=self.metrics,
+                                        rate_fn=lambda: self.fps)
+                self.writer.start()
+            except Exception as e:
+                print(f"Warning: PLC writer for {self.name} not started: {e}")
+                self.writer = None
+        self.events = open_event_log(self.name)
+        self.clips = open_clip_recorder(self.name)
+        self.last_ts = time.time()
+        self.capture.start()
+        return True
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.stop()
+        if self.cap is not None:
+            self.cap.release()
+        if self.writer is not None:
+            self.writer.stop()
+        if self.events is not None:
+            self.events.stop()
+        if self.clips is not None:
+            self.clips.stop()
+
+    def process(self, frame, ts):
+        """Detection, tracking, hit logic and PLC output for one frame."""
+        now = time.time()
+        dt = now - self.last_ts
+        if dt > 0:
+            inst = 1.0 / dt
+            self.fps = 0.85 * self.fps + 0.15 * inst if self.fps > 0 else inst
+        self.last_ts = now
+
+        metrics = self.metrics
+        h, w = frame.shape[:2]
+        if self.pool is not None:
+            self.pool.resize(w, h)
+        with metrics.timer("mask"):
+            regions, windowed = search_regions(w, h, self)
+            region_masks = create_region_masks(frame, regions, self.pool)
+        with metrics.timer("detect"):
+            circles = detect_circles(frame, region_masks, station=self, pool=self.pool)
+        if TRACKING_MODE:
+            self.search.update(circles, windowed)
+        displayed, _targets, hits = update_tracking(self.state, circles, w, h, self)
+        if self.writer is not None:
+            with metrics.timer("plc"):
+                self.writer.update(plc_outputs(hits, displayed))
+        metrics.observe("camera_to_plc", (time.monotonic() - ts) * 1000.0)
+        log_frame(self.events, self.state, ts, circles, hits, metrics)
+        record_clip_frame(self.clips, self.buffer, self.state, ts, hits, displayed)
+        return displayed, hits
+
+
+class StationPool:
+    """Processing threads shared by all stations.
+
+    A station is queued when its capture publishes a frame and is handled
+    by one worker at a time, so its tracking and hit state see frames in
+    order while different stations run in parallel (OpenCV releases the
+    GIL). Each pass takes the station's newest frame.
+    """
+
+    def __init__(self, stations, workers):
+        self.stations = stations
+        self.workers = max(1, int(workers))
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def notify(self, station):
+        with self._lock:
+            if not station.queued:
+                station.queued = True
+                self._ready.put(station)
+
+    def start(self):
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"station-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, join_timeout=1.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=join_timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                station = self._ready.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            item = station.buffer.get(timeout=0)
+            if item is not None:
+                frame, _seq, ts = item
                 try:
-                    save_settings()
-                except Exception:
-                    pass
-                stop_event.set()
+                    station.process(frame, ts)
+                except Exception as e:
+                    print(f"Warning: {station.name} frame failed: {e}")
+                station.buffer.release()
+            with self._lock:
+                # A frame published while we worked finds queued=True and
+                # relies on this check to be picked up
+                if station.buffer.depth() > 0:
+                    self._ready.put(station)
+                else:
+                    station.queued = False
+
+
+def run_stations(stop_event: threading.Event):
+    """Run every camera in CAMERAS headless until stop_event or all cameras fail.
+
+    Refuses to start (returns []) if two stations would write the same PLC tag.
+    """
+    problems = station_plc_conflicts(CAMERAS)
+    if problems:
+        for problem in problems:
+            print(f"Error: {problem}")
+        print("Error: Multi-camera mode not started; give every station its own PLC tags")
+        return []
+    stations = [Station(block, i) for i, block in enumerate(CAMERAS)]
+    if MASK_ENGINE == "lut":
+        _RED_LUT.ensure(RED_HSV_RANGES)
+    workers = CAMERA_WORKERS or min(len(stations), os.cpu_count() or 1)
+    pool = StationPool(stations, workers)
+    server = _start_metrics_server(MetricsGroup([st.metrics for st in stations]))
+    opened = [st for st in stations if st.open(pool.notify)]
+    print(f"Running {len(opened)} of {len(stations)} cameras on {pool.workers} worker threads")
+    pool.start()
+    failed = set()
+    try:
+        while opened and not stop_event.is_set():
+            for st in opened:
+                if st.buffer.closed and st.name not in failed:
+                    print(f"Warning: Failed to read frame from {st.name}")
+                    failed.add(st.name)
+            if len(failed) == len(opened):
                 break
-
+            stop_event.wait(0.5)
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
+        pool.stop()
+        for st in stations:
+            st.close()
+        if server is not None:
+            server.stop()
+    return stations
+
+
+def _status_text():
+    fmt = f" ({CURRENT_CAPTURE_FORMAT})" if CURRENT_CAPTURE_FORMAT else ""
+    text = (f"Actual: {CURRENT_FRAME_WIDTH}x{CURRENT_FRAME_HEIGHT} @ {CURRENT_FPS:.1f} fps{fmt}\n"
+            f"Frames: {CURRENT_PROCESSED_FRAMES} processed, {CURRENT_DROPPED_FRAMES} dropped")
+    depths = CURRENT_QUEUE_DEPTHS
+    if depths:
+        text += "\nQueues: " + " | ".join(f"{k} {v}" for k, v in depths.items())
+    if not USE_FAST_DETECTION:
+        up = _UPSAMPLE.snapshot()
+        text += (f"\nFine pass: {up['fire_rate'] * 100:.0f}% of frames "
+                 f"({up['fired']} run, {up['skipped']} skipped, {up['found']} found)")
+    if TRACKING_MODE:
+        tr = _SEARCH.snapshot()
+        text += (f"\nTracking: {tr['tracks']} locked, {tr['window_rate'] * 100:.0f}% windowed, "
+                 f"{tr['lost']} lost")
+    writer = plc_default_writer() if _PLC_AVAILABLE else None
+    if writer is not None:
+        text += (f"\nPLC: {writer.writes} writes, {writer.tags_written} tags, "
+                 f"{writer.write_failures} failed, {writer.reconnects} reconnects, "
+                 f"last write {writer.last_write_ms:.1f} ms, change {writer.last_change_ms:.1f} ms")
+        text += (f"\nPLC watchdog: {writer.heartbeats} heartbeats, {writer.readbacks} read-backs, "
+                 f"{writer.reasserted} re-asserted")
+    latency = METRICS.summary(STATUS_STAGES)
+    if latency:
+        parts = [f"{k} {p50:.1f}/{p99:.1f}" for k, (p50, p99) in latency.items()]
+        text += "\nLatency p50/p99 ms:"
+        for i in range(0, len(parts), 3):
+            text += "\n  " + " | ".join(parts[i:i + 3])
+    return text
+
+
+def _start_metrics_server(registry=None):
+    """Serve METRICS (or `registry`) over HTTP if METRICS_PORT is set; returns the server or None."""
+    if registry is None:
+        registry = METRICS
+        METRICS.gauge("fps", lambda: CURRENT_FPS, "Processed frames per second (EMA).")
+        METRICS.gauge("frames_processed", lambda: CURRENT_PROCESSED_FRAMES,
+                      "Frames handed to detection.")
+        METRICS.gauge("frames_dropped", lambda: CURRENT_DROPPED_FRAMES,
+                      "Captured frames never processed.")
+        _upsample_gauges(METRICS, _UPSAMPLE)
+    if not METRICS_PORT:
+        return None
+    server = MetricsServer(registry, METRICS_HOST, METRICS_PORT)
+    try:
+        server.start()
+    except Exception as e:
+        print(f"Warning: Metrics endpoint not started: {e}")
+        return None
+    print(f"Metrics at http://{METRICS_HOST}:{server.port}/metrics")
+    return server
 
 
 def start_gui(stop_event: threading.Event):
@@ -917,8 +2163,7 @@ def start_gui(stop_event: threading.Event):
     opt_res.pack(anchor="w")
 
     # Status line for current actual resolution and FPS
-    status_var = tk.StringVar(
-        value=f"Actual: {CURRENT_FRAME_WIDTH}x{CURRENT_FRAME_HEIGHT} @ {CURRENT_FPS:.1f} fps")
+    status_var = tk.StringVar(value=_status_text())
     lbl_status = ctk.CTkLabel(frame_right, textvariable=status_var)
     lbl_status.pack(anchor="w", pady=(6, 0))
 
@@ -942,8 +2187,7 @@ def start_gui(stop_event: threading.Event):
     chk_mode.pack(anchor="w", pady=(8, 0))
 
     def _update_status():
-        status_var.set(
-            f"Actual: {CURRENT_FRAME_WIDTH}x{CURRENT_FRAME_HEIGHT} @ {CURRENT_FPS:.1f} fps")
+        status_var.set(_status_text())
         root.after(500, _update_status)
 
     root.after(600, _update_status)
@@ -991,31 +2235,76 @@ def start_gui(stop_event: threading.Event):
     root.mainloop()
 
 
-def main():
+def _install_signal_handlers(stop_event: threading.Event):
+    """Stop the camera loop on SIGTERM/SIGINT instead of dying mid-write."""
+    def _handler(signum, _frame):
+        print(f"Received signal {signum}, shutting down")
+        stop_event.set()
+    for name in ("SIGTERM", "SIGINT"):
+        sig = getattr(signal, name, None)
+        if sig is not None:
+            try:
+                signal.signal(sig, _handler)
+            except Exception:
+                pass
+
+
+def main(argv=None):
+    global HEADLESS
+
+    parser = argparse.ArgumentParser(description="Red target detection")
+    parser.add_argument("--headless", action="store_true",
+                        help="no GUI or preview; detection and PLC output only")
+    args = parser.parse_args(argv)
+
     # Load persisted settings (if available)
     load_settings()
+    if args.headless:
+        HEADLESS = True
+    if not HEADLESS and not _GUI_AVAILABLE:
+        print(f"GUI unavailable ({_GUI_IMPORT_ERROR}), running headless")
+        HEADLESS = True
+
+    if CAMERAS:
+        # Multi-camera: every station has its own PLC writer and metrics
+        if not _PLC_AVAILABLE and _PLC_IMPORT_ERROR is not None:
+            print(f"PLC disabled: {_PLC_IMPORT_ERROR}")
+        _install_signal_handlers(_stop_event)
+        run_stations(_stop_event)
+        return
 
     # Initialize PLC writer (optional)
     if _PLC_AVAILABLE:
         try:
-            plc_init_default()
+            plc_init_default(_plc_config(), metrics=METRICS,
+                             rate_fn=lambda: CURRENT_FPS)
         except Exception:
             pass
     else:
         if _PLC_IMPORT_ERROR is not None:
             print(f"PLC disabled: {_PLC_IMPORT_ERROR}")
 
-    # Start camera processing in a background thread
-    cam_thread = threading.Thread(
-        target=run_camera, args=(_stop_event,), daemon=True)
-    cam_thread.start()
+    metrics_server = _start_metrics_server()
 
-    # Start the GUI (blocks until closed)
-    start_gui(_stop_event)
-
-    # Ensure camera thread ends
-    _stop_event.set()
-    cam_thread.join(timeout=1.0)
+    if HEADLESS:
+        # Camera loop on the main thread so signals reach it promptly
+        _install_signal_handlers(_stop_event)
+        run_camera(_stop_event)
+        _stop_event.set()
+    else:
+        # Start camera processing in a background thread
+        cam_thread = threading.Thread(
+            target=run_camera, args=(_stop_event,), daemon=True)
+        cam_thread.start()
+
+        # Start the GUI (blocks until closed)
+        start_gui(_stop_event)
+
+        # Ensure camera thread ends
+        _stop_event.set()
+        cam_thread.join(timeout=1.0)
+    if metrics_server is not None:
+        metrics_server.stop()
 
     # Shutdown PLC writer
     if _PLC_AVAILABLE:
@@ -0,0 +1,143 @@
+"""Run detection, tracking and hit logic offline on recorded or generated frames.
+
+Usage:
+    python src/replay.py SOURCE [--out results.jsonl] [--settings settings.json]
+
+SOURCE is a video file, a directory of images, ``synthetic[:WxH[:frames]]``
+or ``camera:N``. Frames are processed back to back (no preview, no PLC) and
+one JSON line per frame is written with the circles found, the tracked
+circles, the two hit states and per-stage timings in ms.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import main
+from utils.sources import open_source
+
+
+def _apply_overrides(args):
+    if args.detector:
+        main.USE_FAST_DETECTION = args.detector == "fast"
+    if args.mask_engine:
+        main.MASK_ENGINE = args.mask_engine
+    if args.region:
+        main.DETECTION_REGION = args.region
+    if args.tracking is not None:
+        main.TRACKING_MODE = args.tracking
+
+
+def _matched(truth, circles, tol):
+    """Ground-truth discs with a detected centre within `tol` pixels."""
+    found = 0
+    for (x, y, _r) in truth:
+        if any((x - cx) ** 2 + (y - cy) ** 2 <= tol * tol for (cx, cy, _cr) in circles):
+            found += 1
+    return found
+
+
+def replay(source, out, max_frames=0, tol=3.0):
+    """Process every frame of `source`, writing one JSON line per frame to `out`.
+
+    Returns a summary dict (frames, fps, mean/p95 stage timings and, for
+    sources with ground truth, the fraction of true discs detected).
+    """
+    if main.MASK_ENGINE == "lut":
+        main._RED_LUT.ensure(main.RED_HSV_RANGES)
+    state = main.TrackingState()
+    stage_ms = {"mask": [], "detect": [], "track": []}
+    truth_total = 0
+    truth_found = 0
+    frames = 0
+    t_start = time.perf_counter()
+    while not max_frames or frames < max_frames:
+        ok, frame = source.read()
+        if not ok or frame is None:
+            break
+        h, w = frame.shape[:2]
+        t0 = time.perf_counter()
+        regions, windowed = main.search_regions(w, h)
+        region_masks = main.create_region_masks(frame, regions)
+        t1 = time.perf_counter()
+        circles = main.detect_circles(frame, region_masks)
+        t2 = time.perf_counter()
+        if main.TRACKING_MODE:
+            main._SEARCH.update(circles, windowed)
+        displayed, _targets, hits = main.update_tracking(state, circles, w, h)
+        t3 = time.perf_counter()
+
+        ms = {"mask": (t1 - t0) * 1000.0, "detect": (t2 - t1) * 1000.0,
+              "track": (t3 - t2) * 1000.0}
+        for k, v in ms.items():
+            stage_ms[k].append(v)
+        record = {
+            "frame": frames,
+            "width": w,
+            "height": h,
+            "windowed": bool(windowed),
+            "circles": [[int(v) for v in c] for c in circles],
+            "displayed": [[int(v) for v in c] for c in displayed],
+            "hits": [bool(hits[0]), bool(hits[1])],
+            "ms": {k: round(v, 3) for k, v in ms.items()},
+        }
+        truth = getattr(source, "truth", None)
+        if truth is not None:
+            record["truth"] = [list(c) for c in truth]
+            truth_total += len(truth)
+            truth_found += _matched(truth, circles, tol)
+        out.write(json.dumps(record) + "\n")
+        frames += 1
+
+    elapsed = time.perf_counter() - t_start
+    busy = sum(sum(v) for v in stage_ms.values()) / 1000.0
+    # fps includes reading/decoding the source; process_fps is detection only
+    summary = {"frames": frames, "seconds": elapsed,
+               "fps": frames / elapsed if elapsed > 0 else 0.0,
+               "process_fps": frames / busy if busy > 0 else 0.0}
+    for k, v in stage_ms.items():
+        if v:
+            summary[f"{k}_ms_mean"] = float(np.mean(v))
+            summary[f"{k}_ms_p95"] = float(np.percentile(v, 95))
+    if truth_total:
+        summary["recall"] = truth_found / truth_total
+    return summary
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="video file, image directory, synthetic[:WxH[:frames]] or camera:N")
+    parser.add_argument("--out", default="-", help="per-frame JSON lines (default: stdout)")
+    parser.add_argument("--settings", help="settings.json to load (default: the project's)")
+    parser.add_argument("--max-frames", type=int, default=0, help="stop after this many frames")
+    parser.add_argument("--loop", action="store_true", help="loop video/image sources")
+    parser.add_argument("--detector", choices=("hough", "fast"))
+    parser.add_argument("--mask-engine", choices=main.MASK_ENGINES)
+    parser.add_argument("--region", choices=main.DETECTION_REGIONS)
+    parser.add_argument("--tracking", dest="tracking", action="store_true", default=None)
+    parser.add_argument("--no-tracking", dest="tracking", action="store_false")
+    args = parser.parse_args(argv)
+
+    main.load_settings(args.settings)
+    _apply_overrides(args)
+
+    source = open_source(args.source, loop=args.loop)
+    if not source.isOpened():
+        print(f"Error: Cannot open source {args.source}", file=sys.stderr)
+        return 1
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        summary = replay(source, out, max_frames=args.max_frames)
+    finally:
+        source.release()
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class BufferPool:
+    """Named scratch arrays reused from frame to frame.
+
+    `get(name, shape)` returns a contiguous array backed by the buffer kept
+    under `name`, which only grows, so detection regions of varying size
+    (ROI boxes, tracking windows) reuse it without reallocating. Arrays
+    returned under one name alias each other: a caller keeps a distinct
+    name for every result it still needs while producing the next one.
+
+    `resize(w, h)` drops every buffer when the frame size changes, so a
+    switch to a smaller resolution also gives the memory back. A pool
+    belongs to one processing thread; `allocations` counts buffer
+    (re)allocations, which stays flat in a steady-state loop.
+    """
+
+    def __init__(self):
+        self._flat: Dict[str, np.ndarray] = {}
+        self._size: Optional[Tuple[int, int]] = None
+        self.allocations = 0
+
+    def resize(self, width: int, height: int) -> None:
+        size = (int(width), int(height))
+        if size != self._size:
+            self._flat.clear()
+            self._size = size
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype: Any = np.uint8,
+            capacity: Optional[Tuple[int, ...]] = None) -> np.ndarray:
+        """Array of `shape` in the `name` buffer.
+
+        `capacity` is the largest shape this name will be asked for; the
+        buffer is sized for it up front so smaller, varying requests never
+        reallocate.
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        flat = self._flat.get(name)
+        if flat is None or flat.nbytes < nbytes:
+            size = nbytes
+            if capacity is not None:
+                size = max(size, int(np.prod(capacity)) * dtype.itemsize)
+            flat = self._flat[name] = np.empty(max(1, size), dtype=np.uint8)
+            self.allocations += 1
+        return flat[:nbytes].view(dtype).reshape(shape)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(flat.nbytes for flat in self._flat.values())
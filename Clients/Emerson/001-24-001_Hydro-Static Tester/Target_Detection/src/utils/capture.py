@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+import cv2
+
+# Consumer read policies for LatestFrameBuffer. Both drop the oldest unread
+# frame when the ring is full; they differ in which frame the consumer gets.
+POLICY_LATEST = "latest"  # always the newest frame, older unread are dropped
+POLICY_FIFO = "fifo"      # oldest unread frame first (bounded backlog)
+POLICIES = (POLICY_LATEST, POLICY_FIFO)
+
+
+class LatestFrameBuffer:
+    """Small ring of reusable frame slots shared by one producer and one consumer.
+
+    The producer reads straight into a free slot (no copy), the consumer leases
+    a published slot until its next `get()`. Frames published but never handed
+    to the consumer are counted as dropped. `on_commit` is called (outside
+    the lock) after each published frame, e.g. to wake a shared worker pool.
+    """
+
+    def __init__(self, slots: int = 3, policy: str = POLICY_LATEST,
+                 on_commit: Optional[Callable[[], None]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown capture drop policy: {policy!r}")
+        self.policy = policy
+        self.on_commit = on_commit
+        self._slots: List[Any] = [None] * max(2, int(slots))
+        self._stamps: List[Tuple[int, float]] = [(0, 0.0)] * len(self._slots)
+        self._ready: Deque[int] = deque()
+        self._leased: Optional[int] = None
+        self._writing: Optional[int] = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._seq = 0
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._slots)
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._ready)
+
+    def begin_write(self) -> Tuple[int, Any]:
+        """Reserve a slot for the producer; returns (slot index, buffer or None)."""
+        with self._cond:
+            busy = set(self._ready)
+            if self._leased is not None:
+                busy.add(self._leased)
+            for idx in range(len(self._slots)):
+                if idx not in busy:
+                    break
+            else:
+                # Ring full: recycle the oldest unread frame
+                idx = self._ready.popleft()
+                self.dropped += 1
+            self._writing = idx
+            return idx, self._slots[idx]
+
+    def commit_write(self, idx: int, frame: Any, timestamp: Optional[float] = None) -> int:
+        """Publish the frame written into slot `idx`; returns its sequence number."""
+        with self._cond:
+            # cv2 reallocates when the frame size changes; keep the new buffer
+            self._slots[idx] = frame
+            self._seq += 1
+            self._stamps[idx] = (
+                self._seq, time.monotonic() if timestamp is None else timestamp)
+            self._writing = None
+            self._ready.append(idx)
+            self.captured += 1
+            self._cond.notify()
+            seq = self._seq
+        if self.on_commit is not None:
+            self.on_commit()
+        return seq
+
+    def cancel_write(self, idx: int) -> None:
+        with self._cond:
+            if self._writing == idx:
+                self._writing = None
+
+    def get(self, timeout: Optional[float] = None):
+        """Lease the next frame per policy; returns (frame, seq, ts) or None.
+
+        The previously leased frame is released and may be overwritten by the
+        producer, so callers must finish with a frame before the next `get()`.
+        None is returned on timeout or once the buffer is closed and drained.
+        """
+        with self._cond:
+            self._leased = None
+            if not self._ready and not self._closed:
+                self._cond.wait(timeout)
+            if not self._ready:
+                return None
+            if self.policy == POLICY_LATEST:
+                idx = self._ready.pop()
+                self.dropped += len(self._ready)
+                self._ready.clear()
+            else:
+                idx = self._ready.popleft()
+            self._leased = idx
+            self.processed += 1
+            seq, ts = self._stamps[idx]
+            return self._slots[idx], seq, ts
+
+    def release(self) -> None:
+        with self._cond:
+            self._leased = None
+
+    def exchange(self, spare: Any = None) -> Any:
+        """Take the leased frame for keeps, leaving `spare` in its slot.
+
+        The producer reads the next frame into `spare` (or a new buffer
+        when it is None or the wrong size), so the frame returned is never
+        overwritten. Returns None if nothing is leased.
+        """
+        with self._cond:
+            idx = self._leased
+            if idx is None:
+                return None
+            frame = self._slots[idx]
+            self._slots[idx] = spare
+            return frame
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+class CaptureThread:
+    """Reads frames from a cv2.VideoCapture-like object into a LatestFrameBuffer.
+
+    All `cap` calls happen on this thread, including resolution changes
+    requested from elsewhere, so the driver is never touched concurrently.
+    `configure(cap, width, height)` applies a new resolution (e.g. a full
+    format negotiation); by default only the frame size is set.
+    """
+
+    def __init__(self, cap, buffer: LatestFrameBuffer,
+                 on_resize: Optional[Callable[[int, int], None]] = None,
+                 metrics: Any = None,
+                 configure: Optional[Callable[[Any, int, int], Any]] = None):
+        self.cap = cap
+        self.buffer = buffer
+        self.on_resize = on_resize
+        self.configure = configure
+        self.metrics = metrics  # anything with observe(stage, ms)
+        self.failed = False
+        self._pending_size: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, join_timeout: float = 1.0) -> None:
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=join_timeout)
+        self.buffer.close()
+
+    def request_resolution(self, width: int, height: int) -> None:
+        with self._lock:
+            self._pending_size = (int(width), int(height))
+
+    def _apply_pending_size(self) -> None:
+        with self._lock:
+            size = self._pending_size
+            self._pending_size = None
+        if size is None:
+            return
+        try:
+            if self.configure is not None:
+                self.configure(self.cap, size[0], size[1])
+            else:
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+            w_actual = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            h_actual = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if w_actual > 0 and h_actual > 0 and self.on_resize is not None:
+                self.on_resize(w_actual, h_actual)
+        except Exception:
+            pass
+
+    def read(self, dst: Any = None) -> Any:
+        """Apply any pending resolution change, then read one frame.
+
+        Reads into `dst` when its size still matches; returns the frame or
+        None on failure. Usable directly as a pipeline source.
+        """
+        self._apply_pending_size()
+        t0 = time.perf_counter()
+        if dst is not None:
+            ret, frame = self.cap.read(dst)
+        else:
+            ret, frame = self.cap.read()
+        if self.metrics is not None:
+            self.metrics.observe("capture", (time.perf_counter() - t0) * 1000.0)
+        if not ret or frame is None:
+            self.failed = True
+            return None
+        return frame
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                idx, dst = self.buffer.begin_write()
+                frame = self.read(dst)
+                if frame is None:
+                    self.buffer.cancel_write(idx)
+                    break
+                self.buffer.commit_write(idx, frame, time.monotonic())
+        finally:
+            self.buffer.close()
@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+import math
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Acceptance thresholds shared by both Hough passes
+MIN_CIRCULARITY = 0.87
+FILL_RATIO_RANGE = (0.75, 1.25)
+
+
+@lru_cache(maxsize=256)
+def disc_offsets(r: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(dy, dx) offsets of a filled radius-r disc, rasterised like cv2.circle.
+
+    Offsets cover the half-open box [-r, r) so the disc matches the
+    [x - r, x + r) crop used for validation.
+    """
+    canvas = np.zeros((2 * r + 1, 2 * r + 1), dtype=np.uint8)
+    cv2.circle(canvas, (r, r), r, color=255, thickness=-1)
+    dy, dx = np.nonzero(canvas[:2 * r, :2 * r])
+    dy = (dy - r).astype(np.int32)
+    dx = (dx - r).astype(np.int32)
+    dy.setflags(write=False)
+    dx.setflags(write=False)
+    return dy, dx
+
+
+def _circularity(cnt) -> float:
+    area = float(cv2.contourArea(cnt))
+    perim = float(cv2.arcLength(cnt, True))
+    if perim <= 0.0 or area <= 0.0:
+        return 0.0
+    return 4.0 * math.pi * area / (perim * perim)
+
+
+def validate_candidates(mask: np.ndarray, candidates: Sequence[Tuple[int, int, int]],
+                        min_circularity: float = MIN_CIRCULARITY,
+                        fill_range: Tuple[float, float] = FILL_RATIO_RANGE,
+                        pool: Any = None) -> np.ndarray:
+    """Score all (x, y, r) candidates against `mask` at once.
+
+    Same criteria as checking each [x - r, x + r) crop by hand (largest
+    contour circularity, red fill of the ideal disc), evaluated in stages
+    so most candidates are rejected by O(1) vectorised tests:
+
+    1. one integral image of the mask bounds the red pixels in each disc
+       by the red pixels in its crop box;
+    2. fill ratio is gathered for the rest in one NumPy pass per radius
+       using cached disc offsets (no per-candidate masks);
+    3. only candidates that pass both get a contour pass on their crop.
+
+    Returns a boolean array, True where a candidate passes. With a
+    BufferPool the binary mask and integral image reuse its buffers.
+    """
+    n = len(candidates)
+    ok = np.zeros(n, dtype=bool)
+    if n == 0:
+        return ok
+    cand = np.asarray(candidates, dtype=np.int64).reshape(n, 3)
+    h, w = mask.shape[:2]
+    xs_c, ys_c, rs = cand[:, 0], cand[:, 1], cand[:, 2]
+    x0 = np.clip(xs_c - rs, 0, w)
+    y0 = np.clip(ys_c - rs, 0, h)
+    x1 = np.clip(xs_c + rs, 0, w)
+    y1 = np.clip(ys_c + rs, 0, h)
+    need = fill_range[0] * math.pi * rs.astype(np.float64) ** 2
+    alive = (rs > 0) & (x1 > x0) & (y1 > y0)
+
+    # 1. Red pixels in the crop box bound the red pixels in the disc
+    if pool is None:
+        binary = (mask > 0).view(np.uint8)
+        integral = cv2.integral(binary, sdepth=cv2.CV_32S)
+    else:
+        binary = pool.get("binary", (h, w))
+        np.greater(mask, 0, out=binary.view(bool))
+        integral = cv2.integral(binary, sum=pool.get("integral", (h + 1, w + 1), np.int32),
+                                sdepth=cv2.CV_32S)
+    box_red = (integral[y1, x1] - integral[y0, x1]
+               - integral[y1, x0] + integral[y0, x0])
+    alive &= box_red >= need
+    if not alive.any():
+        return ok
+
+    # 2. Exact fill ratio, grouped by radius
+    fill = np.zeros(n, dtype=np.float64)
+    for r in np.unique(rs[alive]):
+        r = int(r)
+        rows = np.nonzero(alive & (rs == r))[0]
+        dy, dx = disc_offsets(r)
+        ys = ys_c[rows, None] + dy[None, :]
+        xs = xs_c[rows, None] + dx[None, :]
+        inside = (ys >= 0) & (ys < h) & (xs >= 0) & (xs < w)
+        np.clip(ys, 0, h - 1, out=ys)
+        np.clip(xs, 0, w - 1, out=xs)
+        red = (binary[ys, xs] > 0) & inside
+        fill[rows] = np.count_nonzero(red, axis=1) / (math.pi * r * r)
+    alive &= (fill >= fill_range[0]) & (fill <= fill_range[1])
+    if not alive.any():
+        return ok
+
+    # 3. Circularity of the largest contour in each surviving crop
+    for i in np.nonzero(alive)[0]:
+        sub = mask[y0[i]:y1[i], x0[i]:x1[i]]
+        cnts, _ = cv2.findContours(sub, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if cnts:
+            ok[i] = _circularity(max(cnts, key=cv2.contourArea)) >= min_circularity
+    return ok
+
+
+def refine_circles(mask: np.ndarray, circles: Sequence[Tuple[float, float, float]],
+                   scale: int) -> List[Tuple[int, int, int]]:
+    """Native-resolution (x, y, r) for circles found on `mask` downscaled by `scale`.
+
+    Each circle's box in `mask` (scaled radius plus 2 * `scale` px) is
+    labelled, and the red blob whose centroid is nearest the scaled centre
+    (and within its radius) gives the centre from its moments and the radius
+    of the disc with the same pixel area. The result is accurate to the
+    native pixel, not to `scale`. A circle with no such blob, or whose blob
+    runs into the box edge, keeps its scaled estimate. Circles that refine
+    onto the same blob are returned once, in the order given.
+    """
+    h, w = mask.shape[:2]
+    out = []
+    for (xf, yf, rf) in circles:
+        # Downscaled pixel i covers native pixels [i * scale, (i + 1) * scale)
+        cx = (float(xf) + 0.5) * scale - 0.5
+        cy = (float(yf) + 0.5) * scale - 0.5
+        r = float(rf) * scale
+        pad = int(math.ceil(r)) + 2 * scale
+        x0, y0 = max(0, int(cx) - pad), max(0, int(cy) - pad)
+        x1, y1 = min(w, int(cx) + pad + 1), min(h, int(cy) + pad + 1)
+        best = None
+        if x1 > x0 and y1 > y0:
+            n, _, stats, centroids = cv2.connectedComponentsWithStats(
+                mask[y0:y1, x0:x1], connectivity=8)
+            for i in range(1, n):
+                mx, my = centroids[i][0] + x0, centroids[i][1] + y0
+                d = (mx - cx) ** 2 + (my - cy) ** 2
+                if d <= r * r and (best is None or d < best[0]):
+                    best = (d, i, mx, my)
+        if best is not None:
+            _, i, mx, my = best
+            bx, by, bw, bh, area = stats[i]
+            # A blob cut by the box (not the frame) edge has biased moments
+            clipped = ((bx == 0 and x0 > 0) or (by == 0 and y0 > 0)
+                       or (bx + bw == x1 - x0 and x1 < w) or (by + bh == y1 - y0 and y1 < h))
+            if not clipped:
+                refined = (int(round(mx)), int(round(my)), int(round(math.sqrt(area / math.pi))))
+                if refined not in out:
+                    out.append(refined)
+                continue
+        out.append((int(round(cx)), int(round(cy)), int(round(r))))
+    return out
+
+
+Box = Tuple[int, int, int, int]
+
+
+def merge_boxes(boxes: Sequence[Box]) -> List[Box]:
+    """Union overlapping (x0, y0, x1, y1) boxes until none overlap."""
+    out = [tuple(b) for b in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(out)):
+            for j in range(i + 1, len(out)):
+                ax0, ay0, ax1, ay1 = out[i]
+                bx0, by0, bx1, by1 = out[j]
+                if ax0 < bx1 and bx0 < ax1 and ay0 < by1 and by0 < ay1:
+                    out[i] = (min(ax0, bx0), min(ay0, by0), max(ax1, bx1), max(ay1, by1))
+                    del out[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return out
+
+
+def fallback_tiles(shape: Tuple[int, ...], weak: Sequence[Tuple[int, int, int]],
+                   targets: Sequence[Tuple[int, int, int]], tile_px: int,
+                   max_tiles: int = 8) -> List[Box]:
+    """Tiles for the fine (2x) pass, clipped to a mask of `shape`.
+
+    One tile of half-size `tile_px` around each weak first-pass response
+    (a small candidate that failed validation) and one around each target
+    (target radius + `tile_px`). Overlapping tiles are merged; at most
+    `max_tiles` are returned, targets first.
+    """
+    h, w = shape[:2]
+    boxes: List[Box] = []
+    centres = [(x, y, r + tile_px) for (x, y, r) in targets]
+    centres += [(x, y, tile_px) for (x, y, r) in weak if r <= tile_px]
+    for (x, y, half) in centres:
+        x0, y0 = max(0, int(x) - half), max(0, int(y) - half)
+        x1, y1 = min(w, int(x) + half), min(h, int(y) + half)
+        if x1 > x0 and y1 > y0:
+            boxes.append((x0, y0, x1, y1))
+    return merge_boxes(boxes[:max_tiles])
+
+
+class UpsampleScheduler:
+    """Decides when the fine (2x) Hough pass runs and counts how often.
+
+    `should_run` is called once per frame (detect_circles decides for all
+    regions of a frame together), so every count here is in frames. The
+    pass is wanted whenever the first pass comes up short. After
+    `idle_frames` consecutive runs that found nothing new it is skipped,
+    apart from one probe every `probe_frames` wanted frames; a probe that
+    finds something re-arms it. `idle_frames` 0 never skips.
+    """
+
+    def __init__(self, idle_frames: int = 10, probe_frames: int = 15):
+        self.idle_frames = int(idle_frames)
+        self.probe_frames = int(probe_frames)
+        self._lock = threading.Lock()
+        self._empty_streak = 0
+        self._since_probe = 0
+        self.frames = 0
+        self.wanted = 0
+        self.fired = 0
+        self.skipped = 0
+        self.found = 0
+        self.tiles = 0
+
+    def configure(self, idle_frames: int, probe_frames: int) -> None:
+        with self._lock:
+            self.idle_frames = int(idle_frames)
+            self.probe_frames = int(probe_frames)
+
+    def should_run(self, wanted: bool) -> bool:
+        """Count one frame; True if the fine pass should run on it."""
+        with self._lock:
+            self.frames += 1
+            if not wanted:
+                return False
+            self.wanted += 1
+            if 0 < self.idle_frames <= self._empty_streak:
+                self._since_probe += 1
+                if self._since_probe < max(1, self.probe_frames):
+                    self.skipped += 1
+                    return False
+                self._since_probe = 0
+            return True
+
+    def record(self, tiles: int, found_new: bool) -> None:
+        """Report the outcome of a fine pass that ran over `tiles` tiles."""
+        with self._lock:
+            self._record(tiles, found_new)
+
+    def _record(self, tiles: int, found_new: bool) -> None:
+        self.fired += 1
+        self.tiles += int(tiles)
+        if found_new:
+            self.found += 1
+            self._empty_streak = 0
+            self._since_probe = 0
+        else:
+            self._empty_streak += 1
+
+    def allows(self) -> bool:
+        """Whether a frame that wants the fine pass would get it now (no counting)."""
+        with self._lock:
+            if not 0 < self.idle_frames <= self._empty_streak:
+                return True
+            return self._since_probe + 1 >= max(1, self.probe_frames)
+
+    def account(self, wanted: bool, ran: bool, tiles: int = 0, found_new: bool = False) -> None:
+        """Count one frame whose run/skip was decided elsewhere from `allows()`.
+
+        Process mode uses this: the parent sends `allows()` with each frame
+        and feeds the workers' outcomes back here in frame order, so the
+        streaks and counts cover every frame, not each worker's share.
+        """
+        with self._lock:
+            self.frames += 1
+            if not wanted:
+                return
+            self.wanted += 1
+            idle = 0 < self.idle_frames <= self._empty_streak
+            if not ran:
+                self.skipped += 1
+                if idle:
+                    self._since_probe += 1
+                return
+            if idle:
+                self._since_probe = 0
+            self._record(tiles, found_new)
+
+    @property
+    def idle(self) -> bool:
+        return 0 < self.idle_frames <= self._empty_streak
+
+    @property
+    def fire_rate(self) -> float:
+        """Fraction of frames on which the fine pass ran."""
+        return self.fired / self.frames if self.frames else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "wanted": self.wanted,
+                "fired": self.fired,
+                "skipped": self.skipped,
+                "found": self.found,
+                "tiles": self.tiles,
+                "fire_rate": self.fire_rate,
+                "idle": self.idle,
+            }
+
+
+class FallbackDecision:
+    """Scheduler stand-in for one frame whose fine pass was permitted elsewhere.
+
+    `should_run` runs the pass when it is wanted and `allowed`; the outcome
+    goes back to the deciding UpsampleScheduler via `account(*outcome())`.
+    """
+
+    def __init__(self, allowed: bool):
+        self.allowed = bool(allowed)
+        self.wanted = False
+        self.ran = False
+        self.tiles = 0
+        self.found_new = False
+
+    def should_run(self, wanted: bool) -> bool:
+        self.wanted = bool(wanted)
+        self.ran = self.wanted and self.allowed
+        return self.ran
+
+    def record(self, tiles: int, found_new: bool) -> None:
+        self.tiles = int(tiles)
+        self.found_new = bool(found_new)
+
+    def outcome(self) -> Tuple[bool, bool, int, bool]:
+        return self.wanted, self.ran, self.tiles, self.found_new
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+# Video codecs by file extension; MJPG in .avi works with every OpenCV build
+CODECS = {".avi": "MJPG", ".mp4": "mp4v"}
+
+
+class _Held:
+    """One frame owned by the recorder: in the pre-roll ring, in clips, or both."""
+    __slots__ = ("frame", "ts", "refs", "in_ring")
+
+    def __init__(self, frame: np.ndarray, ts: float):
+        self.frame = frame
+        self.ts = ts
+        self.refs = 0      # clips still to encode this frame
+        self.in_ring = True
+
+
+class _Clip:
+    __slots__ = ("name", "frames", "until", "closed", "truncated", "written", "failed")
+
+    def __init__(self, name: str, until: float):
+        self.name = name
+        self.frames: Deque[_Held] = deque()
+        self.until = until
+        self.closed = False
+        self.truncated = False
+        self.written = 0
+        self.failed = False
+
+
+class ClipRecorder:
+    """Keeps the last `pre_s` seconds of frames and saves clips around triggers.
+
+    Frames are handed over, not copied: the detection loop gives each
+    processed frame to `add` (taking it out of the capture ring with
+    LatestFrameBuffer.exchange) and puts `spare()` back in its place, a
+    buffer the recorder no longer needs, so in steady state frames just
+    circulate between the capture ring and the recorder.
+
+    `trigger(reason)` starts a clip with the current pre-roll and keeps
+    adding frames until `post_s` after the last trigger (triggers during a
+    clip extend it). A background thread encodes clips as their frames
+    arrive. The loop is never blocked:
+
+    - all held frames count against `budget_bytes`; over budget the oldest
+      pre-roll frames go first, then the open clip is ended early
+      (`truncated`);
+    - a trigger while `max_clips` clips are still encoding is dropped
+      (`dropped`).
+
+    A clip whose file cannot be opened or written is counted in `failed`
+    and left out of `saved`; its frames are still released.
+    """
+
+    def __init__(self, directory: str, pre_s: float = 3.0, post_s: float = 3.0,
+                 budget_bytes: int = 256 << 20, max_clips: int = 2,
+                 extension: str = ".avi", prefix: str = "clip"):
+        self.directory = directory
+        self.pre_s = max(0.0, float(pre_s))
+        self.post_s = max(0.0, float(post_s))
+        self.budget_bytes = max(1, int(budget_bytes))
+        self.max_clips = max(1, int(max_clips))
+        self.extension = extension if extension in CODECS else ".avi"
+        self.prefix = prefix
+        self._ring: Deque[_Held] = deque()
+        self._clips: Deque[_Clip] = deque()  # oldest (being encoded) first
+        self._open: Optional[_Clip] = None
+        self._spares: List[np.ndarray] = []
+        self._held_bytes = 0
+        self._count = 0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.saved: List[str] = []
+        self.triggers = 0
+        self.dropped = 0
+        self.truncated = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="clip-encoder", daemon=True)
+        self._thread.start()
+
+    def stop(self, join_timeout: float = 5.0) -> None:
+        """Finish the open clip with what it has and wait for encoding."""
+        with self._cond:
+            if self._open is not None:
+                self._open.closed = True
+                self._open = None
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=join_timeout)
+            self._thread = None
+
+    @property
+    def held_bytes(self) -> int:
+        return self._held_bytes
+
+    def spare(self) -> Optional[np.ndarray]:
+        """A buffer to put back into the capture ring (None = let capture allocate)."""
+        with self._cond:
+            return self._spares.pop() if self._spares else None
+
+    def add(self, frame: Optional[np.ndarray], ts: float) -> None:
+        """Hand over one processed frame; `ts` is its monotonic capture time."""
+        if frame is None:
+            return
+        held = _Held(frame, ts)
+        with self._cond:
+            self._ring.append(held)
+            self._held_bytes += frame.nbytes
+            clip = self._open
+            if clip is not None:
+                if ts > clip.until:
+                    clip.closed = True
+                    self._open = None
+                else:
+                    held.refs += 1
+                    clip.frames.append(held)
+                self._cond.notify_all()
+            self._trim(ts)
+
+    def trigger(self, reason: str, ts: Optional[float] = None) -> bool:
+        """Start (or extend) a clip around now; False if it had to be dropped."""
+        ts = time.monotonic() if ts is None else ts
+        with self._cond:
+            self.triggers += 1
+            if self._open is not None:
+                self._open.until = max(self._open.until, ts + self.post_s)
+                return True
+            if len(self._clips) >= self.max_clips:
+                self.dropped += 1
+                return False
+            self._count += 1
+            name = (f"{self.prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{self._count:04d}-"
+                    f"{reason}{self.extension}")
+            clip = _Clip(os.path.join(self.directory, name), ts + self.post_s)
+            for held in self._ring:
+                held.refs += 1
+                clip.frames.append(held)
+            self._clips.append(clip)
+            self._open = clip
+            self._cond.notify_all()
+            return True
+
+    def _trim(self, now: float) -> None:
+        # Pre-roll: frames older than pre_s, then oldest first while over budget
+        ring = self._ring
+        while ring and (now - ring[0].ts > self.pre_s or self._held_bytes > self.budget_bytes):
+            self._release_ring(ring.popleft())
+        if self._held_bytes > self.budget_bytes and self._open is not None:
+            # Only frames waiting to be encoded are left: end the clip early
+            self._open.closed = True
+            self._open.truncated = True
+            self._open = None
+            self.truncated += 1
+            self._cond.notify_all()
+
+    def _release_ring(self, held: _Held) -> None:
+        held.in_ring = False
+        if held.refs == 0:
+            self._free(held)
+
+    def _free(self, held: _Held) -> None:
+        self._held_bytes -= held.frame.nbytes
+        if len(self._spares) < 4:
+            self._spares.append(held.frame)
+        held.frame = None
+
+    def _next_frame(self):
+        """(clip, frame) to encode next, (clip, None) when that clip is done, or None to exit."""
+        with self._cond:
+            while True:
+                if self._clips:
+                    clip = self._clips[0]
+                    if clip.frames:
+                        return clip, clip.frames.popleft()
+                    if clip.closed:
+                        self._clips.popleft()
+                        return clip, None
+                elif self._stop:
+                    return None
+                self._cond.wait(0.5)
+
+    def _done_with(self, held: _Held) -> None:
+        with self._cond:
+            held.refs -= 1
+            if held.refs == 0 and not held.in_ring:
+                self._free(held)
+
+    def _run(self) -> None:
+        writer = None
+        while True:
+            item = self._next_frame()
+            if item is None:
+                break
+            clip, held = item
+            if held is None:
+                if writer is not None:
+                    writer.release()
+                    writer = None
+                    if not clip.failed:
+                        self.saved.append(clip.name)
+                continue
+            try:
+                if clip.failed:
+                    continue
+                if writer is None:
+                    fps = self._clip_fps(clip, held)
+                    h, w = held.frame.shape[:2]
+                    fourcc = cv2.VideoWriter_fourcc(*CODECS[self.extension])
+                    writer = cv2.VideoWriter(clip.name, fourcc, fps, (w, h))
+                    if not writer.isOpened():
+                        print(f"Warning: Cannot write clip {clip.name}")
+                        self._fail(clip, writer)
+                        writer = None
+                        continue
+                writer.write(held.frame)
+                clip.written += 1
+            except Exception as e:
+                print(f"Warning: Clip write failed: {e}")
+                self._fail(clip, writer)
+                writer = None
+            finally:
+                self._done_with(held)
+        if writer is not None:
+            writer.release()
+
+    def _fail(self, clip: _Clip, writer: Any) -> None:
+        """Give up on `clip`: close its writer, drop any partial file, count it."""
+        clip.failed = True
+        self.failed += 1
+        if writer is not None:
+            try:
+                writer.release()
+            except Exception:
+                pass
+        try:
+            if os.path.exists(clip.name):
+                os.remove(clip.name)
+        except OSError:
+            pass
+
+    def _clip_fps(self, clip: _Clip, first: _Held) -> float:
+        """Frame rate from the capture times of the frames queued so far."""
+        with self._cond:
+            stamps = [first.ts] + [h.ts for h in clip.frames]
+        if len(stamps) >= 2 and stamps[-1] > stamps[0]:
+            return max(1.0, min(240.0, (len(stamps) - 1) / (stamps[-1] - stamps[0])))
+        return 30.0
+
+
+def clip_triggers(prev_hits: Sequence[bool], hits: Sequence[bool], prev_markers: int,
+                  markers: int, enabled: Sequence[str]) -> List[str]:
+    """Trigger reasons for one frame: "target1_on", "target2_off", "dropout", ..."""
+    reasons = []
+    if "hit" in enabled:
+        for i, (was, now) in enumerate(zip(prev_hits, hits)):
+            if bool(was) != bool(now):
+                reasons.append(f"target{i + 1}_{'on' if now else 'off'}")
+    if "dropout" in enabled and markers < prev_markers:
+        reasons.append("dropout")
+    return reasons
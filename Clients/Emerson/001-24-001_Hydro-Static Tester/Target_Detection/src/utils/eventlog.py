@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import glob
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# One fixed-size record per processed frame. Files are ordinary .npy arrays
+# of EVENT_DTYPE preallocated to `records_per_file` rows and filled through
+# a memory map, so a reader gets a whole file with one np.load. Rows never
+# written stay zero; `frame` starts at 1, so frame == 0 marks them.
+MAX_CIRCLES = 4
+EVENT_DTYPE = np.dtype([
+    ("time", "<f8"),                        # wall-clock capture time (epoch s)
+    ("frame", "<u8"),                       # frame number within the log, from 1
+    ("mask_ms", "<f4"),
+    ("detect_ms", "<f4"),
+    ("track_ms", "<f4"),
+    ("camera_to_plc_ms", "<f4"),
+    ("circles", "<i2", (MAX_CIRCLES, 3)),   # detections (x, y, r), -1 padded
+    ("n_circles", "u1"),
+    ("raw_hit", "u1", (2,)),                # per target, before the OFF filter
+    ("hit", "u1", (2,)),                    # debounced (PLC) state
+], align=True)
+
+_NO_CIRCLE = (-1, -1, -1)
+_PAD = [(_NO_CIRCLE,) * n for n in range(MAX_CIRCLES + 1)]
+
+
+class EventLog:
+    """Append-only per-frame recorder, rotated over memory-mapped .npy files.
+
+    `append` only puts a tuple on a deque, so it costs the detection loop a
+    few microseconds. A background thread converts what has queued up into
+    one structured array every `flush_s` and copies it into the current
+    file's memory map, starting a new file every `records_per_file` rows.
+    Written rows are in the OS page cache straight away, so they survive
+    the app crashing; files are synced on rotation and on `stop`.
+
+    If the writer falls behind by `max_pending` rows (e.g. a stalled disk)
+    new rows are dropped and counted rather than growing memory.
+    `keep_files` > 0 deletes the oldest files beyond that many.
+    """
+
+    def __init__(self, directory: str, records_per_file: int = 216000,
+                 prefix: str = "events", flush_s: float = 0.2,
+                 max_pending: int = 100000, keep_files: int = 0):
+        self.directory = directory
+        self.records_per_file = max(1, int(records_per_file))
+        self.prefix = prefix
+        self.flush_s = float(flush_s)
+        self.max_pending = max(1, int(max_pending))
+        self.keep_files = max(0, int(keep_files))
+        self._pending: Deque[tuple] = deque()
+        self._frame = 0
+        self._file_seq = 0
+        self._mm: Optional[np.memmap] = None
+        self._pos = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.path: Optional[str] = None
+        self.written = 0
+        self.dropped = 0
+        self.files = 0
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def stop(self, join_timeout: float = 2.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=join_timeout)
+            self._thread = None
+        self._close_file()
+
+    def append(self, ts: float, circles: Sequence[Tuple[int, int, int]],
+               raw_hits: Sequence[bool], hits: Sequence[bool],
+               mask_ms: float = 0.0, detect_ms: float = 0.0, track_ms: float = 0.0,
+               camera_to_plc_ms: float = 0.0) -> None:
+        """Queue one frame; `ts` is its time.monotonic() capture timestamp."""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._frame += 1
+        n = min(len(circles), MAX_CIRCLES)
+        self._pending.append((
+            ts, self._frame, mask_ms, detect_ms, track_ms, camera_to_plc_ms,
+            tuple(circles[:n]) + _PAD[MAX_CIRCLES - n], n,
+            (raw_hits[0], raw_hits[1]), (hits[0], hits[1]),
+        ))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self) -> None:
+        pending = self._pending
+        n = len(pending)
+        if n == 0:
+            return
+        rows = np.array([pending.popleft() for _ in range(n)], dtype=EVENT_DTYPE)
+        # Capture timestamps are monotonic; convert with the current offset
+        rows["time"] += time.time() - time.monotonic()
+        try:
+            self._write(rows)
+        except Exception as e:
+            self.dropped += len(rows)
+            print(f"Warning: Event log write failed: {e}")
+
+    def _write(self, rows: np.ndarray) -> None:
+        start = 0
+        while start < len(rows):
+            if self._mm is None:
+                self._open_file()
+            n = min(len(rows) - start, self.records_per_file - self._pos)
+            self._mm[self._pos:self._pos + n] = rows[start:start + n]
+            self._pos += n
+            start += n
+            self.written += n
+            if self._pos >= self.records_per_file:
+                self._close_file()
+
+    def _open_file(self) -> None:
+        self._file_seq += 1
+        name = f"{self.prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{self._file_seq:04d}.npy"
+        self.path = os.path.join(self.directory, name)
+        self._mm = np.lib.format.open_memmap(self.path, mode="w+", dtype=EVENT_DTYPE,
+                                             shape=(self.records_per_file,))
+        self._pos = 0
+        self.files += 1
+        if self.keep_files:
+            for old in log_files(self.directory, self.prefix)[:-self.keep_files]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def _close_file(self) -> None:
+        mm = self._mm
+        if mm is None:
+            return
+        self._mm = None
+        try:
+            mm.flush()
+        except Exception:
+            pass
+        del mm
+
+
+def log_files(directory: str, prefix: str = "events") -> List[str]:
+    """Log files in `directory`, oldest first."""
+    return sorted(glob.glob(os.path.join(directory, f"{prefix}-*.npy")))
+
+
+def read_events(paths: Union[str, Sequence[str]], start: Optional[float] = None,
+                end: Optional[float] = None, prefix: str = "events") -> np.ndarray:
+    """All written records from log files (or a directory of them) as one array.
+
+    `start`/`end` limit the result to capture times (epoch s) in [start, end).
+    """
+    if isinstance(paths, str):
+        paths = log_files(paths, prefix) if os.path.isdir(paths) else [paths]
+    parts = []
+    for path in paths:
+        data = np.load(path, mmap_mode="r")
+        # Rows are filled in order, so the written ones are a prefix
+        used = int(np.count_nonzero(data["frame"]))
+        rows = data[:used]
+        if start is not None or end is not None:
+            t = rows["time"]
+            keep = np.ones(len(rows), dtype=bool)
+            if start is not None:
+                keep &= t >= start
+            if end is not None:
+                keep &= t < end
+            rows = rows[keep]
+        parts.append(np.array(rows))
+    if not parts:
+        return np.zeros(0, dtype=EVENT_DTYPE)
+    return np.concatenate(parts)
+
+
+def hit_transitions(records: np.ndarray) -> np.ndarray:
+    """The records where either debounced hit state changed."""
+    if len(records) == 0:
+        return records
+    hit = records["hit"]
+    changed = np.zeros(len(records), dtype=bool)
+    changed[1:] = np.any(hit[1:] != hit[:-1], axis=1)
+    return records[changed]
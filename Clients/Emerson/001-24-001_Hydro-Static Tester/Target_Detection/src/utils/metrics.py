@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bucket bounds in ms: roughly x1.5 steps from 50 us to 2 s
+DEFAULT_BOUNDS_MS: Tuple[float, ...] = (
+    0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0,
+    20.0, 30.0, 50.0, 75.0, 100.0, 150.0, 200.0, 300.0, 500.0, 1000.0, 2000.0,
+)
+
+
+class _Shard:
+    __slots__ = ("counts", "total")
+
+    def __init__(self, n: int):
+        self.counts = [0] * n
+        self.total = 0.0
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram that writers update without locking.
+
+    Each recording thread gets its own shard of bucket counters, so
+    `observe` is a bisect and two increments on thread-private data.
+    Readers sum the shards; a reading taken while a writer is mid-update
+    may be one sample behind, never corrupt. Only the first observation
+    from a new thread takes a lock (to register its shard).
+    """
+
+    def __init__(self, name: str, bounds_ms: Sequence[float] = DEFAULT_BOUNDS_MS):
+        self.name = name
+        self.bounds = tuple(float(b) for b in bounds_ms)
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._register = threading.Lock()
+        self.last = 0.0  # most recent observation from any thread
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard(len(self.bounds) + 1)  # last bucket is +Inf
+            with self._register:
+                self._shards = self._shards + [shard]
+            self._local.shard = shard
+        return shard
+
+    def observe(self, ms: float) -> None:
+        shard = self._shard()
+        shard.counts[bisect_left(self.bounds, ms)] += 1
+        shard.total += ms
+        self.last = ms
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """(per-bucket counts, sum of observed ms) across all threads."""
+        counts = [0] * (len(self.bounds) + 1)
+        total = 0.0
+        for shard in self._shards:
+            for i, c in enumerate(shard.counts):
+                counts[i] += c
+            total += shard.total
+        return counts, total
+
+    @property
+    def count(self) -> int:
+        return sum(sum(s.counts) for s in self._shards)
+
+    def quantile(self, q: float, counts: Optional[List[int]] = None) -> float:
+        """Estimated q-quantile in ms (linear within the bucket)."""
+        if counts is None:
+            counts, _ = self.snapshot()
+        n = sum(counts)
+        if n == 0:
+            return 0.0
+        rank = q * n
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lo + (hi - lo) * max(0.0, rank - seen) / c
+            seen += c
+        return self.bounds[-1]
+
+    def reset(self) -> None:
+        for shard in self._shards:
+            shard.counts = [0] * len(shard.counts)
+            shard.total = 0.0
+
+
+class MetricsRegistry:
+    """Named stage histograms plus gauges, rendered in Prometheus text format.
+
+    `labels` (e.g. {"camera": "station1"}) are added to every series, so
+    several registries can be served side by side (see MetricsGroup).
+    """
+
+    def __init__(self, prefix: str = "target_detection",
+                 labels: Optional[Dict[str, str]] = None):
+        self.prefix = prefix
+        self.labels = dict(labels or {})
+        self._hists: Dict[str, LatencyHistogram] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        hist = self._hists.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(stage, LatencyHistogram(stage))
+        return hist
+
+    def observe(self, stage: str, ms: float) -> None:
+        self.histogram(stage).observe(ms)
+
+    def last(self, stage: str) -> float:
+        """Most recent observation for `stage` in ms (0.0 if none yet)."""
+        hist = self._hists.get(stage)
+        return hist.last if hist is not None else 0.0
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(stage).observe((time.perf_counter() - t0) * 1000.0)
+
+    def gauge(self, name: str, fn: Callable[[], float], help_text: str = "") -> None:
+        """Register a value read on every scrape (e.g. current fps)."""
+        with self._lock:
+            self._gauges[name] = (help_text, fn)
+
+    def stages(self) -> List[str]:
+        return list(self._hists)
+
+    def summary(self, stages: Optional[Sequence[str]] = None,
+                quantiles: Sequence[float] = (0.5, 0.99)) -> Dict[str, Tuple[float, ...]]:
+        """{stage: (q1 ms, q2 ms, ...)} for stages with samples."""
+        out = {}
+        for stage in stages or self.stages():
+            hist = self._hists.get(stage)
+            if hist is None:
+                continue
+            counts, _ = hist.snapshot()
+            if sum(counts):
+                out[stage] = tuple(hist.quantile(q, counts) for q in quantiles)
+        return out
+
+    def _labels(self, **extra: str) -> str:
+        pairs = list(self.labels.items()) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in pairs) + "}"
+
+    def families(self) -> List[Tuple[str, str, str, List[str]]]:
+        """[(metric name, type, help, sample lines), ...] for text export."""
+        name = f"{self.prefix}_stage_latency_seconds"
+        lines = []
+        for stage, hist in list(self._hists.items()):
+            counts, total = hist.snapshot()
+            cum = 0
+            for bound, c in zip(hist.bounds, counts):
+                cum += c
+                lines.append(f'{name}_bucket{self._labels(stage=stage, le=f"{bound / 1000.0:g}")} {cum}')
+            cum += counts[-1]
+            lines.append(f'{name}_bucket{self._labels(stage=stage, le="+Inf")} {cum}')
+            lines.append(f'{name}_sum{self._labels(stage=stage)} {total / 1000.0:.6f}')
+            lines.append(f'{name}_count{self._labels(stage=stage)} {cum}')
+        out = [(name, "histogram", "Per-frame latency of each processing stage.", lines)]
+        for gname, (help_text, fn) in list(self._gauges.items()):
+            full = f"{self.prefix}_{gname}"
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            out.append((full, "gauge", help_text, [f"{full}{self._labels()} {value:g}"]))
+        return out
+
+    def prometheus_text(self) -> str:
+        return render_families([self])
+
+
+def escape_label(value: Any) -> str:
+    """A label value escaped for the Prometheus text format (\\, " and newline)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_families(registries: Sequence[MetricsRegistry]) -> str:
+    """Prometheus text for several registries, one HELP/TYPE per metric name."""
+    merged: Dict[str, Tuple[str, str, List[str]]] = {}
+    for registry in registries:
+        for name, kind, help_text, lines in registry.families():
+            if name not in merged:
+                merged[name] = (kind, help_text, [])
+            merged[name][2].extend(lines)
+    out = []
+    for name, (kind, help_text, lines) in merged.items():
+        if help_text:
+            out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+
+class MetricsGroup:
+    """Several registries (e.g. one per camera) served as one endpoint."""
+
+    def __init__(self, registries: Sequence[MetricsRegistry]):
+        self.registries = list(registries)
+
+    def prometheus_text(self) -> str:
+        return render_families(self.registries)
+
+
+class MetricsServer:
+    """Serves a registry (or MetricsGroup) at http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, registry: Any, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = int(port)
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        registry = self.registry
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # keep scrapes out of the console
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name="metrics-http", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import heapq
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class FramePacket:
+    """One frame travelling through the pipeline, filled in stage by stage."""
+    seq: int
+    timestamp: float
+    frame: Any
+    mask: Any = None
+    windowed: bool = False
+    fallback: Any = None
+    circles: Any = None
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+class FramePool:
+    """Free list of frame buffers so capture can read into recycled arrays."""
+
+    def __init__(self, size: int):
+        self.size = max(1, int(size))
+        self._free: List[Any] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[Any]:
+        with self._lock:
+            return self._free.pop() if self._free else None
+
+    def release(self, frame: Any) -> None:
+        if frame is None:
+            return
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(frame)
+
+
+@dataclass
+class Stage:
+    """A pipeline step. `fn` mutates the packet in place.
+
+    Stages marked `ordered` run on a single worker and see packets strictly
+    in sequence order; unordered stages may use several workers.
+    """
+    name: str
+    fn: Callable[[FramePacket], None]
+    workers: int = 1
+    queue_size: int = 2
+    ordered: bool = False
+    queue: "queue.Queue[FramePacket]" = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.ordered:
+            self.workers = 1
+        self.workers = max(1, int(self.workers))
+        self.queue = queue.Queue(maxsize=max(1, int(self.queue_size)))
+
+
+class Pipeline:
+    """Capture thread plus one thread group per stage, joined by bounded queues.
+
+    The capture -> first stage queue drops its oldest packet when full so the
+    pipeline always works on fresh frames; all later queues apply backpressure.
+    Sequence numbers are assigned when a packet leaves that first queue, so
+    downstream ordered stages see a gap-free sequence and can reorder results
+    from multi-worker stages. Failed packets keep flowing (with `error` set)
+    so ordering never stalls.
+    """
+
+    def __init__(self, source: Callable[[Optional[Any]], Optional[Any]],
+                 stages: List[Stage],
+                 on_done: Optional[Callable[[FramePacket], None]] = None):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.source = source
+        self.stages = stages
+        self.on_done = on_done
+        capacity = sum(s.queue_size + s.workers for s in stages)
+        self.pool = FramePool(capacity + 2)
+        self.failed = False
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+        self._reorder_depth: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        self._threads.append(threading.Thread(target=self._capture_loop, daemon=True))
+        for i, stage in enumerate(self.stages):
+            nxt = self.stages[i + 1] if i + 1 < len(self.stages) else None
+            target = self._ordered_loop if stage.ordered else self._worker_loop
+            for _ in range(stage.workers):
+                self._threads.append(threading.Thread(
+                    target=target, args=(i, stage, nxt), daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def stop(self, join_timeout: float = 1.0) -> None:
+        self._stop.set()
+        for t in self._threads:
+            if t.is_alive() and t is not threading.current_thread():
+                t.join(timeout=join_timeout)
+        self._threads = []
+
+    @property
+    def running(self) -> bool:
+        return not self._stop.is_set()
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Items waiting in front of each stage (including reorder buffers)."""
+        return {s.name: s.queue.qsize() + self._reorder_depth.get(s.name, 0)
+                for s in self.stages}
+
+    def _capture_loop(self) -> None:
+        first = self.stages[0].queue
+        while not self._stop.is_set():
+            dst = self.pool.acquire()
+            frame = self.source(dst)
+            if frame is None:
+                self.failed = True
+                self._stop.set()
+                break
+            if frame is not dst:
+                self.pool.release(dst)
+            self.captured += 1
+            pkt = FramePacket(seq=0, timestamp=time.monotonic(), frame=frame)
+            while True:
+                try:
+                    first.put_nowait(pkt)
+                    break
+                except queue.Full:
+                    try:
+                        old = first.get_nowait()
+                    except queue.Empty:
+                        continue
+                    self.dropped += 1
+                    self.pool.release(old.frame)
+
+    def _take(self, index: int, stage: Stage) -> Optional[FramePacket]:
+        if index != 0:
+            try:
+                return stage.queue.get(timeout=0.1)
+            except queue.Empty:
+                return None
+        # Number packets as they leave the lossy capture queue
+        with self._seq_lock:
+            try:
+                pkt = stage.queue.get(timeout=0.1)
+            except queue.Empty:
+                return None
+            self._seq += 1
+            pkt.seq = self._seq
+            return pkt
+
+    def _run_stage(self, stage: Stage, pkt: FramePacket,
+                   nxt: Optional[Stage]) -> None:
+        if pkt.error is None:
+            try:
+                stage.fn(pkt)
+            except Exception as e:
+                pkt.error = e
+        if nxt is None:
+            self.processed += 1
+            if self.on_done is not None:
+                try:
+                    self.on_done(pkt)
+                except Exception:
+                    pass
+            self.pool.release(pkt.frame)
+            return
+        while not self._stop.is_set():
+            try:
+                nxt.queue.put(pkt, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _worker_loop(self, index: int, stage: Stage, nxt: Optional[Stage]) -> None:
+        while not self._stop.is_set():
+            pkt = self._take(index, stage)
+            if pkt is not None:
+                self._run_stage(stage, pkt, nxt)
+
+    def _ordered_loop(self, index: int, stage: Stage, nxt: Optional[Stage]) -> None:
+        pending: List[Tuple[int, FramePacket]] = []
+        expected = 1
+        while not self._stop.is_set():
+            pkt = self._take(index, stage)
+            if pkt is not None:
+                heapq.heappush(pending, (pkt.seq, pkt))
+            while pending and pending[0][0] <= expected:
+                _, ready = heapq.heappop(pending)
+                expected = ready.seq + 1
+                self._run_stage(stage, ready, nxt)
+            self._reorder_depth[stage.name] = len(pending)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Local stand-in for a ControlLogix reached through pylogix. One
+# PLCSimulator holds the controller's tag table and fault settings; each
+# `connection()` is a pylogix-like PLC object bound to it, so a writer that
+# drops and recreates its connection keeps talking to the same "controller".
+
+OFFLINE_STATUS = "[Errno 113] No route to host"
+TAG_ERROR_STATUS = "Path segment error"
+
+
+@dataclass
+class SimResponse:
+    """Same fields as pylogix's Response."""
+    TagName: Any
+    Value: Any
+    Status: str
+
+
+class PLCSimulator:
+    """In-process controller with injectable latency, errors and outages.
+
+    - `latency_s` (+ uniform `jitter_s`) is slept once per request, like
+      one network round trip, before the values are applied.
+    - `error_rate` is the chance each tag in a request is rejected.
+    - `outage(seconds)` (or `online = False`) makes every request fail with
+      a socket-style status after `offline_latency_s`, as pylogix does.
+
+    Applied writes are logged as (monotonic time, tag, value) in `log`.
+    Tags written or listed in `tags` can be read back; others fail.
+    """
+
+    def __init__(self, latency_s: float = 0.002, jitter_s: float = 0.0,
+                 error_rate: float = 0.0, offline_latency_s: float = 0.05,
+                 tags: Optional[Dict[str, Any]] = None, seed: int = 0):
+        self.latency_s = float(latency_s)
+        self.jitter_s = float(jitter_s)
+        self.error_rate = float(error_rate)
+        self.offline_latency_s = float(offline_latency_s)
+        self.tags: Dict[str, Any] = dict(tags or {})
+        self.log: List[Tuple[float, str, Any]] = []
+        self.requests = 0
+        self.connections = 0
+        self._offline_until = 0.0
+        self._forced_offline = False
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def online(self) -> bool:
+        return not self._forced_offline and time.monotonic() >= self._offline_until
+
+    @online.setter
+    def online(self, value: bool) -> None:
+        self._forced_offline = not value
+        if value:
+            self._offline_until = 0.0
+
+    def outage(self, seconds: float) -> None:
+        """Drop the link for `seconds` starting now."""
+        self._offline_until = time.monotonic() + float(seconds)
+
+    def connection(self) -> "SimulatedPLC":
+        with self._lock:
+            self.connections += 1
+        return SimulatedPLC(self)
+
+    def _round_trip(self) -> bool:
+        """Sleep one round trip; True if the link was up."""
+        if not self.online:
+            time.sleep(self.offline_latency_s)
+            return False
+        delay = self.latency_s
+        if self.jitter_s > 0:
+            delay += self._rng.uniform(0.0, self.jitter_s)
+        if delay > 0:
+            time.sleep(delay)
+        return self.online
+
+    def write(self, items: List[Tuple[str, Any]]) -> List[SimResponse]:
+        with self._lock:
+            self.requests += 1
+        if not self._round_trip():
+            return [SimResponse(tag, None, OFFLINE_STATUS) for tag, _ in items]
+        out = []
+        now = time.monotonic()
+        with self._lock:
+            for tag, value in items:
+                if self.error_rate > 0 and self._rng.random() < self.error_rate:
+                    out.append(SimResponse(tag, None, TAG_ERROR_STATUS))
+                    continue
+                self.tags[tag] = value
+                self.log.append((now, tag, value))
+                out.append(SimResponse(tag, value, "Success"))
+        return out
+
+    def read(self, tags: List[str]) -> List[SimResponse]:
+        with self._lock:
+            self.requests += 1
+        if not self._round_trip():
+            return [SimResponse(tag, None, OFFLINE_STATUS) for tag in tags]
+        with self._lock:
+            return [SimResponse(tag, self.tags[tag], "Success") if tag in self.tags
+                    else SimResponse(tag, None, TAG_ERROR_STATUS) for tag in tags]
+
+
+class SimulatedPLC:
+    """The part of pylogix.PLC the app uses: Write, Read, Close, IPAddress, ProcessorSlot."""
+
+    def __init__(self, sim: PLCSimulator):
+        self.sim = sim
+        self.IPAddress = ""
+        self.ProcessorSlot = 0
+        self.closed = False
+
+    def Write(self, tag, value=None, datatype=None):
+        if isinstance(tag, (list, tuple)):
+            return self.sim.write([(t[0], t[1]) for t in tag])
+        if value is None:
+            raise TypeError('You must provide a value to write')
+        return self.sim.write([(tag, value)])[0]
+
+    def Read(self, tag, count=None, datatype=None):
+        if isinstance(tag, (list, tuple)):
+            return self.sim.read([t if isinstance(t, str) else t[0] for t in tag])
+        return self.sim.read([tag])[0]
+
+    def Close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.Close()
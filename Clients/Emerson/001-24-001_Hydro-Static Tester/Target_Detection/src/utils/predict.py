@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.circles import Box, merge_boxes
+from utils.tracking import AlphaBetaTrack, assign
+
+Circle = Tuple[int, int, int]
+
+
+class SearchWindows:
+    """Predictive search windows between full-frame detections.
+
+    Once `max_tracks` markers are being tracked, `plan` returns one small
+    window per marker around its alpha-beta predicted position (marker
+    radius plus `window_px` + current speed for each frame predicted
+    ahead, on each side). A full detection
+    (`plan` returns None) runs every `full_every` frames, whenever fewer
+    than `max_tracks` markers are tracked, and on the frame after any
+    track was not found inside its window.
+
+    `plan` and `update` may run on different threads (pipelined mode),
+    several frames apart and with `plan` out of frame order. Passing each
+    frame's sequence number to both predicts every track forward from its
+    last update to the planned frame (with a window widened to match)
+    and keeps the full-detection cadence in frame order. Without `seq`,
+    calls are numbered as they arrive.
+    """
+
+    def __init__(self, full_every: int = 10, window_px: int = 48,
+                 max_tracks: int = 2, alpha: float = 0.85, beta: float = 0.3):
+        self.full_every = max(1, int(full_every))
+        self.window_px = max(1, int(window_px))
+        self.max_tracks = int(max_tracks)
+        self.alpha = float(alpha)
+        self.beta = float(beta)
+        self._lock = threading.Lock()
+        self._tracks: List[AlphaBetaTrack] = []
+        self._size: Optional[Tuple[int, int]] = None
+        self._planned = 0       # last frame number handed out when no seq is given
+        self._updated_seq = 0   # frame of the newest update applied
+        self._full_seq = 0      # newest frame planned as a full detection
+        self._force_full = True
+        self.full_frames = 0
+        self.window_frames = 0
+        self.lost = 0
+
+    def configure(self, full_every: int, window_px: int) -> None:
+        with self._lock:
+            self.full_every = max(1, int(full_every))
+            self.window_px = max(1, int(window_px))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tracks = []
+            self._force_full = True
+
+    @property
+    def locked(self) -> bool:
+        return len(self._tracks) >= self.max_tracks
+
+    def _half(self, t: AlphaBetaTrack, steps: int = 1) -> int:
+        return int(t.r + (self.window_px + math.ceil(2.0 * t.speed)) * steps)
+
+    def plan(self, w: int, h: int, seq: Optional[int] = None) -> Optional[List[Box]]:
+        """Windows to search in a w x h frame, or None for a full detection.
+
+        `seq` is the frame's sequence number (see the class docstring).
+        """
+        with self._lock:
+            if seq is None:
+                self._planned += 1
+                seq = self._planned
+            if seq <= self._updated_seq:
+                # Numbering restarted (new pipeline): the tracks are stale
+                self._updated_seq = seq - 1
+                self._full_seq = 0
+                self._tracks = []
+                self._force_full = True
+            if self._size != (w, h):
+                # Resolution changed: old positions are meaningless
+                self._size = (w, h)
+                self._tracks = []
+                self._force_full = True
+            if (self._force_full or not self.locked
+                    or seq - self._full_seq >= self.full_every):
+                self._force_full = False
+                self._full_seq = max(self._full_seq, seq)
+                self.full_frames += 1
+                return None
+            steps = seq - self._updated_seq
+            boxes = []
+            for t in self._tracks:
+                px, py = t.predict(steps)
+                half = self._half(t, steps)
+                x0, y0 = max(0, int(px) - half), max(0, int(py) - half)
+                x1, y1 = min(w, int(px) + half), min(h, int(py) + half)
+                if x1 <= x0 or y1 <= y0:
+                    # Predicted off-frame: treat as lost
+                    self.full_frames += 1
+                    return None
+                boxes.append((x0, y0, x1, y1))
+            self.window_frames += 1
+            return merge_boxes(boxes)
+
+    def update(self, circles: Sequence[Circle], windowed: bool,
+               seq: Optional[int] = None) -> None:
+        """Fold one frame of detections (in frame coordinates) into the tracks.
+
+        Circles are matched to predictions by optimal assignment, gated to
+        each track's window. After a full detection unmatched circles start
+        new tracks and unmatched tracks end; after a windowed frame any
+        unmatched track ends and forces a full detection next frame.
+        Updates must arrive in frame order.
+        """
+        with self._lock:
+            if seq is None:
+                seq = max(self._planned, self._updated_seq + 1)
+            steps = max(1, seq - self._updated_seq)
+            self._updated_seq = seq
+            pairs = []
+            if self._tracks and circles:
+                pred = np.array([t.predict(steps) for t in self._tracks], dtype=np.float64)
+                half = np.array([self._half(t, steps) for t in self._tracks], dtype=np.float64)
+                det = np.asarray(circles, dtype=np.float64).reshape(-1, 3)[:, :2]
+                diff = pred[:, None, :] - det[None, :, :]
+                # Distance normalised by each track's window half-size
+                cost = np.einsum("ijk,ijk->ij", diff, diff) / (half[:, None] ** 2)
+                pairs = assign(cost, 2.0)
+            used_t, used_c = set(), set()
+            for ti, ci in pairs:
+                used_t.add(ti)
+                used_c.add(ci)
+                x, y, r = circles[ci]
+                self._tracks[ti].correct(x, y, r, self.alpha, self.beta, steps)
+            if len(used_t) < len(self._tracks):
+                if windowed:
+                    self.lost += len(self._tracks) - len(used_t)
+                    self._force_full = True
+                self._tracks = [t for ti, t in enumerate(self._tracks) if ti in used_t]
+            if not windowed:
+                for ci, (x, y, r) in enumerate(circles):
+                    if len(self._tracks) >= self.max_tracks:
+                        break
+                    if ci not in used_c:
+                        self._tracks.append(AlphaBetaTrack(float(x), float(y), int(r)))
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.full_frames + self.window_frames
+            return {
+                "full_frames": self.full_frames,
+                "window_frames": self.window_frames,
+                "window_rate": self.window_frames / total if total else 0.0,
+                "lost": self.lost,
+                "tracks": len(self._tracks),
+            }
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import cv2
+import numpy as np
+
+
+class PreviewRenderer:
+    """Draws and shows the preview on its own thread at up to `fps`.
+
+    The detection loop calls `submit` every frame; only when a preview frame
+    is due is the frame copied (or downscaled by `scale`) into a
+    preallocated buffer, so detection never waits on drawing or on
+    `imshow`/`waitKey`. Three buffers rotate between the submitting
+    thread, the pending slot and the thread drawing, so neither side ever
+    waits for the other and nothing is allocated per frame.
+
+    `render(display, payload, scale)` runs on the preview thread, draws on
+    `display` in place and returns True to request quit, which calls
+    `on_quit`. `close` runs on the preview thread when it stops (windows
+    must be destroyed by the thread that created them).
+    """
+
+    def __init__(self, render: Callable[[np.ndarray, Any, float], bool],
+                 fps: float = 15.0, scale: float = 1.0, metrics: Any = None,
+                 on_quit: Optional[Callable[[], None]] = None,
+                 close: Optional[Callable[[], None]] = None):
+        self.render = render
+        self.fps = float(fps)
+        self.scale = float(scale)
+        self.metrics = metrics  # anything with observe(stage, ms)
+        self.on_quit = on_quit
+        self.close = close
+        self._spare: Optional[np.ndarray] = None
+        self._ready: Optional[np.ndarray] = None
+        self._front: Optional[np.ndarray] = None
+        self._payload: Any = None
+        self._fresh = False
+        self._last_submit = 0.0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.submitted = 0
+        self.skipped = 0
+        self.rendered = 0
+
+    def start(self) -> None:
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="preview", daemon=True)
+        self._thread.start()
+
+    def stop(self, join_timeout: float = 1.0) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=join_timeout)
+            self._thread = None
+
+    def _target_size(self, frame: np.ndarray):
+        h, w = frame.shape[:2]
+        if self.scale >= 1.0:
+            return w, h
+        return max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale)))
+
+    def submit(self, frame: np.ndarray, payload: Any) -> bool:
+        """Offer one frame; returns True if it was taken for the preview."""
+        now = time.monotonic()
+        if self.fps > 0 and now - self._last_submit < 1.0 / self.fps:
+            self.skipped += 1
+            return False
+        self._last_submit = now
+        t0 = time.perf_counter()
+        tw, th = self._target_size(frame)
+        buf = self._spare
+        if buf is None or buf.shape[:2] != (th, tw) or buf.shape[2:] != frame.shape[2:]:
+            buf = np.empty((th, tw) + frame.shape[2:], dtype=frame.dtype)
+        if (tw, th) == (frame.shape[1], frame.shape[0]):
+            np.copyto(buf, frame)
+        else:
+            cv2.resize(frame, (tw, th), dst=buf, interpolation=cv2.INTER_AREA)
+        with self._cond:
+            # Publish; the previously pending buffer becomes the next spare
+            self._spare, self._ready = self._ready, buf
+            self._payload = payload
+            self._fresh = True
+            self._cond.notify()
+        self.submitted += 1
+        if self.metrics is not None:
+            self.metrics.observe("preview_copy", (time.perf_counter() - t0) * 1000.0)
+        return True
+
+    def _run(self) -> None:
+        try:
+            while True:
+                with self._cond:
+                    while not self._fresh and not self._stop:
+                        self._cond.wait(0.5)
+                    if self._stop:
+                        return
+                    # Take the pending buffer; the one just drawn becomes
+                    # free and is picked up as spare by the next submit
+                    self._front, self._ready = self._ready, self._front
+                    payload = self._payload
+                    self._fresh = False
+                try:
+                    quit_requested = self.render(self._front, payload, min(1.0, self.scale))
+                except Exception as e:
+                    print(f"Warning: Preview render failed: {e}")
+                    quit_requested = False
+                self.rendered += 1
+                if quit_requested and self.on_quit is not None:
+                    self.on_quit()
+        finally:
+            if self.close is not None:
+                try:
+                    self.close()
+                except Exception:
+                    pass
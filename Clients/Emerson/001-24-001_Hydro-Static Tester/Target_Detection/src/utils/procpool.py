@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import heapq
+import multiprocessing as mp
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Frames reach worker processes through shared memory: the parent writes a
+# frame into a ring slot and sends only (slot name, shape, payload) down the
+# task queue, so no frame is ever pickled.
+
+
+class SharedFrameRing:
+    """Fixed set of shared-memory frame slots, handed out by index.
+
+    A slot is owned by whoever acquired it until `release`; the parent
+    releases it once the worker's result has been used. `grow` replaces all
+    slots with larger ones (new names) once none are in use, e.g. after a
+    resolution change to a bigger frame.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int):
+        self.slots = max(1, int(slots))
+        self.slot_bytes = 0
+        self._shms: List[shared_memory.SharedMemory] = []
+        self._free: List[int] = []
+        self._cond = threading.Condition()
+        self._allocate(int(slot_bytes))
+
+    def _allocate(self, slot_bytes: int) -> None:
+        self.slot_bytes = max(1, slot_bytes)
+        self._shms = [shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                      for _ in range(self.slots)]
+        self._free = list(range(self.slots))
+
+    def _unlink_all(self) -> None:
+        for shm in self._shms:
+            try:
+                shm.close()
+                shm.unlink()
+            except Exception:
+                pass
+        self._shms = []
+
+    def name(self, idx: int) -> str:
+        return self._shms[idx].name
+
+    def in_use(self) -> int:
+        with self._cond:
+            return self.slots - len(self._free)
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[int]:
+        with self._cond:
+            if not self._free:
+                self._cond.wait(timeout)
+            return self._free.pop() if self._free else None
+
+    def try_acquire(self) -> Optional[int]:
+        with self._cond:
+            return self._free.pop() if self._free else None
+
+    def release(self, idx: int) -> None:
+        with self._cond:
+            self._free.append(idx)
+            self._cond.notify_all()
+
+    def view(self, idx: int, shape: Tuple[int, ...], dtype: Any = np.uint8) -> np.ndarray:
+        return np.ndarray(shape, dtype=dtype, buffer=self._shms[idx].buf)
+
+    def grow(self, slot_bytes: int, timeout: Optional[float] = None) -> bool:
+        """Reallocate every slot at `slot_bytes` once all are free; False on timeout."""
+        with self._cond:
+            if slot_bytes <= self.slot_bytes:
+                return True
+            if not self._cond.wait_for(lambda: len(self._free) == self.slots, timeout):
+                return False
+            self._unlink_all()
+            self._allocate(int(slot_bytes))
+            return True
+
+    def close(self) -> None:
+        with self._cond:
+            self._unlink_all()
+            self._free = []
+
+
+def _worker_main(fn: Callable[[np.ndarray, Any], Any], tasks, results, max_attached: int) -> None:
+    """Worker process loop: attach the task's slot, run fn, send the result back."""
+    attached: Dict[str, shared_memory.SharedMemory] = {}
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, name, shape, dtype, payload = task
+            try:
+                shm = attached.get(name)
+                if shm is None:
+                    if len(attached) >= max_attached:
+                        # Slots were reallocated; drop the old mappings
+                        for old in attached.values():
+                            old.close()
+                        attached.clear()
+                    shm = attached[name] = shared_memory.SharedMemory(name=name)
+                frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                try:
+                    result = fn(frame, payload)
+                finally:
+                    del frame
+                results.put((seq, result, None))
+            except Exception as e:
+                results.put((seq, None, repr(e)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for shm in attached.values():
+            try:
+                shm.close()
+            except Exception:
+                pass
+
+
+class ProcessWorkers:
+    """Runs fn(frame, payload) in worker processes on frames held in a SharedFrameRing.
+
+    `submit` numbers each task and keeps its `meta`; `results` yields
+    (seq, result, error, meta) strictly in submit order, holding back
+    results that arrive early. The meta is stored before the task is
+    queued, so it is there however fast a worker answers.
+    `fn` must be importable by the workers (a module-level function).
+    Workers use the "spawn" start method on every platform, so the parent's
+    threads and camera handles are never forked.
+    """
+
+    def __init__(self, fn: Callable[[np.ndarray, Any], Any], workers: int,
+                 ring: SharedFrameRing):
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.ring = ring
+        ctx = mp.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._procs = [ctx.Process(target=_worker_main, name=f"detect-worker-{i}",
+                                   args=(fn, self._tasks, self._results, ring.slots * 2),
+                                   daemon=True)
+                       for i in range(self.workers)]
+        self._seq = 0
+        self._expected = 1
+        self._early: List[Tuple[int, Any, Optional[str]]] = []
+        self._meta: Dict[int, Any] = {}
+
+    def start(self) -> None:
+        for p in self._procs:
+            p.start()
+
+    @property
+    def alive(self) -> bool:
+        return all(p.is_alive() for p in self._procs)
+
+    @property
+    def pending(self) -> int:
+        """Submitted tasks whose results have not been yielded yet."""
+        return self._seq - self._expected + 1
+
+    def submit(self, idx: int, shape: Tuple[int, ...], payload: Any,
+               dtype: Any = np.uint8, meta: Any = None) -> int:
+        seq = self._seq + 1
+        self._meta[seq] = meta
+        self._seq = seq
+        self._tasks.put((seq, self.ring.name(idx), tuple(shape),
+                         np.dtype(dtype).str, payload))
+        return seq
+
+    def results(self, timeout: float = 0.1) -> Iterator[Tuple[int, Any, Optional[str], Any]]:
+        """In-order results available now (waits up to `timeout` for the first)."""
+        block = True
+        while True:
+            try:
+                item = self._results.get(block, timeout)
+            except queue.Empty:
+                break
+            block = False
+            heapq.heappush(self._early, item)
+            while self._early and self._early[0][0] == self._expected:
+                self._expected += 1
+                seq, result, error = heapq.heappop(self._early)
+                yield seq, result, error, self._meta.pop(seq, None)
+
+    def stop(self, join_timeout: float = 2.0) -> None:
+        for _ in self._procs:
+            try:
+                self._tasks.put(None)
+            except Exception:
+                pass
+        for p in self._procs:
+            p.join(timeout=join_timeout)
+            if p.is_alive():
+                p.terminate()
+        for q in (self._tasks, self._results):
+            try:
+                q.cancel_join_thread()
+                q.close()
+            except Exception:
+                pass
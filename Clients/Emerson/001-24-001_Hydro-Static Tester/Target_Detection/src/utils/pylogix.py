@@ -1,10 +1,10 @@
 from __future__ import annotations
 
+import random
 import threading
-import queue
 import time
-from dataclasses import dataclass
-from typing import Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
 
 try:
     from pylogix import PLC
@@ -15,60 +15,170 @@ else:
     _import_error = None
 
 
+# CIP data type codes. Passing the type with each write saves pylogix a
+# read of the tag to discover it before the first write.
+CIP_TYPES: Dict[str, int] = {
+    "BOOL": 0xC1,
+    "SINT": 0xC2,
+    "INT": 0xC3,
+    "DINT": 0xC4,
+    "REAL": 0xCA,
+}
+
+
+@dataclass
+class PLCTag:
+    key: str            # output name the app publishes, e.g. "target1_hit"
+    tag: str            # controller tag name, e.g. "Target1_Hit"
+    datatype: str = "BOOL"
+
+    def coerce(self, value: Any) -> Any:
+        if self.datatype == "BOOL":
+            return bool(value)
+        if self.datatype == "REAL":
+            return float(value)
+        return int(value)
+
+
 @dataclass
 class PLCConfig:
     ip: str = "192.168.1.6"
     slot: int = 0
     target1_tag: str = "Target1_Hit"
     target2_tag: str = "Target2_Hit"
-    reconnect_interval_s: float = 2.0
-    write_retry_interval_s: float = 0.25
+    reconnect_interval_s: float = 2.0     # longest wait between reconnect attempts
+    write_retry_interval_s: float = 0.25  # retry delay for tags the PLC rejected
+    # Tags written by the writer; empty = the two target BOOLs above
+    tags: List[PLCTag] = field(default_factory=list)
+    # Watchdog channel: a DINT counter bumped every heartbeat_interval_s and
+    # the processing frame rate (REAL) written with it ("" = not written);
+    # readback_keys are read back every readback_interval_s (0 = never) and
+    # rewritten if the PLC holds something else
+    heartbeat_tag: str = ""
+    frame_rate_tag: str = ""
+    heartbeat_interval_s: float = 1.0
+    readback_interval_s: float = 2.0
+    readback_keys: Tuple[str, ...] = ("target1_hit", "target2_hit")
+
+    def __post_init__(self):
+        if not self.tags:
+            self.tags = [PLCTag("target1_hit", self.target1_tag, "BOOL"),
+                         PLCTag("target2_hit", self.target2_tag, "BOOL")]
+        for t in self.tags:
+            if t.datatype not in CIP_TYPES:
+                raise ValueError(f"Unsupported PLC data type {t.datatype!r} for {t.tag}")
 
 
 class PLCWriter:
-    def __init__(self, config: PLCConfig):
-        if PLC is None:
+    """Writes output values to the PLC from a background thread.
+
+    Callers publish {key: value} with `update`. A value that differs from
+    the last one published wakes the writer thread at once (condition
+    variable, no polling), which sends every tag whose value differs from
+    what the PLC last confirmed, all in one multi-tag Write request. Each
+    tag is confirmed on its own; failed tags are retried after
+    `write_retry_interval_s`. When the link drops, reconnects back off
+    exponentially with jitter, up to `reconnect_interval_s`, and the first
+    batch after a reconnect rewrites every tag with no extra delay.
+
+    `metrics` (anything with observe(stage, ms)) receives the Write round
+    trip as "plc_write" and, per tag, the time from the value changing in
+    `update` to the PLC confirming it as "plc_change".
+
+    The same thread runs the watchdog channel on the same connection: the
+    heartbeat and frame-rate tags ride in the next Write request when due,
+    and the read-back is one batched Read. A cycle therefore costs at most
+    one Read and one Write, and a change arriving meanwhile waits for at
+    most that one Read. `rate_fn` returns the frame rate to report.
+
+    `comm_factory` replaces pylogix's PLC class (e.g. with
+    utils.plcsim.PLCSimulator.connection for testing without a controller).
+    """
+
+    def __init__(self, config: PLCConfig, metrics: Any = None,
+                 comm_factory: Optional[Callable[[], Any]] = None,
+                 rate_fn: Optional[Callable[[], float]] = None):
+        if comm_factory is None and PLC is None:
             raise ImportError(
                 f"pylogix library is not available: {_import_error}"
             )
         self.config = config
-        self._comm: Optional[PLC] = None
+        self.metrics = metrics
+        self._comm_factory = comm_factory or PLC
+        self._tags = {t.key: t for t in config.tags}
+        self.rate_fn = rate_fn
+        self._watch_tags = [t for t in (PLCTag("heartbeat", config.heartbeat_tag, "DINT"),
+                                        PLCTag("frame_rate", config.frame_rate_tag, "REAL"))
+                            if t.tag]
+        self._readback = [self._tags[k] for k in config.readback_keys if k in self._tags]
+        self._heartbeat = 0
+        self._next_heartbeat = 0.0
+        self._next_readback = 0.0
+        self._comm: Any = None
         self._thread: Optional[threading.Thread] = None
-        self._stop = threading.Event()
-        self._q: "queue.Queue[Tuple[bool, bool]]" = queue.Queue(maxsize=1)
-        self._last_written: Optional[Tuple[bool, bool]] = None
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._pending: Dict[str, Any] = {}       # latest published values
+        self._changed_at: Dict[str, float] = {}  # key -> monotonic time of unsent change
+        self._dirty = False                      # pending may differ from the PLC
+        self._not_before = 0.0                   # earliest next attempt (retry/backoff)
+        self._last_written: Dict[str, Any] = {}
+        self._reconnect_failures = 0
+        self.writes = 0
+        self.write_failures = 0
+        self.tags_written = 0
+        self.reconnects = 0
+        self.last_write_ms = 0.0
+        self.last_change_ms = 0.0
+        self.heartbeats = 0
+        self.readbacks = 0
+        self.reasserted = 0
 
     def start(self) -> None:
         if self._thread and self._thread.is_alive():
             return
-        self._stop.clear()
-        self._thread = threading.Thread(target=self._run, daemon=True)
+        with self._cond:
+            self._stopping = False
+            now = time.monotonic()
+            self._next_heartbeat = now
+            self._next_readback = now + self.config.readback_interval_s
+        self._thread = threading.Thread(target=self._run, name="plc-writer", daemon=True)
         self._thread.start()
 
     def stop(self, join_timeout: float = 1.0) -> None:
-        self._stop.set()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=join_timeout)
         self._disconnect()
 
     def update_targets(self, target1_hit: bool, target2_hit: bool) -> None:
-        state = (bool(target1_hit), bool(target2_hit))
-        try:
-            self._q.put_nowait(state)
-        except queue.Full:
-            try:
-                _ = self._q.get_nowait()
-            except Exception:
-                pass
-            try:
-                self._q.put_nowait(state)
-            except Exception:
-                pass
+        self.update({"target1_hit": target1_hit, "target2_hit": target2_hit})
+
+    def update(self, values: Mapping[str, Any]) -> None:
+        """Publish new output values; keys without a configured tag are ignored."""
+        now = time.monotonic()
+        with self._cond:
+            changed = False
+            for key, value in values.items():
+                tag = self._tags.get(key)
+                if tag is None:
+                    continue
+                value = tag.coerce(value)
+                if key in self._pending and self._pending[key] == value:
+                    continue
+                self._pending[key] = value
+                self._changed_at.setdefault(key, now)
+                changed = True
+            if changed:
+                self._dirty = True
+                self._cond.notify()
 
     def _connect(self) -> bool:
         try:
             if self._comm is None:
-                self._comm = PLC()
+                self._comm = self._comm_factory()
             self._comm.IPAddress = self.config.ip
             self._comm.ProcessorSlot = self.config.slot
             return True
@@ -85,83 +195,191 @@ class PLCWriter:
                     pass
         finally:
             self._comm = None
+            # The controller may have restarted; confirm every tag again
+            self._last_written = {}
 
-    def _ensure_connected(self) -> bool:
-        if self._comm is None:
-            return self._connect()
-        return True
+    def _backoff_s(self) -> float:
+        """Delay before reconnect attempt n: doubling from 0.1 s, capped, 50-100% jitter."""
+        base = min(self.config.reconnect_interval_s,
+                   0.1 * (2.0 ** max(0, self._reconnect_failures - 1)))
+        return base * random.uniform(0.5, 1.0)
 
-    def _write_tag(self, tag: str, value: bool) -> bool:
+    def _write_batch(self, changed: Sequence[Tuple[PLCTag, Any]]) -> List[bool]:
+        """One Write request for all `changed` tags; per-tag success flags."""
         try:
-            if not self._ensure_connected():
-                return False
-            res = self._comm.Write(tag, bool(value))
-            if isinstance(res, list):
-                ok = all(getattr(r, "Status", "") == "Success" for r in res)
-            else:
-                ok = getattr(res, "Status", "") == "Success"
-            if not ok:
-                return False
-            return True
+            if self._comm is None and not self._connect():
+                return [False] * len(changed)
+            request = [(t.tag, v, CIP_TYPES[t.datatype]) for t, v in changed]
+            t0 = time.perf_counter()
+            res = self._comm.Write(request)
+            self.last_write_ms = (time.perf_counter() - t0) * 1000.0
+            if self.metrics is not None:
+                self.metrics.observe("plc_write", self.last_write_ms)
+            self.writes += 1
+            if not isinstance(res, list):
+                res = [res] * len(changed)
+            return [getattr(r, "Status", "") == "Success" for r in res]
         except Exception:
             self._disconnect()
-            return False
+            return [False] * len(changed)
 
-    def _write_states(self, desired: Tuple[bool, bool]) -> None:
-        # Only write on change to avoid spamming
-        if self._last_written is None or self._last_written[0] != desired[0]:
-            if not self._write_tag(self.config.target1_tag, desired[0]):
-                # Failed write; retry later
-                return
-        if self._last_written is None or self._last_written[1] != desired[1]:
-            if not self._write_tag(self.config.target2_tag, desired[1]):
-                # Failed write; retry later
-                return
-        self._last_written = desired
-
-    def _run(self) -> None:
-        # Attempt initial connect
-        next_reconnect = 0.0
-        while not self._stop.is_set():
+    def _read_back(self) -> None:
+        """One Read of the read-back tags; any that differ from what was
+        written are forgotten, so the following write re-asserts them."""
+        tags = [t for t in self._readback if t.key in self._last_written]
+        if not tags or self._comm is None:
+            return
+        try:
+            t0 = time.perf_counter()
+            res = self._comm.Read([t.tag for t in tags])
+            if self.metrics is not None:
+                self.metrics.observe("plc_read", (time.perf_counter() - t0) * 1000.0)
+        except Exception:
+            self._disconnect()
+            return
+        self.readbacks += 1
+        if not isinstance(res, list):
+            res = [res]
+        for t, r in zip(tags, res):
+            if getattr(r, "Status", "") != "Success":
+                continue
             try:
+                value = t.coerce(r.Value)
+            except Exception:
+                continue
+            if t.key in self._last_written and self._last_written[t.key] != value:
+                del self._last_written[t.key]
+                self.reasserted += 1
+
+    def _watch_values(self) -> List[Tuple[PLCTag, Any]]:
+        self._heartbeat = (self._heartbeat + 1) % 2147483647
+        out = []
+        for t in self._watch_tags:
+            if t.key == "heartbeat":
+                out.append((t, self._heartbeat))
+            else:
                 try:
-                    desired = self._q.get(timeout=0.1)
-                except queue.Empty:
-                    continue
+                    rate = float(self.rate_fn()) if self.rate_fn is not None else 0.0
+                except Exception:
+                    rate = 0.0
+                out.append((t, rate))
+        return out
 
-                # Coalesce multiple queued updates; keep only the latest
-                while True:
-                    try:
-                        desired = self._q.get_nowait()
-                    except queue.Empty:
-                        break
+    def _write_states(self, desired: Mapping[str, Any],
+                      changed_at: Mapping[str, float],
+                      extra: Sequence[Tuple[PLCTag, Any]] = ()) -> Optional[bool]:
+        """Write tags that differ from the PLC, plus `extra` (not tracked);
+        None if nothing to do, else True when every tag was confirmed."""
+        changed = []
+        for key, value in desired.items():
+            if key not in self._last_written or self._last_written[key] != value:
+                changed.append((self._tags[key], value))
+        changed.extend(extra)
+        if not changed:
+            return None
+        results = self._write_batch(changed)
+        now = time.monotonic()
+        for (t, value), ok in zip(changed, results):
+            if not ok:
+                self.write_failures += 1
+                continue
+            if t.key not in self._tags:
+                if t.key == "heartbeat":
+                    self.heartbeats += 1
+                continue
+            self._last_written[t.key] = value
+            self.tags_written += 1
+            if t.key in changed_at:
+                self.last_change_ms = (now - changed_at[t.key]) * 1000.0
+                if self.metrics is not None:
+                    self.metrics.observe("plc_change", self.last_change_ms)
+        if not any(results) and self._comm is not None:
+            # Nothing got through (pylogix reports socket errors as a
+            # status); drop the connection and back off
+            self._disconnect()
+        return all(results)
 
-                # If not connected, throttle reconnection attempts
-                now = time.monotonic()
-                if self._comm is None and now < next_reconnect:
-                    time.sleep(min(0.05, next_reconnect - now))
-                    continue
+    def _next_watch(self) -> Optional[float]:
+        """Monotonic time the next heartbeat or read-back is due (None = off)."""
+        due = []
+        if self._watch_tags and self.config.heartbeat_interval_s > 0:
+            due.append(self._next_heartbeat)
+        if self._readback and self.config.readback_interval_s > 0:
+            due.append(self._next_readback)
+        return min(due) if due else None
 
-                if self._comm is None:
-                    if not self._connect():
-                        next_reconnect = time.monotonic() + self.config.reconnect_interval_s
-                        continue
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    now = time.monotonic()
+                    watch = self._next_watch()
+                    if now >= self._not_before and (
+                            self._dirty or (watch is not None and now >= watch)):
+                        break
+                    wake = self._not_before if self._dirty else None
+                    if watch is not None:
+                        watch = max(watch, self._not_before)
+                        wake = watch if wake is None else min(wake, watch)
+                    self._cond.wait(None if wake is None else wake - now)
+                if self._stopping:
+                    return
+                now = time.monotonic()
+                heartbeat = bool(self._watch_tags) and self.config.heartbeat_interval_s > 0 \
+                    and now >= self._next_heartbeat
+                read_back = bool(self._readback) and self.config.readback_interval_s > 0 \
+                    and now >= self._next_readback
+                if heartbeat:
+                    self._next_heartbeat = now + self.config.heartbeat_interval_s
+                if read_back:
+                    self._next_readback = now + self.config.readback_interval_s
+                self._dirty = False
+                desired = dict(self._pending)
+                changed_at = dict(self._changed_at)
 
-                self._write_states(desired)
+            try:
+                reconnecting = self._comm is None
+                if read_back:
+                    self._read_back()
+                extra = self._watch_values() if heartbeat else ()
+                ok = self._write_states(desired, changed_at, extra)
             except Exception:
-                time.sleep(self.config.write_retry_interval_s)
+                ok = False
+
+            with self._cond:
+                # Clear change stamps for values now confirmed (unless the
+                # value moved on again meanwhile)
+                for key in changed_at:
+                    if (key in self._last_written and self._pending.get(key) == self._last_written[key]
+                            and self._changed_at.get(key) == changed_at[key]):
+                        del self._changed_at[key]
+                if ok is False:
+                    self._dirty = True
+                    if self._comm is None:
+                        self._reconnect_failures += 1
+                        self._not_before = time.monotonic() + self._backoff_s()
+                    else:
+                        self._not_before = time.monotonic() + self.config.write_retry_interval_s
+                else:
+                    if reconnecting and self._reconnect_failures:
+                        self.reconnects += 1
+                    self._reconnect_failures = 0
+                    self._not_before = 0.0
 
 
 # Convenience singleton for simple usage from main
 _default_writer: Optional[PLCWriter] = None
 
 
-def init_default(config: Optional[PLCConfig] = None) -> PLCWriter:
+def init_default(config: Optional[PLCConfig] = None, metrics: Any = None,
+                 comm_factory: Optional[Callable[[], Any]] = None,
+                 rate_fn: Optional[Callable[[], float]] = None) -> PLCWriter:
     global _default_writer
     if config is None:
         config = PLCConfig()
     if _default_writer is None:
-        _default_writer = PLCWriter(config)
+        _default_writer = PLCWriter(config, metrics=metrics, comm_factory=comm_factory,
+                                    rate_fn=rate_fn)
         _default_writer.start()
     return _default_writer
 
@@ -173,6 +391,16 @@ def update_default(target1_hit: bool, target2_hit: bool) -> None:
         target1_hit, target2_hit)  # type: ignore[union-attr]
 
 
+def publish_default(values: Mapping[str, Any]) -> None:
+    if _default_writer is None:
+        init_default()
+    _default_writer.update(values)  # type: ignore[union-attr]
+
+
+def default_writer() -> Optional[PLCWriter]:
+    return _default_writer
+
+
 def shutdown_default() -> None:
     global _default_writer
     if _default_writer is not None:
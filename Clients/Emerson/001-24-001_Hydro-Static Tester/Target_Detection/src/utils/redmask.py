@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import threading
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+HSVRange = Tuple[Tuple[int, int, int], Tuple[int, int, int]]
+
+
+def _freeze(ranges: Sequence) -> Tuple[HSVRange, ...]:
+    return tuple((tuple(int(v) for v in lo), tuple(int(v) for v in hi))
+                 for lo, hi in ranges)
+
+
+class RedMaskLUT:
+    """BGR -> red/not-red classification table built from HSV thresholds.
+
+    The table has one byte per 24-bit BGR colour (16 MB), so lookups are
+    exact: a pixel is red in the table iff cv2.inRange on its HSV value would
+    say so. Frames are classified with one BGR->BGRA conversion (the packed
+    pixel doubles as the table index) and a single np.take. The table is built
+    lazily and rebuilt only when the thresholds change.
+    """
+
+    def __init__(self, ranges: Optional[Sequence] = None):
+        self._ranges: Optional[Tuple[HSVRange, ...]] = None
+        self._table: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._scratch = threading.local()
+        if ranges is not None:
+            self.ensure(ranges)
+
+    @property
+    def ranges(self) -> Optional[Tuple[HSVRange, ...]]:
+        return self._ranges
+
+    def ensure(self, ranges: Sequence) -> np.ndarray:
+        """Return the table for `ranges`, rebuilding it if they changed."""
+        frozen = _freeze(ranges)
+        table = self._table
+        if table is not None and frozen == self._ranges:
+            return table
+        with self._lock:
+            if self._table is None or frozen != self._ranges:
+                self._table = self._build(frozen)
+                self._ranges = frozen
+            return self._table
+
+    @staticmethod
+    def _build(ranges: Tuple[HSVRange, ...]) -> np.ndarray:
+        # Every 24-bit colour as a 4096x4096 BGR image; the little-endian
+        # byte order of the index (B | G << 8 | R << 16) matches BGRA packing.
+        colours = np.arange(1 << 24, dtype=np.uint32).view(np.uint8)
+        bgr = np.ascontiguousarray(colours.reshape(4096, 4096, 4)[..., :3])
+        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+        table = np.zeros((4096, 4096), dtype=np.uint8)
+        for lo, hi in ranges:
+            cv2.bitwise_or(table, cv2.inRange(hsv, lo, hi), dst=table)
+        return table.reshape(-1)
+
+    def classify(self, frame: np.ndarray, ranges: Sequence,
+                 dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """Raw 0/255 red mask of a BGR frame (no smoothing)."""
+        table = self.ensure(ranges)
+        h, w = frame.shape[:2]
+        bgra = getattr(self._scratch, "bgra", None)
+        if bgra is None or bgra.shape[:2] != (h, w):
+            bgra = np.empty((h, w, 4), dtype=np.uint8)
+            self._scratch.bgra = bgra
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=bgra)
+        # np.take converts a uint32 index to intp in a temporary the size of
+        # the frame; mask into a reused intp array instead (drops alpha)
+        index = getattr(self._scratch, "index", None)
+        if index is None or index.shape != (h, w):
+            index = np.empty((h, w), dtype=np.intp)
+            self._scratch.index = index
+        np.bitwise_and(bgra.view(np.uint32)[..., 0], 0xFFFFFF, out=index)
+        if dst is None or dst.shape != (h, w):
+            dst = np.empty((h, w), dtype=np.uint8)
+        np.take(table, index, out=dst, mode="clip")
+        return dst
+
+
+def redness_gates(ranges: Sequence) -> Tuple[float, float, float, int]:
+    """(orange ratio, magenta ratio, saturation fraction, minimum value) for RednessMask.
+
+    Hue tolerances come from the ranges touching 0 (orange side) and 180
+    (magenta side); the saturation and value gates from the lowest lower
+    bounds. Upper S/V bounds and ranges away from red are not represented.
+    """
+    ranges = _freeze(ranges)
+    orange = max([hi[0] for lo, hi in ranges if lo[0] <= 0] or [0])
+    magenta = max([180 - lo[0] for lo, hi in ranges if hi[0] >= 179] or [0])
+    s_min = min([lo[1] for lo, hi in ranges] or [0])
+    v_min = min([lo[2] for lo, hi in ranges] or [0])
+    return (min(1.0, max(0.0, 1.0 - orange / 30.0)),
+            min(1.0, max(0.0, 1.0 - magenta / 30.0)),
+            s_min / 255.0, int(v_min))
+
+
+class RednessMask:
+    """Red/not-red from a few saturating ops on the B, G and R planes.
+
+    No HSV image is built. With R the largest channel, OpenCV's hue is
+    30 * (G - B) / (R - min) on the orange side of red and 180 minus
+    30 * (B - G) / (R - min) on the magenta side, so the hue gates become
+    linear tests on R - G and R - B:
+
+        (R - G) - ko * (R - B) >= 0   and   (R - B) - km * (R - G) >= 0
+
+    Each holds by itself on the other side of red, and together they imply
+    that R is the largest channel; with ko = km = 0 they reduce to
+    R - max(G, B) >= 0. Saturation and value are R - min(G, B) >= s * R
+    and R >= v. The ratios and gates come from the HSV ranges
+    (redness_gates); over all 16M colours the answer differs from the HSV
+    test for about 0.5%, all of them just inside a threshold.
+    Every step reads and writes single-channel uint8 planes, reused per
+    thread.
+    """
+
+    def __init__(self):
+        self._ranges: Optional[Tuple[HSVRange, ...]] = None
+        self._gates = redness_gates(())
+        self._scratch = threading.local()
+
+    def gates(self, ranges: Sequence) -> Tuple[float, float, float, int]:
+        frozen = _freeze(ranges)
+        if frozen != self._ranges:
+            self._gates = redness_gates(frozen)
+            self._ranges = frozen
+        return self._gates
+
+    def _planes(self, h: int, w: int) -> list:
+        planes = getattr(self._scratch, "planes", None)
+        if planes is None or planes[0].shape != (h, w):
+            planes = [np.empty((h, w), dtype=np.uint8) for _ in range(6)]
+            self._scratch.planes = planes
+        return planes
+
+    def classify(self, frame: np.ndarray, ranges: Sequence,
+                 dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """Raw 0/255 red mask of a BGR frame (no smoothing)."""
+        ko, km, s, v = self.gates(ranges)
+        h, w = frame.shape[:2]
+        b, g, r, rg, rb, gate = self._planes(h, w)
+        if dst is None or dst.shape != (h, w):
+            dst = np.empty((h, w), dtype=np.uint8)
+        cv2.split(frame, [b, g, r])
+        cv2.subtract(r, g, dst=rg)     # saturates at 0 where G > R
+        cv2.subtract(r, b, dst=rb)
+        # +0.5 so a test that holds with equality survives uint8 rounding
+        cv2.addWeighted(rg, 1.0, rb, -ko, 0.5, dst=dst)
+        cv2.addWeighted(rb, 1.0, rg, -km, 0.5, dst=gate)
+        cv2.min(dst, gate, dst=dst)
+        cv2.max(rg, rb, dst=gate)      # R - min(G, B)
+        cv2.addWeighted(gate, 1.0, r, -s, 0.5, dst=gate)
+        cv2.min(dst, gate, dst=dst)
+        cv2.threshold(r, v - 1, 255, cv2.THRESH_TOZERO, dst=gate)
+        cv2.min(dst, gate, dst=dst)
+        cv2.threshold(dst, 0, 255, cv2.THRESH_BINARY, dst=dst)
+        return dst
@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import os
+import platform
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from utils.synthetic import make_frame, random_discs
+
+# Frame sources share the small part of the cv2.VideoCapture interface the
+# app uses (read(dst), set, get, isOpened, release), so any of them can be
+# handed to CaptureThread or read directly by the replay CLI.
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def open_camera(index: int):
+    """Live camera with the platform's preferred backend."""
+    if platform.system() == "Windows":
+        return cv2.VideoCapture(index, cv2.CAP_DSHOW)
+    return cv2.VideoCapture(index, cv2.CAP_V4L2)
+
+
+# Pixel formats tried for fourcc "auto", best first: MJPG reaches full frame
+# rate at high resolutions over USB 2, where YUYV often drops to 5 fps
+AUTO_FOURCCS = ("MJPG", "YUYV")
+CONTROL_MODES = ("auto", "lock")
+
+
+@dataclass
+class CaptureFormat:
+    """What to ask a camera for; 0 / "auto" leaves a control to the driver.
+
+    `exposure` and `white_balance` are "auto" (not touched), "lock"
+    (switch the automatic control off at the value it has settled on) or
+    a number (manual exposure value / white balance in kelvin).
+    """
+    width: int
+    height: int
+    fourcc: str = "auto"
+    fps: float = 30.0
+    buffer_size: int = 1
+    exposure: Union[str, float] = "auto"
+    white_balance: Union[str, float] = "auto"
+
+
+def fourcc_text(code: float) -> str:
+    code = int(code)
+    if code <= 0:
+        return "?"
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00") or "?"
+
+
+def _manual_exposure_value(cap) -> float:
+    """CAP_PROP_AUTO_EXPOSURE value meaning "manual" on the camera's backend."""
+    try:
+        backend = cap.getBackendName()
+    except Exception:
+        backend = ""
+    return 0.25 if backend == "DSHOW" else 1.0  # V4L2 uses the menu index
+
+
+def _set_size_and_rate(cap, fmt: CaptureFormat, fourcc: Optional[str]) -> None:
+    # V4L2 applies the pixel format with the size, so set it first
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, fmt.width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, fmt.height)
+    if fmt.fps > 0:
+        cap.set(cv2.CAP_PROP_FPS, fmt.fps)
+
+
+def _granted(cap) -> Dict[str, Any]:
+    return {
+        "fourcc": fourcc_text(cap.get(cv2.CAP_PROP_FOURCC)),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": float(cap.get(cv2.CAP_PROP_FPS)),
+        "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+        "auto_exposure": float(cap.get(cv2.CAP_PROP_AUTO_EXPOSURE)),
+        "exposure": float(cap.get(cv2.CAP_PROP_EXPOSURE)),
+        "auto_wb": float(cap.get(cv2.CAP_PROP_AUTO_WB)),
+        "wb_temperature": float(cap.get(cv2.CAP_PROP_WB_TEMPERATURE)),
+    }
+
+
+def negotiate_format(cap, fmt: CaptureFormat) -> Dict[str, Any]:
+    """Apply `fmt` to a cv2.VideoCapture-like camera and return what it granted.
+
+    With fourcc "auto" each of AUTO_FOURCCS is tried in turn and the first
+    one the driver accepts at the requested size and frame rate is kept
+    (otherwise the one with the highest granted frame rate). Drivers
+    silently substitute what they cannot do, so the result is read back
+    rather than taken from the set() calls.
+    """
+    if str(fmt.fourcc).lower() == "auto":
+        options = []
+        for fourcc in AUTO_FOURCCS:
+            _set_size_and_rate(cap, fmt, fourcc)
+            got = _granted(cap)
+            size_ok = (got["width"], got["height"]) == (fmt.width, fmt.height)
+            rate_ok = fmt.fps <= 0 or got["fps"] >= 0.9 * fmt.fps
+            if got["fourcc"] == fourcc and size_ok and rate_ok:
+                break
+            options.append((size_ok, got["fps"], fourcc))
+        else:
+            if options:
+                best = max(options)[2]
+                if best != AUTO_FOURCCS[-1]:
+                    _set_size_and_rate(cap, fmt, best)
+    else:
+        _set_size_and_rate(cap, fmt, str(fmt.fourcc).upper()[:4] or None)
+
+    if fmt.buffer_size > 0:
+        # Fewer driver-side buffers = less queued latency (not every backend honours it)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, fmt.buffer_size)
+
+    if fmt.exposure != "auto":
+        value = cap.get(cv2.CAP_PROP_EXPOSURE) if fmt.exposure == "lock" else float(fmt.exposure)
+        cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, _manual_exposure_value(cap))
+        cap.set(cv2.CAP_PROP_EXPOSURE, value)
+
+    if fmt.white_balance != "auto":
+        value = (cap.get(cv2.CAP_PROP_WB_TEMPERATURE) if fmt.white_balance == "lock"
+                 else float(fmt.white_balance))
+        cap.set(cv2.CAP_PROP_AUTO_WB, 0)
+        if value > 0:
+            cap.set(cv2.CAP_PROP_WB_TEMPERATURE, value)
+    return _granted(cap)
+
+
+def describe_format(fmt: CaptureFormat, granted: Dict[str, Any]) -> str:
+    """One log line comparing what was requested with what the driver granted."""
+    asked = (f"{fmt.fourcc} {fmt.width}x{fmt.height} @ {fmt.fps:g} fps, "
+             f"buffers {fmt.buffer_size or 'default'}, exposure {fmt.exposure}, "
+             f"white balance {fmt.white_balance}")
+    got = (f"{granted['fourcc']} {granted['width']}x{granted['height']} @ {granted['fps']:g} fps, "
+           f"buffers {granted['buffer_size']}, auto exposure {granted['auto_exposure']:g} "
+           f"(exposure {granted['exposure']:g}), auto WB {granted['auto_wb']:g} "
+           f"({granted['wb_temperature']:g} K)")
+    return f"Camera format: requested {asked}; granted {got}"
+
+
+class VideoFileSource:
+    """Frames of a recorded video file, optionally looping at the end."""
+
+    def __init__(self, path: str, loop: bool = False):
+        self.path = path
+        self.loop = loop
+        self.truth = None
+        self._cap = cv2.VideoCapture(path)
+
+    def isOpened(self) -> bool:
+        return self._cap.isOpened()
+
+    def read(self, dst: Optional[np.ndarray] = None):
+        ok, frame = self._cap.read(dst)
+        if not ok and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._cap.read(dst)
+        return ok, frame
+
+    def set(self, prop: int, value: float) -> bool:
+        # Recorded frames have a fixed size; only seeking is meaningful
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self._cap.set(prop, value)
+        return False
+
+    def get(self, prop: int) -> float:
+        return self._cap.get(prop)
+
+    def release(self) -> None:
+        self._cap.release()
+
+
+class ImageDirSource:
+    """Images in a directory, read in file-name order."""
+
+    def __init__(self, path: str, loop: bool = False,
+                 extensions: Sequence[str] = IMAGE_EXTENSIONS):
+        self.path = path
+        self.loop = loop
+        self.truth = None
+        self.files: List[str] = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(tuple(extensions)))
+        self._pos = 0
+        self._size: Tuple[int, int] = (0, 0)
+
+    def isOpened(self) -> bool:
+        return bool(self.files)
+
+    def read(self, dst: Optional[np.ndarray] = None):
+        if self._pos >= len(self.files):
+            if not self.loop or not self.files:
+                return False, None
+            self._pos = 0
+        frame = cv2.imread(self.files[self._pos], cv2.IMREAD_COLOR)
+        self._pos += 1
+        if frame is None:
+            return False, None
+        self._size = (frame.shape[1], frame.shape[0])
+        if dst is not None and dst.shape == frame.shape:
+            np.copyto(dst, frame)
+            frame = dst
+        return True, frame
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self._pos = max(0, int(value))
+            return True
+        return False
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._size[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._size[1])
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.files))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._pos)
+        return 0.0
+
+    def release(self) -> None:
+        self.files = []
+
+
+class SyntheticSource:
+    """Generated frames with red discs moving at constant velocity.
+
+    `truth` holds the (x, y, r) discs of the frame returned by the last
+    read, so results can be scored against ground truth. `frames` 0 means
+    endless. Resolution can be changed with set() like a camera.
+    """
+
+    def __init__(self, width: int = 640, height: int = 480, count: int = 2,
+                 frames: int = 0, seed: int = 0, speed: float = 3.0,
+                 noise_std: float = 6.0, clutter: int = 10,
+                 radius_range: Tuple[int, int] = (8, 30)):
+        self.width = int(width)
+        self.height = int(height)
+        self.count = int(count)
+        self.frames = int(frames)
+        self.speed = float(speed)
+        self.noise_std = float(noise_std)
+        self.clutter = int(clutter)
+        self.radius_range = radius_range
+        self.seed = int(seed)
+        self._rng = np.random.default_rng(seed)
+        self._pos = 0
+        self.truth: Optional[List[Tuple[int, int, int]]] = None
+        self._reset_discs()
+
+    def _reset_discs(self) -> None:
+        discs = random_discs(self.width, self.height, self.count, self._rng,
+                             self.radius_range)
+        self._discs = [[float(x), float(y), r] for (x, y, r) in discs]
+        angles = self._rng.uniform(0.0, 2.0 * np.pi, len(discs))
+        self._vel = [(self.speed * np.cos(a), self.speed * np.sin(a)) for a in angles]
+
+    def isOpened(self) -> bool:
+        return True
+
+    def _step(self) -> None:
+        for d, (vx, vy) in zip(self._discs, self._vel):
+            d[0] += vx
+            d[1] += vy
+        # Bounce off the frame edges
+        for i, d in enumerate(self._discs):
+            vx, vy = self._vel[i]
+            r = d[2]
+            if not r <= d[0] <= self.width - r:
+                vx = -vx
+            if not r <= d[1] <= self.height - r:
+                vy = -vy
+            self._vel[i] = (vx, vy)
+
+    def read(self, dst: Optional[np.ndarray] = None):
+        if self.frames and self._pos >= self.frames:
+            return False, None
+        self.truth = [(int(round(x)), int(round(y)), int(r)) for x, y, r in self._discs]
+        frame = make_frame(self.width, self.height, self.truth,
+                           noise_std=self.noise_std, clutter=self.clutter,
+                           seed=self.seed * 100003 + self._pos)
+        self._pos += 1
+        self._step()
+        if dst is not None and dst.shape == frame.shape:
+            np.copyto(dst, frame)
+            frame = dst
+        return True, frame
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop == cv2.CAP_PROP_FRAME_WIDTH and int(value) > 0:
+            self.width = int(value)
+        elif prop == cv2.CAP_PROP_FRAME_HEIGHT and int(value) > 0:
+            self.height = int(value)
+        elif prop == cv2.CAP_PROP_POS_FRAMES:
+            self._pos = max(0, int(value))
+            return True
+        else:
+            return False
+        self._reset_discs()
+        return True
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frames)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._pos)
+        return 0.0
+
+    def release(self) -> None:
+        pass
+
+
+def open_source(spec: str, loop: bool = False):
+    """Open a frame source from a string.
+
+    - ``camera:N`` (or a bare integer): live camera N
+    - ``synthetic`` or ``synthetic:WxH[:frames]``: generated frames
+    - a directory: its images in name order
+    - anything else: a video file
+    """
+    spec = str(spec).strip()
+    if spec.isdigit():
+        return open_camera(int(spec))
+    kind, _, arg = spec.partition(":")
+    if kind == "camera":
+        return open_camera(int(arg or 0))
+    if kind == "synthetic":
+        parts = arg.split(":") if arg else []
+        w, h = 640, 480
+        if parts and parts[0]:
+            w, h = (int(v) for v in parts[0].lower().split("x"))
+        frames = int(parts[1]) if len(parts) > 1 else 300
+        return SyntheticSource(w, h, frames=frames)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, loop=loop)
+    return VideoFileSource(spec, loop=loop)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+Circle = Tuple[int, int, int]
+
+
+def random_discs(width: int, height: int, count: int,
+                 rng: np.random.Generator,
+                 radius_range: Tuple[int, int] = (8, 30)) -> List[Circle]:
+    """Non-overlapping (x, y, r) discs placed inside a width x height frame."""
+    discs: List[Circle] = []
+    attempts = 0
+    while len(discs) < count and attempts < 200 * max(1, count):
+        attempts += 1
+        r = int(rng.integers(radius_range[0], radius_range[1] + 1))
+        x = int(rng.integers(r + 2, max(r + 3, width - r - 2)))
+        y = int(rng.integers(r + 2, max(r + 3, height - r - 2)))
+        if all((x - ox) ** 2 + (y - oy) ** 2 > (r + orr + 6) ** 2
+               for ox, oy, orr in discs):
+            discs.append((x, y, r))
+    return discs
+
+
+def make_frame(width: int, height: int, discs: Sequence[Circle],
+               noise_std: float = 6.0, clutter: int = 0,
+               seed: Optional[int] = None,
+               background: Tuple[int, int, int] = (70, 75, 70)) -> np.ndarray:
+    """BGR test frame with red discs at known positions.
+
+    `clutter` adds that many distractors: red non-circular blobs and
+    non-red discs, so detectors are exercised on false positives too.
+    """
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = background
+    # Soft vertical lighting gradient
+    ramp = np.linspace(-20, 20, height, dtype=np.float32)[:, None, None]
+    frame = np.clip(frame.astype(np.float32) + ramp, 0, 255).astype(np.uint8)
+
+    for _ in range(int(clutter)):
+        x = int(rng.integers(0, width))
+        y = int(rng.integers(0, height))
+        size = int(rng.integers(6, 40))
+        if rng.random() < 0.5:
+            # Red but not round: thin bar or rectangle
+            w2 = int(size * rng.uniform(1.5, 4.0))
+            cv2.rectangle(frame, (x, y), (x + w2, y + max(3, size // 4)),
+                          (30, 30, int(rng.integers(150, 255))), -1)
+        else:
+            # Round but not red
+            colour = tuple(int(v) for v in rng.integers(0, 200, 3))
+            colour = (colour[0], colour[1], min(colour[2], colour[1]))
+            cv2.circle(frame, (x, y), size // 2, colour, -1)
+
+    for (x, y, r) in discs:
+        red = (int(rng.integers(10, 50)), int(rng.integers(10, 50)),
+               int(rng.integers(180, 250)))
+        cv2.circle(frame, (int(x), int(y)), int(r), red, -1, cv2.LINE_AA)
+
+    if noise_std > 0:
+        noise = rng.normal(0.0, noise_std, frame.shape).astype(np.float32)
+        frame = np.clip(frame.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    return frame
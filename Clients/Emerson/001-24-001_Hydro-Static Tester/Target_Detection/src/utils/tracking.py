@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+Circle = Tuple[int, int, int]
+
+
+@dataclass
+class AlphaBetaTrack:
+    """Position/velocity estimate of one marker, in pixels and pixels/frame."""
+    x: float
+    y: float
+    r: int
+    vx: float = 0.0
+    vy: float = 0.0
+
+    def predict(self, steps: float = 1.0) -> Tuple[float, float]:
+        """Position `steps` frames after the last correction."""
+        return self.x + steps * self.vx, self.y + steps * self.vy
+
+    def correct(self, x: int, y: int, r: int, alpha: float, beta: float,
+                steps: float = 1.0) -> None:
+        """Fold in a measurement taken `steps` frames after the last one."""
+        px, py = self.predict(steps)
+        rx, ry = x - px, y - py
+        self.x = px + alpha * rx
+        self.y = py + alpha * ry
+        self.vx += beta * rx / steps
+        self.vy += beta * ry / steps
+        self.r = int(r)
+
+    @property
+    def speed(self) -> float:
+        return math.hypot(self.vx, self.vy)
+
+
+def _hungarian(cost: np.ndarray) -> np.ndarray:
+    """Optimal assignment for an n x m cost matrix with n <= m.
+
+    Shortest augmenting path with row/column potentials (O(n^2 m)); the
+    inner scan over columns is vectorised. Returns the column of each row.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # row matched to column j (1-based, 0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            masked = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(masked)) + 1
+            delta = masked[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    cols = np.empty(n, dtype=np.int64)
+    for j in range(1, m + 1):
+        if p[j]:
+            cols[p[j] - 1] = j - 1
+    return cols
+
+
+def assign(cost: np.ndarray, max_cost: float) -> List[Tuple[int, int]]:
+    """Minimum-total-cost (row, col) pairs with cost <= `max_cost`.
+
+    Entries above `max_cost` are gated out: they are never paired, and
+    rows/columns left without a feasible partner stay unassigned. A row and
+    column that are each other's only feasible partner are paired directly;
+    the solver only sees the rows and columns that are still contested.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return []
+    feasible = cost <= max_cost
+    row_deg = feasible.sum(axis=1)
+    col_deg = feasible.sum(axis=0)
+    sole = feasible & (row_deg[:, None] == 1) & (col_deg[None, :] == 1)
+    rs, cs = np.nonzero(sole)
+    pairs = list(zip(rs.tolist(), cs.tolist()))
+    rows = np.nonzero((row_deg > 0) & ~sole.any(axis=1))[0]
+    cols = np.nonzero((col_deg > 0) & ~sole.any(axis=0))[0]
+    if rows.size == 0 or cols.size == 0:
+        return pairs
+    sub = cost[np.ix_(rows, cols)]
+    sub_ok = feasible[np.ix_(rows, cols)]
+    # Gated entries cost more than any feasible assignment could
+    big = float(max_cost) * (min(sub.shape) + 1) + 1.0
+    gated = np.where(sub_ok, sub, big)
+    if gated.shape[0] <= gated.shape[1]:
+        sub_pairs = enumerate(_hungarian(gated).tolist())
+    else:
+        sub_pairs = ((r, c) for c, r in enumerate(_hungarian(gated.T).tolist()))
+    pairs.extend((int(rows[r]), int(cols[c])) for r, c in sub_pairs if sub_ok[r, c])
+    return pairs
+
+
+@dataclass
+class Track(AlphaBetaTrack):
+    """One marker's track: filtered state plus lifecycle and drawn position."""
+    id: int = 0
+    hits: int = 0
+    misses: int = 0
+    shown: Circle = field(default=(0, 0, 0))
+
+
+class Tracker:
+    """Multi-marker tracker with gated optimal assignment.
+
+    Each frame, detections are matched to the tracks' alpha-beta predicted
+    positions by minimum total squared distance (gated at `gate_px`), so
+    identities survive markers crossing. Lifecycle:
+
+    - birth: an unmatched detection starts a tentative track, confirmed
+      after `min_hits` matched frames;
+    - hold: a confirmed track missing a detection coasts on its velocity
+      and stays drawn at its last position for up to `max_misses` frames;
+    - death: after that (or on the first miss while tentative) it is dropped.
+
+    The drawn position only moves when a detection is more than
+    `deadband_px` from it.
+    """
+
+    def __init__(self, gate_px: float = 80.0, min_hits: int = 1, max_misses: int = 4,
+                 deadband_px: float = 1.0, alpha: float = 0.85, beta: float = 0.3):
+        self.configure(gate_px, min_hits, max_misses, deadband_px)
+        self.alpha = float(alpha)
+        self.beta = float(beta)
+        self.tracks: List[Track] = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def configure(self, gate_px: float, min_hits: int, max_misses: int,
+                  deadband_px: float) -> None:
+        self.gate_px = float(gate_px)
+        self.min_hits = max(1, int(min_hits))
+        self.max_misses = max(0, int(max_misses))
+        self.deadband_px = float(deadband_px)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.tracks = []
+
+    def update(self, circles: Sequence[Circle]) -> List[Circle]:
+        """Fold one frame of (x, y, r) detections in; return circles to draw.
+
+        The result holds the drawn position of every confirmed track,
+        ordered by track id (oldest first).
+        """
+        with self._lock:
+            tracks = self.tracks
+            pairs: List[Tuple[int, int]] = []
+            if tracks and circles:
+                pred = np.array([t.predict() for t in tracks], dtype=np.float64)
+                det = np.asarray(circles, dtype=np.float64).reshape(-1, 3)[:, :2]
+                diff = pred[:, None, :] - det[None, :, :]
+                cost = np.einsum("ijk,ijk->ij", diff, diff)
+                pairs = assign(cost, self.gate_px * self.gate_px)
+
+            matched_t = set()
+            matched_c = set()
+            dead2 = self.deadband_px * self.deadband_px
+            for ti, ci in pairs:
+                t = tracks[ti]
+                x, y, r = (int(v) for v in circles[ci])
+                t.correct(x, y, r, self.alpha, self.beta)
+                t.hits += 1
+                t.misses = 0
+                sx, sy, _ = t.shown
+                if (x - sx) * (x - sx) + (y - sy) * (y - sy) <= dead2:
+                    t.shown = (sx, sy, r)
+                else:
+                    t.shown = (x, y, r)
+                matched_t.add(ti)
+                matched_c.add(ci)
+
+            alive: List[Track] = []
+            for ti, t in enumerate(tracks):
+                if ti not in matched_t:
+                    t.misses += 1
+                    if t.hits < self.min_hits or t.misses > self.max_misses:
+                        continue
+                    # Coast on the velocity estimate so the gate follows the marker
+                    t.x, t.y = t.predict()
+                alive.append(t)
+            for ci, c in enumerate(circles):
+                if ci in matched_c:
+                    continue
+                x, y, r = (int(v) for v in c)
+                alive.append(Track(float(x), float(y), r, id=self._next_id,
+                                   hits=1, shown=(x, y, r)))
+                self._next_id += 1
+            self.tracks = alive
+            return [t.shown for t in sorted(alive, key=lambda t: t.id)
+                    if t.hits >= self.min_hits]